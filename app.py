@@ -1,11 +1,247 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
+import codecs
+import hmac
+import json
+import os
+import re
 import sys
+import time
 import traceback
-from tax_calculator import calculate_tax
+from tax_batch import SWEEP_FIELDS, calculate_sweep, calculate_tax_batch, iter_result_rows
+from tax_cache import TaxResultCache, calculate_record_for_key, etag_for_key, make_cache_key
+from tax_calculator import get_rules
+from tax_coalescer import RequestCoalescer
+from tax_household import optimize_household, optimize_households_batch
+from tax_metrics import MetricsRegistry
+from tax_profiling import profiler_from_environ
+from tax_records import INPUT_FIELDS, TaxInput
 
 app = Flask(__name__)
 app.debug = False
 
+# 批量接口每次向量化计算的记录数，决定了服务端的内存上限
+BATCH_CHUNK_SIZE = 1000
+# 解析JSON数组时每次从请求体读取的字节数
+BATCH_READ_SIZE = 64 * 1024
+# 单条记录的长度上限，超过时不再继续缓冲，避免格式错误的请求体被整个读入内存
+BATCH_MAX_RECORD_SIZE = int(os.environ.get('TAX_BATCH_MAX_RECORD_SIZE', 1024 * 1024))
+# JSON数组中记录之间的空白和逗号
+ARRAY_SEPARATORS = re.compile(r'[ \t\r\n,]*')
+# /sweep 单次请求的网格点数上限
+SWEEP_MAX_POINTS = int(os.environ.get('TAX_SWEEP_MAX_POINTS', 100000))
+# /household 一次最多处理的家庭数
+HOUSEHOLD_MAX_BATCH = int(os.environ.get('TAX_HOUSEHOLD_MAX_BATCH', 10000))
+# GET /calculate 响应允许共享缓存直接使用的秒数，默认0表示每次都要用ETag重新验证
+CALCULATE_MAX_AGE = int(os.environ.get('TAX_CALCULATE_MAX_AGE', 0))
+
+# /calculate 结果缓存，容量和有效期（秒）可通过环境变量配置，容量为0时关闭缓存
+result_cache = TaxResultCache(
+    maxsize=int(os.environ.get('TAX_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('TAX_CACHE_TTL', 0))
+)
+
+# 可选的请求合并：设置合并窗口（毫秒）后，并发的 /calculate 请求会合并为一次批量计算
+COALESCE_WINDOW_MS = float(os.environ.get('TAX_COALESCE_WINDOW_MS', 0))
+if COALESCE_WINDOW_MS > 0:
+    coalescer = RequestCoalescer(
+        window=COALESCE_WINDOW_MS / 1000,
+        max_batch_size=int(os.environ.get('TAX_COALESCE_MAX_BATCH', 64)),
+        timeout=float(os.environ.get('TAX_COALESCE_TIMEOUT_MS', 1000)) / 1000
+    )
+    compute_result = coalescer.calculate
+else:
+    coalescer = None
+    compute_result = calculate_record_for_key
+
+# 按需剖析：TAX_PROFILE_SAMPLE_RATE 大于0时按比例剖析 /calculate，也可以通过 /admin/profile 动态开启
+profiler = profiler_from_environ()
+# 管理接口的访问令牌，未设置时管理接口不可用
+ADMIN_TOKEN = os.environ.get('TAX_ADMIN_TOKEN', '')
+
+# 指标：/metrics 默认只允许本机访问，设置 TAX_METRICS_PUBLIC=1 后允许远程抓取
+METRICS_PUBLIC = os.environ.get('TAX_METRICS_PUBLIC', '') == '1'
+metrics = MetricsRegistry()
+http_requests = metrics.counter('tax_http_requests_total', 'HTTP requests by endpoint and status',
+                                ('endpoint', 'status'))
+http_errors = metrics.counter('tax_http_errors_total', 'Unhandled errors by endpoint', ('endpoint',))
+http_in_flight = metrics.gauge('tax_http_requests_in_flight', 'HTTP requests currently being served')
+http_latency = metrics.histogram('tax_http_request_duration_seconds', 'HTTP request latency',
+                                 ('endpoint',))
+stage_latency = metrics.histogram('tax_calculate_stage_duration_seconds',
+                                  'Latency of each /calculate stage', ('stage',))
+if coalescer is not None:
+    metrics.register(coalescer.batch_sizes)
+    metrics.register(coalescer.queue_delays)
+
+def collect_component_metrics():
+    """在输出指标时读取缓存和请求合并器的统计"""
+    cache_stats = result_cache.stats()
+    collected = [
+        ('tax_cache_hits_total', 'counter', 'Result cache hits', [({}, cache_stats['hits'])]),
+        ('tax_cache_misses_total', 'counter', 'Result cache misses', [({}, cache_stats['misses'])]),
+        ('tax_cache_hit_ratio', 'gauge', 'Result cache hit ratio', [({}, cache_stats['hit_ratio'])]),
+        ('tax_cache_entries', 'gauge', 'Result cache entries', [({}, cache_stats['size'])]),
+    ]
+    if coalescer is not None:
+        coalescer_stats = coalescer.stats()
+        collected += [
+            ('tax_coalescer_batches_total', 'counter', 'Coalesced batches evaluated',
+             [({}, coalescer_stats['batches'])]),
+            ('tax_coalescer_requests_total', 'counter', 'Requests evaluated through the coalescer',
+             [({}, coalescer_stats['requests'])]),
+            ('tax_coalescer_mean_queue_delay_seconds', 'gauge', 'Mean coalescer queueing delay',
+             [({}, coalescer_stats['mean_queue_delay'])]),
+            ('tax_coalescer_max_queue_delay_seconds', 'gauge', 'Max coalescer queueing delay',
+             [({}, coalescer_stats['max_queue_delay'])]),
+            ('tax_coalescer_timeouts_total', 'counter', 'Requests computed directly after waiting too long',
+             [({}, coalescer_stats['timeouts'])]),
+        ]
+    return collected
+
+metrics.add_collector(collect_component_metrics)
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.request_started_at = time.perf_counter()
+    http_in_flight.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = _endpoint_label()
+    http_requests.inc(endpoint, response.status_code)
+    started_at = g.request_started_at
+    if response.is_streamed:
+        # 流式响应在这里还没有开始输出，等响应体发送完毕后再记录耗时
+        response.call_on_close(lambda: http_latency.observe(time.perf_counter() - started_at, endpoint))
+    else:
+        http_latency.observe(time.perf_counter() - started_at, endpoint)
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # stream_with_context 会在响应体输出完毕时再次触发 teardown，只减一次
+    if g.pop('request_started_at', None) is not None:
+        http_in_flight.dec()
+
+def parse_tax_input(data):
+    """从请求数据中提取 calculate_tax 的参数，如果不存在则使用默认值"""
+    return TaxInput.from_dict(data).to_dict()
+
+def iter_ndjson_records(stream, buffer=b''):
+    """逐行读取NDJSON记录，解析失败或超过 BATCH_MAX_RECORD_SIZE 的行以异常对象的形式返回"""
+    position = 0
+    # 正在丢弃超长行的剩余部分
+    oversized = False
+    while True:
+        newline = buffer.find(b'\n', position)
+        if newline < 0:
+            if len(buffer) - position > BATCH_MAX_RECORD_SIZE:
+                if not oversized:
+                    yield ValueError(f'Record exceeds {BATCH_MAX_RECORD_SIZE} bytes')
+                    oversized = True
+                position = len(buffer)
+            chunk = stream.read(BATCH_READ_SIZE)
+            if chunk:
+                # 只在补充数据时丢弃已解析的部分，避免每行复制一次剩余数据
+                buffer, position = buffer[position:] + chunk, 0
+                continue
+            line, position = buffer[position:], len(buffer)
+        else:
+            line, position = buffer[position:newline], newline + 1
+        if oversized:
+            oversized = False
+        elif line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+        if newline < 0:
+            return
+
+def iter_json_array_records(stream, buffer=b''):
+    """
+    增量解析JSON数组，内存中只保留尚未解析的部分
+
+    一条记录读入 BATCH_MAX_RECORD_SIZE 个字符后仍无法解析时，返回一个错误并停止读取请求体。
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    text = utf8.decode(buffer)
+    position = text.index('[') + 1  # 跳过开头的 '['
+    eof = False
+    while True:
+        position = ARRAY_SEPARATORS.match(text, position).end()
+        if text.startswith(']', position):
+            return
+        try:
+            record, end = decoder.raw_decode(text, position)
+            # 数字等记录可能被读取块截断，读到下一个分隔符再确认
+            complete = end < len(text) or eof
+        except ValueError as e:
+            if eof:
+                if position < len(text):
+                    yield e
+                return
+            complete = False
+        if not complete:
+            if len(text) - position > BATCH_MAX_RECORD_SIZE:
+                yield ValueError(f'Record exceeds {BATCH_MAX_RECORD_SIZE} characters')
+                return
+            chunk = stream.read(BATCH_READ_SIZE)
+            eof = not chunk
+            # 只在补充数据时丢弃已解析的部分，避免每条记录复制一次剩余数据
+            text, position = text[position:] + utf8.decode(chunk, final=eof), 0
+            continue
+        position = end
+        yield record
+
+def iter_batch_records(stream):
+    """根据请求体的第一个非空字符判断是JSON数组还是NDJSON"""
+    buffer = b''
+    while not buffer.strip():
+        chunk = stream.read(BATCH_READ_SIZE)
+        if not chunk:
+            return iter(())
+        buffer += chunk
+    if buffer.lstrip().startswith(b'['):
+        return iter_json_array_records(stream, buffer)
+    return iter_ndjson_records(stream, buffer)
+
+def calculate_records(records):
+    """对一组记录做批量计算，按输入顺序返回每条记录的结果或错误信息，不同纳税年度的记录分别计算"""
+    outputs = [None] * len(records)
+    groups = {}
+    for position, record in enumerate(records):
+        if isinstance(record, Exception):
+            outputs[position] = {'error': f'Invalid JSON data: {str(record)}'}
+            continue
+        if not isinstance(record, dict):
+            outputs[position] = {'error': 'Invalid JSON data'}
+            continue
+        try:
+            kwargs = parse_tax_input(record)
+            kwargs['special_deductions'] = float(sum((kwargs['special_deductions'] or {}).values()))
+            kwargs['city'] = kwargs['city'] or ''
+            rules = get_rules(kwargs.pop('tax_year'))
+            if kwargs['city'] and kwargs['city'] not in rules.contributions:
+                raise ValueError(f'No contribution rules for city {kwargs["city"]}')
+        except (ValueError, TypeError, AttributeError) as e:
+            outputs[position] = {'error': f'Invalid numeric input: {str(e)}'}
+            continue
+        columns, positions = groups.setdefault(rules.tax_year, ({field: [] for field in kwargs}, []))
+        for field, value in kwargs.items():
+            columns[field].append(value)
+        positions.append(position)
+
+    for tax_year, (columns, positions) in groups.items():
+        results = calculate_tax_batch(**columns, tax_year=tax_year)
+        for position, result in zip(positions, iter_result_rows(results)):
+            outputs[position] = {'success': True, 'result': result}
+    return outputs
+
 @app.route('/')
 def index():
     try:
@@ -14,52 +250,231 @@ def index():
         app.logger.error(f"Error rendering index: {str(e)}\n{traceback.format_exc()}")
         return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/calculate', methods=['POST'])
+def set_calculate_cache_control(response):
+    """GET 结果可由浏览器和代理缓存，过期后用 If-None-Match 重新验证"""
+    response.cache_control.public = True
+    response.cache_control.max_age = CALCULATE_MAX_AGE
+
+def parse_query_input(args):
+    """
+    从 GET /calculate 的查询参数中提取计算参数，专项附加扣除写作 special_deductions.<名称>=金额
+
+    Raises:
+        ValueError: 有未知参数或扣除金额无法转换为数值
+    """
+    data = {}
+    special_deductions = {}
+    for name, value in args.items():
+        if name.startswith('special_deductions.'):
+            special_deductions[name[len('special_deductions.'):]] = float(value)
+        elif name in INPUT_FIELDS and name != 'special_deductions':
+            data[name] = value
+        else:
+            raise ValueError(f'Unknown parameter: {name}')
+    data['special_deductions'] = special_deductions
+    return data
+
+@app.route('/calculate', methods=['GET', 'POST'])
+@profiler.wrap('calculate')
 def calculate():
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Request must be JSON'}), 400
-        
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid JSON data'}), 400
+        started_at = time.perf_counter()
+        if request.method == 'GET':
+            data = request.args
+        else:
+            if not request.is_json:
+                return jsonify({'error': 'Request must be JSON'}), 400
+            
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': 'Invalid JSON data'}), 400
             
         try:
             # 从请求中获取数据，如果不存在则使用默认值
-            salary = float(data.get('salary', 0))
-            salary_type = data.get('salary_type', 'monthly')
-            bonus = float(data.get('bonus', 0))
-            bonus_type = data.get('bonus_type', 'separate')
-            labor_income = float(data.get('labor_income', 0))
-            manuscript_income = float(data.get('manuscript_income', 0))
-            license_income = float(data.get('license_income', 0))
-            social_security_base = float(data.get('social_security_base', 0))
-            housing_fund_rate = float(data.get('housing_fund_rate', 0))
-            special_deductions = data.get('special_deductions', {})
+            if request.method == 'GET':
+                data = parse_query_input(data)
+            cache_key = make_cache_key(**TaxInput.from_dict(data).to_dict())
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': f'Invalid numeric input: {str(e)}'}), 400
+        parsed_at = time.perf_counter()
+        stage_latency.observe(parsed_at - started_at, 'parse')
             
-            # 调用计算函数
-            result = calculate_tax(
-                salary=salary,
-                salary_type=salary_type,
-                bonus=bonus,
-                bonus_type=bonus_type,
-                labor_income=labor_income,
-                manuscript_income=manuscript_income,
-                license_income=license_income,
-                social_security_base=social_security_base,
-                housing_fund_rate=housing_fund_rate,
-                special_deductions=special_deductions
-            )
+        # 结果只取决于输入，客户端或缓存已有相同结果时不再计算。GET 返回304；RFC 7232 规定
+        # GET/HEAD 以外的方法在 If-None-Match 匹配时返回412
+        etag = etag_for_key(cache_key)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304 if request.method == 'GET' else 412)
+            response.set_etag(etag)
+            if request.method == 'GET':
+                set_calculate_cache_control(response)
+            return response
             
-            return jsonify({'success': True, 'result': result})
+        try:
+            result = result_cache.calculate_record(cache_key, compute_result)
+            computed_at = time.perf_counter()
+            stage_latency.observe(computed_at - parsed_at, 'compute')
+            
+            # 直接套用结果记录的JSON模板，输出与 jsonify 相同（键排序、紧凑格式）
+            response = Response('{"result":%s,"success":true}\n' % result.to_json(sort_keys=True),
+                                mimetype='application/json')
+            response.set_etag(etag)
+            if request.method == 'GET':
+                set_calculate_cache_control(response)
+            stage_latency.observe(time.perf_counter() - computed_at, 'serialize')
+            return response
             
         except ValueError as e:
             return jsonify({'error': f'Invalid numeric input: {str(e)}'}), 400
             
     except Exception as e:
+        http_errors.inc('/calculate')
         app.logger.error(f"Error in calculate: {str(e)}\n{traceback.format_exc()}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """批量计算接口：输入为NDJSON或JSON数组，按输入顺序流式返回NDJSON结果"""
+    stream = request.stream
+
+    def generate():
+        index = 0
+        chunk = []
+        for record in iter_batch_records(stream):
+            chunk.append(record)
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                for output in calculate_records(chunk):
+                    yield json.dumps({'index': index, **output}, ensure_ascii=False) + '\n'
+                    index += 1
+                chunk = []
+        if chunk:
+            for output in calculate_records(chunk):
+                yield json.dumps({'index': index, **output}, ensure_ascii=False) + '\n'
+                index += 1
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    """
+    收入曲线扫描接口
+
+    请求体：{"profile": {...与 /calculate 相同...},
+            "sweep": {"salary": {"start": 5000, "stop": 100000, "steps": 10000}},
+            "fields": [...]}，
+    sweep 中的参数也可以用 {"values": [...]} 给出任意网格；多个参数时按网格展开。
+    返回列式结果，breakpoints 标出每次跨档的位置和跨档后的税率。
+    """
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Request must be JSON'}), 400
+        
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('sweep'), dict):
+            return jsonify({'error': 'Invalid JSON data'}), 400
+            
+        try:
+            profile = parse_tax_input(data.get('profile') or {})
+            result = calculate_sweep(profile, data['sweep'], fields=data.get('fields') or SWEEP_FIELDS,
+                                     max_points=SWEEP_MAX_POINTS)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            return jsonify({'error': f'Invalid sweep input: {str(e)}'}), 400
+            
+        return jsonify({
+            'success': True,
+            'shape': list(result['shape']),
+            'axes': {name: values.tolist() for name, values in result['axes'].items()},
+            'columns': {field: values.tolist() for field, values in result['columns'].items()},
+            'breakpoints': result['breakpoints']
+        })
+        
+    except Exception as e:
+        http_errors.inc('/sweep')
+        app.logger.error(f"Error in sweep: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+def parse_household(data):
+    """从请求数据中提取一个家庭的成员资料和待分摊的扣除项目"""
+    earners = []
+    for earner in data.get('earners') or []:
+        kwargs = parse_tax_input(earner)
+        kwargs.pop('tax_year')
+        earners.append(kwargs)
+    dependents = data.get('dependents') or []
+    if not earners or not isinstance(dependents, list):
+        raise ValueError('earners must be a non-empty list and dependents a list')
+    return {'earners': earners, 'dependents': dependents}
+
+@app.route('/household', methods=['POST'])
+def household():
+    """
+    家庭专项附加扣除分摊优化接口
+
+    请求体：{"earners": [{...与 /calculate 相同...}, ...],
+            "dependents": [{"type": "children_education", "members": [0, 1]}, ...], "tax_year": 2025}，
+    或批量形式 {"households": [{"earners": [...], "dependents": [...]}, ...], "tax_year": 2025}。
+    """
+    try:
+        if not request.is_json:
+            return jsonify({'error': 'Request must be JSON'}), 400
+        
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid JSON data'}), 400
+            
+        try:
+            tax_year = int(data['tax_year']) if data.get('tax_year') is not None else None
+            if 'households' in data:
+                households = [parse_household(household) for household in data['households']]
+                if len(households) > HOUSEHOLD_MAX_BATCH:
+                    return jsonify({'error': f'Too many households (max {HOUSEHOLD_MAX_BATCH})'}), 400
+                return jsonify({'success': True, 'results': optimize_households_batch(households, tax_year)})
+            result = optimize_household(**parse_household(data), tax_year=tax_year)
+        except (ValueError, TypeError, AttributeError, KeyError) as e:
+            return jsonify({'error': f'Invalid household input: {str(e)}'}), 400
+            
+        return jsonify({'success': True, 'result': result})
+        
+    except Exception as e:
+        http_errors.inc('/household')
+        app.logger.error(f"Error in household: {str(e)}\n{traceback.format_exc()}")
+        return jsonify({'error': 'Internal server error'}), 500
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus文本格式的指标"""
+    if not METRICS_PUBLIC and request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Not found'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """
+    查看或调整剖析设置，需要在 X-Admin-Token 请求头中提供 TAX_ADMIN_TOKEN
+    
+    POST 的JSON可包含 sample_rate、mode（'cprofile' 或 'sampler'）、window，
+    以及 dump: true 立即输出当前窗口的数据。
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return jsonify({'error': 'Not found'}), 404
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Invalid JSON data'}), 400
+        try:
+            profiler.configure(
+                sample_rate=float(data['sample_rate']) if 'sample_rate' in data else None,
+                mode=data.get('mode'),
+                window=float(data['window']) if 'window' in data else None
+            )
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        if data.get('dump'):
+            return jsonify({'success': True, 'files': profiler.dump(), 'status': profiler.status()})
+    
+    return jsonify({'success': True, 'status': profiler.status()})
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Not found'}), 404
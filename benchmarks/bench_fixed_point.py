@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+浮点引擎与整数分引擎的速度对比
+
+用法：
+    python benchmarks/bench_fixed_point.py --rows 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tax_batch import calculate_tax_batch  # noqa: E402
+from tax_calculator import calculate_tax  # noqa: E402
+from tax_fixed_point import calculate_tax_cents, calculate_tax_cents_batch, to_cents_array  # noqa: E402
+
+
+def synthetic_columns(rows: int, seed: int) -> dict:
+    """生成工资服从对数正态分布的合成输入（以元为单位）"""
+    rng = np.random.default_rng(seed)
+    salary = np.round(rng.lognormal(9.6, 0.6, rows), 2)
+    return {
+        'salary': salary,
+        'bonus': np.round(salary * rng.choice([0, 0, 1, 2, 3], rows), 2),
+        'bonus_type': rng.choice(['separate', 'combined'], rows),
+        'social_security_base': np.minimum(salary, 35000.0),
+        'housing_fund_rate': rng.choice([5.0, 7.0, 12.0], rows),
+        'special_deductions': rng.choice([0.0, 1000.0, 3000.0], rows),
+    }
+
+
+def to_cent_columns(columns: dict) -> dict:
+    return {
+        'salary': to_cents_array(columns['salary']),
+        'bonus': to_cents_array(columns['bonus']),
+        'bonus_type': columns['bonus_type'],
+        'social_security_base': to_cents_array(columns['social_security_base']),
+        'housing_fund_rate_bps': np.rint(columns['housing_fund_rate'] * 100).astype(np.int64),
+        'special_deductions': to_cents_array(columns['special_deductions']),
+    }
+
+
+def best_of(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='浮点引擎与整数分引擎的速度对比')
+    parser.add_argument('--rows', type=int, default=1000000, help='批量计算的行数')
+    parser.add_argument('--scalar-rows', type=int, default=20000, help='逐条计算的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args(argv)
+
+    columns = synthetic_columns(args.rows, args.seed)
+    cent_columns = to_cent_columns(columns)
+    float_batch = best_of(args.repeat, lambda: calculate_tax_batch(**columns))
+    cents_batch = best_of(args.repeat, lambda: calculate_tax_cents_batch(**cent_columns))
+
+    # calculate_tax 的专项附加扣除是字典，两条路径使用相同的扣除额
+    scalar_rows = [
+        {name: ({'total': value[index].item()} if name == 'special_deductions' else value[index].item())
+         for name, value in columns.items()}
+        for index in range(min(args.scalar_rows, args.rows))
+    ]
+    scalar_cent_rows = [
+        {name: value[index].item() for name, value in cent_columns.items()}
+        for index in range(len(scalar_rows))
+    ]
+    float_scalar = best_of(args.repeat, lambda: [calculate_tax(**row) for row in scalar_rows])
+    cents_scalar = best_of(args.repeat, lambda: [calculate_tax_cents(**row) for row in scalar_cent_rows])
+
+    print(f'{"engine":<24} {"rows/s":>14}')
+    print(f'{"float batch":<24} {args.rows / float_batch:>14,.0f}')
+    print(f'{"cents batch":<24} {args.rows / cents_batch:>14,.0f}')
+    print(f'{"float scalar":<24} {len(scalar_rows) / float_scalar:>14,.0f}')
+    print(f'{"cents scalar":<24} {len(scalar_rows) / cents_scalar:>14,.0f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
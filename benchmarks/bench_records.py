@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+结果表示方式的内存和序列化对比
+分别以字典、TaxResult 记录、元组和列数组保存同一批计算结果，报告每条结果占用的字节数
+（含数值对象本身），以及转换为JSON的速度。
+
+用法：
+    python benchmarks/bench_records.py --rows 1000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tax_batch import RESULT_FIELDS, calculate_tax_batch  # noqa: E402
+from tax_records import TaxResult  # noqa: E402
+
+
+def synthetic_results(rows: int, seed: int) -> dict:
+    """用对数正态分布的合成工资批量计算一组列式结果"""
+    rng = np.random.default_rng(seed)
+    salary = np.round(rng.lognormal(9.6, 0.6, rows), 2)
+    return calculate_tax_batch(
+        salary=salary,
+        bonus=np.round(salary * rng.choice([0, 0, 1, 2, 3], rows), 2),
+        bonus_type=rng.choice(['separate', 'combined'], rows),
+        social_security_base=np.minimum(salary, 35000.0),
+        housing_fund_rate=rng.choice([5.0, 7.0, 12.0], rows),
+    )
+
+
+def build_dicts(columns: dict) -> list:
+    lists = [columns[field].tolist() for field in RESULT_FIELDS]
+    return [dict(zip(RESULT_FIELDS, row)) for row in zip(*lists)]
+
+
+def build_tuples(columns: dict) -> list:
+    return list(zip(*(columns[field].tolist() for field in RESULT_FIELDS)))
+
+
+def build_columns(columns: dict) -> dict:
+    return {field: np.array(columns[field], dtype=np.float64) for field in RESULT_FIELDS}
+
+
+def measure(build, columns: dict) -> tuple:
+    """返回 (构造结果, 构造后仍占用的字节数, 构造耗时)"""
+    gc.collect()
+    tracemalloc.start()
+    started_at = time.perf_counter()
+    results = build(columns)
+    elapsed = time.perf_counter() - started_at
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, size, elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='结果表示方式的内存和序列化对比')
+    parser.add_argument('--rows', type=int, default=1000000, help='结果条数')
+    parser.add_argument('--json-rows', type=int, default=100000, help='测量JSON序列化的条数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args(argv)
+
+    columns = synthetic_results(args.rows, args.seed)
+    representations = (
+        ('dict', build_dicts),
+        ('TaxResult', TaxResult.from_columns),
+        ('tuple', build_tuples),
+        ('columns', build_columns),
+    )
+
+    print(f'{"representation":<16} {"bytes/result":>14} {"build rows/s":>14}')
+    built = {}
+    for name, build in representations:
+        results, size, elapsed = measure(build, columns)
+        print(f'{name:<16} {size / args.rows:>14,.1f} {args.rows / elapsed:>14,.0f}')
+        if name in ('dict', 'TaxResult'):
+            built[name] = results[:args.json_rows]
+        del results
+
+    rows = len(built['dict'])
+    print(f'\n{"serializer":<24} {"rows/s":>14}')
+    started_at = time.perf_counter()
+    for result in built['dict']:
+        json.dumps(result, separators=(',', ':'))
+    print(f'{"json.dumps(dict)":<24} {rows / (time.perf_counter() - started_at):>14,.0f}')
+    started_at = time.perf_counter()
+    for record in built['TaxResult']:
+        record.to_json()
+    print(f'{"TaxResult.to_json":<24} {rows / (time.perf_counter() - started_at):>14,.0f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地压测工具
+在本机启动 gunicorn 运行 app.py，按给定并发重放 /calculate 请求组合，
+统计吞吐量、p50/p95/p99延迟和错误率，并自动扫描 worker/线程配置给出推荐。
+
+用法：
+    python benchmarks/loadtest.py --workers 1,2,4 --threads 1,4 --concurrency 8,32
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 16
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def default_payload_mix(seed: int, size: int = 500) -> list:
+    """
+    默认请求组合：约一半为整数月薪加默认扣除（真实流量中重复度高的请求），
+    其余为对数正态分布的随机月薪和扣除组合
+    """
+    rng = random.Random(seed)
+    payloads = []
+    for _ in range(size):
+        if rng.random() < 0.5:
+            payloads.append({'salary': rng.choice(range(5000, 50001, 1000)), 'salary_type': 'monthly'})
+            continue
+        salary = round(rng.lognormvariate(9.6, 0.6), 2)
+        payloads.append({
+            'salary': salary,
+            'salary_type': 'monthly',
+            'bonus': round(salary * rng.choice((0, 1, 2, 3)), 2),
+            'bonus_type': rng.choice(('separate', 'combined')),
+            'social_security_base': min(salary, 35000),
+            'housing_fund_rate': rng.choice((5, 7, 12)),
+            'special_deductions': {'children_education': rng.choice((0, 2000)),
+                                   'housing_loan': rng.choice((0, 1000))},
+        })
+    return payloads
+
+
+def load_payload_mix(path: str, seed: int, size: int = 500) -> list:
+    """
+    读取请求组合文件：[{"weight": 3, "payload": {...}}, ...]，
+    按权重抽样展开为 size 条请求
+    """
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+    rng = random.Random(seed)
+    weights = [entry.get('weight', 1) for entry in entries]
+    return [entry['payload'] for entry in rng.choices(entries, weights=weights, k=size)]
+
+
+def find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(host: str, port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request('GET', '/metrics')
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'服务在 {timeout} 秒内没有就绪')
+
+
+class GunicornServer:
+    """在本机启动一个 gunicorn 实例，作为上下文管理器使用"""
+
+    def __init__(self, workers: int, threads: int, worker_class: str, env: dict = None):
+        self.workers = workers
+        self.threads = threads
+        self.worker_class = worker_class
+        self.env = env or {}
+        self.port = find_free_port()
+        self.process = None
+
+    def __enter__(self):
+        command = [sys.executable, '-m', 'gunicorn', 'app:app',
+                   '--bind', f'127.0.0.1:{self.port}',
+                   '--workers', str(self.workers),
+                   '--threads', str(self.threads),
+                   '--worker-class', self.worker_class,
+                   '--log-level', 'warning']
+        self.process = subprocess.Popen(command, cwd=REPO_DIR, env={**os.environ, **self.env},
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready('127.0.0.1', self.port)
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_load(host: str, port: int, payloads: list, concurrency: int, duration: float,
+             warmup: float = 1.0) -> dict:
+    """
+    闭环压测：concurrency 个客户端线程各自保持一个长连接，持续发送请求直到结束时间
+
+    Returns:
+        包含吞吐量、延迟分位数（毫秒）和错误率的字典
+    """
+    bodies = [json.dumps(payload).encode('utf-8') for payload in payloads]
+    headers = {'Content-Type': 'application/json'}
+    barrier = threading.Barrier(concurrency + 1)
+    results = []
+    lock = threading.Lock()
+    timing = {}
+
+    def client(offset: int):
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        latencies = []
+        errors = 0
+        index = offset
+        barrier.wait()
+        measure_from = timing['measure_from']
+        stop_at = timing['stop_at']
+        while True:
+            started_at = time.perf_counter()
+            if started_at >= stop_at:
+                break
+            body = bodies[index % len(bodies)]
+            index += concurrency
+            try:
+                connection.request('POST', '/calculate', body, headers)
+                response = connection.getresponse()
+                response.read()
+                failed = response.status != 200
+            except (OSError, http.client.HTTPException):
+                failed = True
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+            finished_at = time.perf_counter()
+            if started_at < measure_from:
+                continue
+            if failed:
+                errors += 1
+            else:
+                latencies.append(finished_at - started_at)
+        connection.close()
+        with lock:
+            results.append((latencies, errors))
+
+    threads = [threading.Thread(target=client, args=(offset,), daemon=True) for offset in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    timing['measure_from'] = time.perf_counter() + warmup
+    timing['stop_at'] = timing['measure_from'] + duration
+    barrier.wait()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(latency for thread_latencies, _ in results for latency in thread_latencies)
+    errors = sum(thread_errors for _, thread_errors in results)
+    total = len(latencies) + errors
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'throughput': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'error_rate': errors / total if total else 0.0,
+    }
+
+
+def recommend(results: list, p99_slo_ms: float, max_error_rate: float):
+    """在满足p99延迟和错误率要求的结果中选出吞吐量最高的配置"""
+    eligible = [result for result in results
+                if result['p99_ms'] <= p99_slo_ms and result['error_rate'] <= max_error_rate]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda result: result['throughput'])
+
+
+def format_row(result: dict) -> str:
+    config = result.get('config', {})
+    label = (f'{config.get("worker_class", "-")}/w{config.get("workers", "-")}/t{config.get("threads", "-")}'
+             if config else 'external')
+    return (f'{label:<18} {result["concurrency"]:>5} {result["throughput"]:>10,.0f} '
+            f'{result["p50_ms"]:>8.2f} {result["p95_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+            f'{result["error_rate"]:>7.2%}')
+
+
+def parse_int_list(value: str) -> list:
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+def main(argv=None) -> int:
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description='/calculate 本地压测与 gunicorn 配置扫描')
+    parser.add_argument('--url', help='压测已运行的实例（如 http://127.0.0.1:8000），不启动 gunicorn')
+    parser.add_argument('--workers', default=f'{cores},{2 * cores + 1}',
+                        help='逗号分隔的 worker 数，默认为核数和 2*核数+1')
+    parser.add_argument('--threads', default='1,4', help='逗号分隔的每个 worker 线程数，默认 1,4')
+    parser.add_argument('--worker-class', default='sync,gthread',
+                        help='逗号分隔的 worker 类型，默认 sync,gthread（sync 只测试线程数为1的配置）')
+    parser.add_argument('--concurrency', default='1,8,32', help='逗号分隔的并发客户端数，默认 1,8,32')
+    parser.add_argument('--duration', type=float, default=10.0, help='每轮压测时长（秒），默认10')
+    parser.add_argument('--warmup', type=float, default=1.0, help='每轮预热时长（秒），默认1')
+    parser.add_argument('--payloads', help='请求组合JSON文件：[{"weight": 1, "payload": {...}}, ...]')
+    parser.add_argument('--seed', type=int, default=0, help='请求组合的随机种子')
+    parser.add_argument('--p99-slo', type=float, default=100.0, help='推荐配置要求的p99延迟上限（毫秒）')
+    parser.add_argument('--max-error-rate', type=float, default=0.001, help='推荐配置允许的错误率')
+    parser.add_argument('--env', action='append', default=[],
+                        help='传给 gunicorn 的环境变量 NAME=VALUE，可重复指定')
+    parser.add_argument('-o', '--output', help='结果JSON文件')
+    args = parser.parse_args(argv)
+
+    payloads = (load_payload_mix(args.payloads, args.seed) if args.payloads
+                else default_payload_mix(args.seed))
+    concurrency_levels = parse_int_list(args.concurrency)
+    env = dict(item.split('=', 1) for item in args.env)
+
+    print(f'{"config":<18} {"conc":>5} {"req/s":>10} {"p50ms":>8} {"p95ms":>8} {"p99ms":>8} {"errors":>7}')
+    results = []
+    if args.url:
+        target = urlsplit(args.url)
+        for concurrency in concurrency_levels:
+            result = run_load(target.hostname, target.port or 80, payloads, concurrency,
+                              args.duration, args.warmup)
+            results.append(result)
+            print(format_row(result), flush=True)
+    else:
+        for worker_class in args.worker_class.split(','):
+            for workers in parse_int_list(args.workers):
+                for threads in parse_int_list(args.threads):
+                    if worker_class == 'sync' and threads != 1:
+                        continue
+                    config = {'worker_class': worker_class, 'workers': workers, 'threads': threads}
+                    with GunicornServer(workers, threads, worker_class, env) as server:
+                        for concurrency in concurrency_levels:
+                            result = run_load('127.0.0.1', server.port, payloads, concurrency,
+                                              args.duration, args.warmup)
+                            result['config'] = config
+                            results.append(result)
+                            print(format_row(result), flush=True)
+
+    best = recommend(results, args.p99_slo, args.max_error_rate)
+    if best is None:
+        print(f'\n没有配置满足 p99 <= {args.p99_slo}ms 且错误率 <= {args.max_error_rate:.2%}')
+    elif 'config' in best:
+        config = best['config']
+        print(f'\n推荐配置（{cores} 核）：gunicorn app:app --worker-class {config["worker_class"]} '
+              f'--workers {config["workers"]} --threads {config["threads"]}'
+              f'（并发 {best["concurrency"]} 时 {best["throughput"]:,.0f} req/s，p99 {best["p99_ms"]:.1f}ms）')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'cores': cores, 'results': results, 'recommended': best}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+离线基准测试套件
+覆盖计算引擎、批量接口和 /calculate Web接口，输入来自固定种子的合成工资分布，
+结果以JSON输出（每秒操作数、p50/p99延迟、峰值内存），并可与保存的基线对比。
+
+用法：
+    python benchmarks/suite.py -o baseline.json
+    python benchmarks/suite.py --compare baseline.json --threshold 0.1 --p99-threshold 0.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from tax_calculator import DEFAULT_TAX_TABLE, TaxCalculator, calculate_tax  # noqa: E402
+
+BATCH_ROWS = 10000
+
+
+def synthetic_profile(rng: random.Random) -> dict:
+    """生成一条合成输入：月薪服从对数正态分布，奖金为0到3个月工资"""
+    salary = round(rng.lognormvariate(9.6, 0.6), 2)
+    return {
+        'salary': salary,
+        'salary_type': 'monthly',
+        'bonus': round(salary * rng.choice((0, 0, 1, 2, 3)), 2),
+        'bonus_type': rng.choice(('separate', 'combined')),
+        'labor_income': rng.choice((0, 0, 0, round(rng.uniform(1000, 20000), 2))),
+        'social_security_base': min(salary, 35000),
+        'housing_fund_rate': rng.choice((5, 7, 12)),
+        'special_deductions': {
+            'children_education': rng.choice((0, 2000)),
+            'housing_loan': rng.choice((0, 1000)),
+            'elderly_care': rng.choice((0, 3000)),
+        },
+    }
+
+
+def synthetic_columns(rng: random.Random, rows: int) -> dict:
+    """生成一块列式输入，供批量接口使用"""
+    profiles = [synthetic_profile(rng) for _ in range(rows)]
+    columns = {name: np.array([profile[name] for profile in profiles])
+               for name in profiles[0] if name != 'special_deductions'}
+    columns['special_deductions'] = np.array(
+        [float(sum(profile['special_deductions'].values())) for profile in profiles])
+    return columns
+
+
+# 每个用例的 setup(rng, iterations) 返回 (被测函数, 每次调用的参数列表, 每次调用处理的条数)
+
+def setup_calculate_tax(rng, iterations):
+    return (lambda profile: calculate_tax(**profile),
+            [(synthetic_profile(rng),) for _ in range(iterations)], 1)
+
+
+def setup_bracket_lookup(rng, iterations):
+    return (DEFAULT_TAX_TABLE.find_bracket,
+            [(rng.uniform(-10000, 1500000),) for _ in range(iterations)], 1)
+
+
+def setup_bonus_tax(rng, iterations):
+    calculator = TaxCalculator()
+    return (calculator.calculate_bonus_tax,
+            [(rng.uniform(0, 1000000),) for _ in range(iterations)], 1)
+
+
+def setup_optimize_bonus_plan(rng, iterations):
+    calculator = TaxCalculator()
+    return (calculator.optimize_bonus_plan,
+            [(rng.lognormvariate(11.5, 0.6), rng.uniform(0, 300000), rng.choice((0, 1000, 3000)))
+             for _ in range(iterations)], 1)
+
+
+def setup_flask_calculate(rng, iterations):
+    import app as web_app
+    web_app.result_cache.clear()
+    client = web_app.app.test_client()
+
+    def post(payload):
+        response = client.post('/calculate', json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'/calculate returned {response.status_code}')
+
+    return post, [(synthetic_profile(rng),) for _ in range(iterations)], 1
+
+
+def setup_calculate_tax_batch(rng, iterations):
+    from tax_batch import calculate_tax_batch
+    chunks = [synthetic_columns(rng, BATCH_ROWS) for _ in range(max(1, min(iterations, 20)))]
+    return (lambda columns: calculate_tax_batch(**columns),
+            [(chunks[index % len(chunks)],) for index in range(iterations)], BATCH_ROWS)
+
+
+def setup_fixed_point_batch(rng, iterations):
+    from tax_fixed_point import calculate_tax_cents_batch, to_cents_array
+    chunks = []
+    for _ in range(max(1, min(iterations, 20))):
+        columns = synthetic_columns(rng, BATCH_ROWS)
+        chunks.append({
+            'salary': to_cents_array(columns['salary']),
+            'bonus': to_cents_array(columns['bonus']),
+            'bonus_type': columns['bonus_type'],
+            'labor_income': to_cents_array(columns['labor_income']),
+            'social_security_base': to_cents_array(columns['social_security_base']),
+            'housing_fund_rate_bps': np.rint(columns['housing_fund_rate'] * 100).astype(np.int64),
+            'special_deductions': to_cents_array(columns['special_deductions']),
+        })
+    return (lambda columns: calculate_tax_cents_batch(**columns),
+            [(chunks[index % len(chunks)],) for index in range(iterations)], BATCH_ROWS)
+
+
+# 用例名称 -> (setup, 默认迭代次数)
+CASES = {
+    'calculate_tax': (setup_calculate_tax, 20000),
+    'bracket_lookup': (setup_bracket_lookup, 100000),
+    'calculate_bonus_tax': (setup_bonus_tax, 100000),
+    'optimize_bonus_plan': (setup_optimize_bonus_plan, 20000),
+    'flask_calculate': (setup_flask_calculate, 3000),
+    'calculate_tax_batch': (setup_calculate_tax_batch, 50),
+    'fixed_point_batch': (setup_fixed_point_batch, 50),
+}
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def run_case(name: str, seed: int, iterations: int = None, warmup: int = 100, repeats: int = 3) -> dict:
+    """
+    运行单个用例
+
+    用全部参数重复计时 repeats 轮，吞吐量和p50取各轮的中位数，单轮受干扰时不影响结果；
+    p99取所有轮次合并后的分位数。之后再在 tracemalloc 下跑一遍测峰值内存，
+    避免内存跟踪拖慢计时。
+    """
+    setup, default_iterations = CASES[name]
+    iterations = iterations or default_iterations
+    function, arguments, items_per_op = setup(random.Random(seed), iterations)
+
+    for args in arguments[:min(warmup, len(arguments))]:
+        function(*args)
+
+    latencies = []
+    throughputs = []
+    medians = []
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(max(1, repeats)):
+        round_latencies = []
+        started_at = perf_counter_ns()
+        for args in arguments:
+            call_started_at = perf_counter_ns()
+            function(*args)
+            round_latencies.append(perf_counter_ns() - call_started_at)
+        elapsed = (perf_counter_ns() - started_at) / 1e9
+        throughputs.append(len(arguments) / elapsed)
+        round_latencies.sort()
+        medians.append(percentile(round_latencies, 0.50))
+        latencies.extend(round_latencies)
+
+    tracemalloc.start()
+    for args in arguments[:min(len(arguments), 1000)]:
+        function(*args)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    ops_per_sec = statistics.median(throughputs)
+    return {
+        'iterations': len(arguments),
+        'repeats': len(throughputs),
+        'items_per_op': items_per_op,
+        'ops_per_sec': ops_per_sec,
+        'items_per_sec': ops_per_sec * items_per_op,
+        'p50_us': statistics.median(medians) / 1000,
+        'p99_us': percentile(latencies, 0.99) / 1000,
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def run_suite(cases: list, seed: int, iterations: int = None, repeats: int = 3, stream=sys.stderr) -> dict:
+    results = {}
+    for name in cases:
+        results[name] = run_case(name, seed, iterations, repeats=repeats)
+        stream.write(f'{name:<24} {results[name]["ops_per_sec"]:>14,.0f} ops/s  '
+                     f'p50 {results[name]["p50_us"]:>10.1f}us  p99 {results[name]["p99_us"]:>10.1f}us\n')
+        stream.flush()
+    return {
+        'meta': {
+            'seed': seed,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float, p99_threshold: float = 0.5) -> list:
+    """
+    与基线对比
+
+    吞吐量和p50是多轮的中位数，比较稳定，下降或上升超过 threshold 时视为退化；
+    p99受单次停顿（GC、调度）影响大，使用更宽的 p99_threshold。
+
+    Returns:
+        [(用例, 指标, 基线值, 当前值, 变化比例), ...] 形式的退化列表
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        ops_change = result['ops_per_sec'] / base['ops_per_sec'] - 1
+        if ops_change < -threshold:
+            regressions.append((name, 'ops_per_sec', base['ops_per_sec'], result['ops_per_sec'], ops_change))
+        for metric, limit in (('p50_us', threshold), ('p99_us', p99_threshold)):
+            change = result[metric] / base[metric] - 1 if base.get(metric) else 0.0
+            if change > limit:
+                regressions.append((name, metric, base[metric], result[metric], change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='个税计算器基准测试套件')
+    parser.add_argument('-o', '--output', help='结果JSON文件，默认输出到标准输出')
+    parser.add_argument('--cases', default=','.join(CASES),
+                        help=f'逗号分隔的用例列表，默认全部：{",".join(CASES)}')
+    parser.add_argument('--iterations', type=int, help='每个用例的调用次数，默认使用各用例的设置')
+    parser.add_argument('--seed', type=int, default=20250101, help='合成数据的随机种子')
+    parser.add_argument('--compare', help='用于对比的基线JSON文件')
+    parser.add_argument('--repeats', type=int, default=3, help='每个用例重复计时的轮数，默认3')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='吞吐量和p50视为退化的变化比例，默认0.10')
+    parser.add_argument('--p99-threshold', type=float, default=0.50,
+                        help='p99延迟视为退化的变化比例，默认0.50')
+    args = parser.parse_args(argv)
+
+    cases = [name.strip() for name in args.cases.split(',') if name.strip()]
+    unknown = [name for name in cases if name not in CASES]
+    if unknown:
+        parser.error(f'未知用例：{", ".join(unknown)}')
+
+    report = run_suite(cases, args.seed, args.iterations, args.repeats)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.p99_threshold)
+        for name, metric, base, current, change in regressions:
+            sys.stderr.write(f'退化：{name} {metric} {base:,.2f} -> {current:,.2f} ({change:+.1%})\n')
+        if regressions:
+            return 1
+        sys.stderr.write('未发现退化\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
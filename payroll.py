@@ -0,0 +1,775 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+工资表批量计税命令行工具
+流式读取员工CSV，分块做向量化计算，结果写入CSV，内存占用与文件大小无关
+
+用法：
+    python payroll.py run employees.csv -o results.csv
+    python payroll.py run employees.csv -o results.csv --workers 8
+    python payroll.py scaling --rows 1000000 --max-workers 8
+    python payroll.py traps bonuses.csv -o traps.csv --id-column employee_id
+    python payroll.py withhold 2025-03.csv -o tax-03.csv --ledger ledger.npz --month 3
+    python payroll.py payments payments.csv -o payees.csv --by-payee
+    python payroll.py reconcile annual.csv -o settlement.csv --id-column employee_id
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from tax_batch import (RESULT_FIELDS, aggregate_payments_batch, calculate_payments_batch, get_batch_calculator,
+                       calculate_tax_batch)
+from tax_calculator import TaxBracketTable, get_rules
+from tax_ledger import WithholdingLedger
+from tax_payments import PAYEE_FIELDS, PAYMENT_FIELDS
+from tax_reconciliation import RECONCILIATION_FIELDS, reconcile_batch
+from tax_traps import detect_bonus_traps, monthly_bonus_table
+
+# 数值型输入列及缺省值，列名与 calculate_tax 的参数相同
+NUMERIC_COLUMNS = (
+    'salary',
+    'bonus',
+    'labor_income',
+    'manuscript_income',
+    'license_income',
+    'social_security_base',
+    'housing_fund_rate',
+)
+
+# 可以按项给出的专项附加扣除列，与 special_deductions 总额列相加
+SPECIAL_DEDUCTION_COLUMNS = (
+    'special_deductions',
+    'children_education',
+    'continuing_education',
+    'housing_loan',
+    'housing_rent',
+    'elderly_care',
+    'other',
+)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# 雷区检测输出的字段
+TRAP_FIELDS = ('bonus', 'lower_safe_bonus', 'upper_safe_bonus', 'nearest_safe_bonus', 'net_loss')
+
+# 月度预扣预缴输出的字段
+WITHHOLDING_FIELDS = ('month', 'monthly_tax', 'accumulated_income', 'accumulated_deduction', 'accumulated_tax')
+
+
+class PayrollInputError(ValueError):
+    """输入CSV中某一行的数据无效"""
+
+
+def _parse_number(row: dict, column: str, line_number: int) -> float:
+    value = row.get(column)
+    if value is None or value.strip() == '':
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        raise PayrollInputError(f'第{line_number}行 {column} 列不是有效的数字：{value!r}')
+
+
+def rows_to_columns(rows: list, first_line_number: int = 2) -> dict:
+    """
+    将一块CSV行转换为 calculate_tax_batch 的列参数
+
+    Args:
+        rows: csv.DictReader 读出的行
+        first_line_number: 第一行在文件中的行号，用于报错
+
+    Returns:
+        {参数名: 数组} 形式的列参数
+    """
+    columns = {column: [] for column in NUMERIC_COLUMNS}
+    salary_types = []
+    bonus_types = []
+    special_deductions = []
+    for offset, row in enumerate(rows):
+        line_number = first_line_number + offset
+        for column in NUMERIC_COLUMNS:
+            columns[column].append(_parse_number(row, column, line_number))
+        salary_types.append(row.get('salary_type') or 'monthly')
+        bonus_types.append(row.get('bonus_type') or 'separate')
+        special_deductions.append(sum(_parse_number(row, column, line_number)
+                                      for column in SPECIAL_DEDUCTION_COLUMNS if column in row))
+
+    arrays = {column: np.array(values, dtype=np.float64) for column, values in columns.items()}
+    arrays['salary_type'] = np.array(salary_types)
+    arrays['bonus_type'] = np.array(bonus_types)
+    arrays['special_deductions'] = np.array(special_deductions, dtype=np.float64)
+    # 有 city 列时按城市规则计算社保公积金，空值的行按统一比例计算
+    if rows and 'city' in rows[0]:
+        arrays['city'] = np.array([row.get('city') or '' for row in rows])
+    return arrays
+
+
+def iter_chunks(reader, chunk_size: int):
+    """按块读取CSV行，每次只在内存中保留一块"""
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_results(writer, ids: list, results: dict):
+    """按行写出一块计算结果，ids 为各行需要原样保留的标识列"""
+    columns = [results[field].tolist() for field in RESULT_FIELDS]
+    if ids:
+        writer.writerows(list(row_ids) + list(values) for row_ids, values in zip(ids, zip(*columns)))
+    else:
+        writer.writerows(zip(*columns))
+
+
+class ProgressReporter:
+    """定期向标准错误输出已处理行数和处理速度"""
+
+    def __init__(self, stream=sys.stderr, interval: float = 1.0):
+        self.stream = stream
+        self.interval = interval
+        self.started_at = time.perf_counter()
+        self.reported_at = self.started_at
+        self.rows = 0
+
+    def update(self, rows: int):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.reported_at >= self.interval:
+            self.reported_at = now
+            self._report(now)
+
+    def finish(self):
+        self._report(time.perf_counter(), final=True)
+
+    def _report(self, now: float, final: bool = False):
+        elapsed = now - self.started_at
+        rate = self.rows / elapsed if elapsed > 0 else 0.0
+        prefix = '完成' if final else '已处理'
+        self.stream.write(f'{prefix} {self.rows:,} 行，用时 {elapsed:.1f} 秒，{rate:,.0f} 行/秒\n')
+        self.stream.flush()
+
+
+def _init_worker(tax_year: int = None):
+    """工作进程初始化：每个进程只构建一次税率表和批量计算器"""
+    get_batch_calculator(tax_year)
+
+
+def _calculate_columns(columns: dict) -> dict:
+    return calculate_tax_batch(**columns)
+
+
+def _process_lines(fieldnames: list, lines: list, first_line_number: int, id_columns,
+                   tax_year: int = None) -> tuple:
+    """在工作进程中解析、计算并格式化一块CSV原始行，返回 (结果CSV文本, 行数)"""
+    chunk = list(csv.DictReader(lines, fieldnames=fieldnames))
+    output = io.StringIO()
+    columns = rows_to_columns(chunk, first_line_number=first_line_number)
+    ids = [[row[column] for column in id_columns] for row in chunk] if id_columns else None
+    write_results(csv.writer(output), ids, calculate_tax_batch(**columns, tax_year=tax_year))
+    return output.getvalue(), len(lines)
+
+
+def calculate_tax_parallel(columns: dict, workers: int = None,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    多进程批量计算个人所得税
+
+    输入按行切分为若干块，以NumPy列数组的形式发送到工作进程，
+    结果按原始行顺序拼接。
+
+    Args:
+        columns: calculate_tax_batch 的列参数，数组需等长；special_deductions 可以是
+            月度专项附加扣除总额数组，或 {扣除项名称: 数组} 形式的字典
+        workers: 工作进程数，默认为CPU核数
+        chunk_size: 每块的行数
+
+    Returns:
+        {字段名: 数组} 形式的列式结果，与 calculate_tax_batch 相同
+    """
+    columns = dict(columns)
+    special_deductions = columns.pop('special_deductions', None)
+    if isinstance(special_deductions, dict):
+        # 与 calculate_tax_batch 相同的顺序按项累加，结果与逐条计算逐位一致
+        total = 0
+        for value in special_deductions.values():
+            total = total + np.asarray(value, dtype=np.float64)
+        special_deductions = total
+    if special_deductions is not None:
+        columns['special_deductions'] = special_deductions
+    arrays = {name: np.asarray(value) for name, value in columns.items()}
+    size = max((len(array) for array in arrays.values() if array.ndim), default=1)
+    arrays = {name: np.broadcast_to(array, (size,)) if array.ndim == 0 else array
+              for name, array in arrays.items()}
+    shards = ({name: array[start:start + chunk_size] for name, array in arrays.items()}
+              for start in range(0, size, chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as executor:
+        results = list(executor.map(_calculate_columns, shards))
+
+    return {field: np.concatenate([result[field] for result in results]) for field in RESULT_FIELDS}
+
+
+def _process_csv_parallel(input_file, output_file, fieldnames: list, chunk_size: int,
+                          id_columns, workers: int, progress: ProgressReporter, tax_year: int = None) -> int:
+    """
+    多进程处理CSV：主进程只按行切块，解析、计算和格式化都在工作进程中完成
+
+    同时在途的块数限制为工作进程数的两倍，结果按提交顺序写出，
+    因此输出顺序与输入一致，内存占用也有上限。
+    """
+    pending = deque()
+    total_rows = 0
+    submitted_rows = 0
+
+    def write_next():
+        text, rows = pending.popleft().result()
+        output_file.write(text)
+        if progress is not None:
+            progress.update(rows)
+        return rows
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tax_year,)) as executor:
+        while True:
+            lines = list(islice(input_file, chunk_size))
+            if not lines:
+                break
+            pending.append(executor.submit(_process_lines, fieldnames, lines,
+                                           submitted_rows + 2, list(id_columns), tax_year))
+            submitted_rows += len(lines)
+            if len(pending) >= workers * 2:
+                total_rows += write_next()
+        while pending:
+            total_rows += write_next()
+    return total_rows
+
+
+def process_csv(input_file, output_file, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                id_columns=(), progress: ProgressReporter = None, workers: int = 1,
+                tax_year: int = None) -> int:
+    """
+    流式处理员工CSV
+
+    Args:
+        input_file: 已打开的输入文件
+        output_file: 已打开的输出文件
+        chunk_size: 每块的行数
+        id_columns: 原样复制到结果中的标识列（如工号）
+        progress: 进度报告器
+        workers: 工作进程数，大于1时使用多进程（此时字段内不能包含换行）
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        处理的行数
+
+    Raises:
+        ValueError: 没有该年度的规则
+    """
+    # 没有该年度的规则时在写出表头之前报错
+    get_batch_calculator(tax_year)
+    reader = csv.DictReader(input_file)
+    missing = [column for column in id_columns if column not in (reader.fieldnames or ())]
+    if missing:
+        raise PayrollInputError(f'输入文件缺少列：{", ".join(missing)}')
+
+    writer = csv.writer(output_file)
+    writer.writerow(list(id_columns) + list(RESULT_FIELDS))
+
+    if workers > 1:
+        total_rows = _process_csv_parallel(input_file, output_file, reader.fieldnames, chunk_size,
+                                           id_columns, workers, progress, tax_year)
+        if progress is not None:
+            progress.finish()
+        return total_rows
+
+    total_rows = 0
+    for chunk in iter_chunks(reader, chunk_size):
+        columns = rows_to_columns(chunk, first_line_number=total_rows + 2)
+        ids = [[row[column] for column in id_columns] for row in chunk] if id_columns else None
+        write_results(writer, ids, calculate_tax_batch(**columns, tax_year=tax_year))
+        total_rows += len(chunk)
+        if progress is not None:
+            progress.update(len(chunk))
+
+    if progress is not None:
+        progress.finish()
+    return total_rows
+
+
+def _open_input(path: str):
+    if path == '-':
+        return sys.stdin
+    return open(path, newline='', encoding='utf-8-sig')
+
+
+def _open_output(path: str):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', newline='', encoding='utf-8')
+
+
+def run_command(args) -> int:
+    progress = None if args.quiet else ProgressReporter(interval=args.progress_interval)
+    input_file = _open_input(args.input)
+    output_file = _open_output(args.output)
+    try:
+        process_csv(input_file, output_file, chunk_size=args.chunk_size,
+                    id_columns=args.id_column, progress=progress,
+                    workers=args.workers or os.cpu_count(), tax_year=args.tax_year)
+    except ValueError as e:
+        # PayrollInputError 以及批量计算报告的无效数据（如没有规则的城市）
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    return 0
+
+
+def detect_traps_csv(input_file, output_file, chunk_size: int = DEFAULT_CHUNK_SIZE, id_columns=(),
+                     tax_table: TaxBracketTable = None, include_all: bool = False) -> tuple:
+    """
+    流式检测年终奖CSV中落在雷区的员工
+
+    Args:
+        input_file: 已打开的输入文件，需要 bonus 列，bonus_type 列可选
+        output_file: 已打开的输出文件
+        chunk_size: 每块的行数
+        id_columns: 原样复制到结果中的标识列（如工号）
+        tax_table: 税率表，默认使用共享税率表
+        include_all: 为 True 时输出所有行，否则只输出落在雷区的行
+
+    Returns:
+        (处理的行数, 落在雷区的行数)
+    """
+    reader = csv.DictReader(input_file)
+    missing = [column for column in ('bonus',) + tuple(id_columns) if column not in (reader.fieldnames or ())]
+    if missing:
+        raise PayrollInputError(f'输入文件缺少列：{", ".join(missing)}')
+
+    writer = csv.writer(output_file)
+    writer.writerow(list(id_columns) + ['in_trap'] + list(TRAP_FIELDS))
+
+    total_rows = 0
+    trapped_rows = 0
+    for chunk in iter_chunks(reader, chunk_size):
+        bonus = np.array([_parse_number(row, 'bonus', total_rows + 2 + offset)
+                          for offset, row in enumerate(chunk)], dtype=np.float64)
+        bonus_type = np.array([row.get('bonus_type') or 'separate' for row in chunk])
+        result = detect_bonus_traps(bonus, bonus_type, tax_table)
+        result['bonus'] = bonus
+        selected = np.arange(len(chunk)) if include_all else np.flatnonzero(result['in_trap'])
+        columns = [result[field][selected].tolist() for field in ('in_trap',) + TRAP_FIELDS]
+        for position, values in zip(selected.tolist(), zip(*columns)):
+            writer.writerow([chunk[position][column] for column in id_columns] + [int(values[0])] + list(values[1:]))
+        total_rows += len(chunk)
+        trapped_rows += int(result['in_trap'].sum())
+    return total_rows, trapped_rows
+
+
+def traps_command(args) -> int:
+    input_file = _open_input(args.input)
+    output_file = _open_output(args.output)
+    try:
+        tax_table = get_rules(args.tax_year).tax_table
+        if args.bonus_table == 'monthly':
+            tax_table = monthly_bonus_table(tax_table)
+        rows, trapped = detect_traps_csv(input_file, output_file, chunk_size=args.chunk_size,
+                                         id_columns=args.id_column, tax_table=tax_table,
+                                         include_all=args.all)
+    except ValueError as e:
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    if not args.quiet:
+        sys.stderr.write(f'共 {rows:,} 行，{trapped:,} 行年终奖落在雷区\n')
+    return 0
+
+
+def withhold_csv(input_file, output_file, ledger: WithholdingLedger, month: int, id_column: str,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    用台账流式处理一个月的工资CSV，只更新出现在文件中的员工
+
+    Args:
+        input_file: 已打开的输入文件，需要员工标识列和 salary 列
+        output_file: 已打开的输出文件
+        ledger: 累计预扣预缴台账
+        month: 发薪月份
+        id_column: 员工标识列
+        chunk_size: 每块的行数
+
+    Returns:
+        处理的行数
+    """
+    reader = csv.DictReader(input_file)
+    missing = [column for column in (id_column, 'salary') if column not in (reader.fieldnames or ())]
+    if missing:
+        raise PayrollInputError(f'输入文件缺少列：{", ".join(missing)}')
+
+    writer = csv.writer(output_file)
+    writer.writerow([id_column] + list(WITHHOLDING_FIELDS))
+    batch_calculator = get_batch_calculator(ledger.tax_year)
+
+    total_rows = 0
+    for chunk in iter_chunks(reader, chunk_size):
+        columns = rows_to_columns(chunk, total_rows + 2)
+        income = np.where(columns['salary_type'] == 'annual', columns['salary'] / 12, columns['salary'])
+        social_security, housing_fund = batch_calculator.calculate_contributions(
+            columns['social_security_base'], columns['housing_fund_rate'], columns.get('city'))
+        ids = [row[id_column] for row in chunk]
+        monthly_tax = ledger.pay_batch(ids, month, income, social_security + housing_fund,
+                                       columns['special_deductions'])
+        positions = [ledger.index[employee_id] for employee_id in ids]
+        writer.writerows(zip(ids, [month] * len(ids), monthly_tax.tolist(),
+                             ledger.income[positions].tolist(), ledger.deduction[positions].tolist(),
+                             ledger.tax_paid[positions].tolist()))
+        total_rows += len(chunk)
+    return total_rows
+
+
+def withhold_command(args) -> int:
+    try:
+        if os.path.exists(args.ledger):
+            ledger = WithholdingLedger.load(args.ledger)
+            if args.tax_year is not None and args.tax_year != ledger.tax_year:
+                raise ValueError(f'台账 {args.ledger} 属于 {ledger.tax_year} 年度')
+        else:
+            ledger = WithholdingLedger(args.tax_year)
+    except (OSError, ValueError) as e:
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+
+    input_file = _open_input(args.input)
+    output_file = _open_output(args.output)
+    try:
+        rows = withhold_csv(input_file, output_file, ledger, args.month, args.id_column,
+                            chunk_size=args.chunk_size)
+    except ValueError as e:
+        # 出错时不保存台账，修正输入后可以用原快照重新处理本月
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    ledger.save(args.ledger)
+    if not args.quiet:
+        sys.stderr.write(f'{args.month}月共处理 {rows:,} 行，台账共 {len(ledger):,} 名员工\n')
+    return 0
+
+
+def _read_payments(chunk: list, first_line_number: int, payee_column: str) -> tuple:
+    payees = [row[payee_column] for row in chunk]
+    categories = [row['category'] for row in chunk]
+    amounts = np.array([_parse_number(row, 'amount', first_line_number + offset)
+                        for offset, row in enumerate(chunk)], dtype=np.float64)
+    periods = [row.get('period') or '' for row in chunk]
+    return payees, categories, amounts, periods
+
+
+def payments_csv(input_file, output_file, payee_column: str = 'payee', chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 by_payee: bool = False, tax_year: int = None) -> int:
+    """
+    计算劳务报酬、稿酬、特许权使用费支付CSV的预扣税额
+
+    逐笔输出时分块流式处理；按收款人汇总时读入全部支付（每笔只保留4列），
+    有 period 列时同一收款人同一类别同一期间的支付合并为一次计税。
+
+    Args:
+        input_file: 已打开的输入文件，需要收款人列、category 和 amount 列
+        output_file: 已打开的输出文件
+        payee_column: 收款人列
+        chunk_size: 每块的行数
+        by_payee: 为 True 时按收款人汇总输出
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        处理的支付笔数
+    """
+    reader = csv.DictReader(input_file)
+    missing = [column for column in (payee_column, 'category', 'amount')
+               if column not in (reader.fieldnames or ())]
+    if missing:
+        raise PayrollInputError(f'输入文件缺少列：{", ".join(missing)}')
+    has_period = 'period' in reader.fieldnames
+
+    writer = csv.writer(output_file)
+    total_rows = 0
+    if not by_payee:
+        writer.writerow([payee_column, 'category', 'amount'] + list(PAYMENT_FIELDS))
+        for chunk in iter_chunks(reader, chunk_size):
+            payees, categories, amounts, _ = _read_payments(chunk, total_rows + 2, payee_column)
+            result = calculate_payments_batch(categories, amounts, tax_year)
+            columns = [result[field].tolist() for field in PAYMENT_FIELDS]
+            writer.writerows([payee, category, amount] + list(values) for payee, category, amount, values
+                             in zip(payees, categories, amounts.tolist(), zip(*columns)))
+            total_rows += len(chunk)
+        return total_rows
+
+    payees, categories, amounts, periods = [], [], [], []
+    for chunk in iter_chunks(reader, chunk_size):
+        columns = _read_payments(chunk, total_rows + 2, payee_column)
+        for values, column in zip((payees, categories, amounts, periods), columns):
+            values.append(np.asarray(column))
+        total_rows += len(chunk)
+    writer.writerow([payee_column] + list(PAYEE_FIELDS))
+    if not total_rows:
+        return 0
+    totals = aggregate_payments_batch(np.concatenate(payees), np.concatenate(categories),
+                                      np.concatenate(amounts),
+                                      np.concatenate(periods) if has_period else None, tax_year)
+    writer.writerows(zip(totals['payee'].tolist(), *(totals[field].tolist() for field in PAYEE_FIELDS)))
+    return total_rows
+
+
+def payments_command(args) -> int:
+    input_file = _open_input(args.input)
+    output_file = _open_output(args.output)
+    try:
+        rows = payments_csv(input_file, output_file, payee_column=args.payee_column,
+                            chunk_size=args.chunk_size, by_payee=args.by_payee, tax_year=args.tax_year)
+    except ValueError as e:
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    if not args.quiet:
+        sys.stderr.write(f'共处理 {rows:,} 笔支付\n')
+    return 0
+
+
+def reconcile_csv(input_file, output_file, chunk_size: int = DEFAULT_CHUNK_SIZE, id_columns=(),
+                  tax_year: int = None) -> int:
+    """
+    流式计算全年收入CSV的综合所得年度汇算
+
+    输入列与 run 相同（工资、专项附加扣除和社保公积金按月给出，salary_type 为 annual 时工资为全年金额，
+    其余收入为全年金额），另外读取全年已预缴税额 withheld_tax 和其他扣除 other_deductions 列。
+
+    Args:
+        input_file: 已打开的输入文件
+        output_file: 已打开的输出文件
+        chunk_size: 每块的行数
+        id_columns: 原样复制到结果中的标识列（如工号）
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        处理的行数
+    """
+    reader = csv.DictReader(input_file)
+    missing = [column for column in id_columns if column not in (reader.fieldnames or ())]
+    if missing:
+        raise PayrollInputError(f'输入文件缺少列：{", ".join(missing)}')
+
+    writer = csv.writer(output_file)
+    writer.writerow(list(id_columns) + list(RECONCILIATION_FIELDS))
+    batch_calculator = get_batch_calculator(tax_year)
+
+    total_rows = 0
+    for chunk in iter_chunks(reader, chunk_size):
+        first_line_number = total_rows + 2
+        columns = rows_to_columns(chunk, first_line_number)
+        annual = {column: np.array([_parse_number(row, column, first_line_number + offset)
+                                    for offset, row in enumerate(chunk)], dtype=np.float64)
+                  for column in ('withheld_tax', 'other_deductions')}
+        social_security, housing_fund = batch_calculator.calculate_contributions(
+            columns['social_security_base'], columns['housing_fund_rate'], columns.get('city'))
+        salary_income = np.where(columns['salary_type'] == 'annual', columns['salary'], columns['salary'] * 12)
+        result = reconcile_batch(
+            salary_income=salary_income, bonus=columns['bonus'], labor_income=columns['labor_income'],
+            manuscript_income=columns['manuscript_income'], license_income=columns['license_income'],
+            social_insurance=(social_security + housing_fund) * 12,
+            special_deductions=columns['special_deductions'] * 12,
+            other_deductions=annual['other_deductions'], withheld_tax=annual['withheld_tax'],
+            bonus_type=columns['bonus_type'], tax_year=tax_year)
+        result['exempt'] = result['exempt'].astype(int)
+        values = [result[field].tolist() for field in RECONCILIATION_FIELDS]
+        if id_columns:
+            writer.writerows([row[column] for column in id_columns] + list(row_values)
+                             for row, row_values in zip(chunk, zip(*values)))
+        else:
+            writer.writerows(zip(*values))
+        total_rows += len(chunk)
+    return total_rows
+
+
+def reconcile_command(args) -> int:
+    input_file = _open_input(args.input)
+    output_file = _open_output(args.output)
+    try:
+        rows = reconcile_csv(input_file, output_file, chunk_size=args.chunk_size,
+                             id_columns=args.id_column, tax_year=args.tax_year)
+    except ValueError as e:
+        sys.stderr.write(f'错误：{e}\n')
+        return 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    if not args.quiet:
+        sys.stderr.write(f'共完成 {rows:,} 人的年度汇算\n')
+    return 0
+
+
+def write_synthetic_csv(path: str, rows: int, seed: int = 0):
+    """生成用于测速的员工CSV，工资服从对数正态分布"""
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['employee_id', 'salary', 'bonus', 'bonus_type', 'social_security_base',
+                         'housing_fund_rate', 'children_education', 'housing_loan', 'elderly_care'])
+        for index in range(rows):
+            salary = round(rng.lognormvariate(9.6, 0.6), 2)
+            writer.writerow([
+                f'E{index:08d}', salary, round(salary * rng.choice((0, 0, 1, 2, 3)), 2),
+                rng.choice(('separate', 'combined')), min(salary, 35000), rng.choice((5, 7, 12)),
+                rng.choice((0, 2000)), rng.choice((0, 1000)), rng.choice((0, 3000))
+            ])
+
+
+def measure_scaling(input_path: str, max_workers: int, chunk_size: int, stream=sys.stdout) -> list:
+    """
+    依次用1到 max_workers 个工作进程处理同一个CSV，输出加速比曲线
+
+    Returns:
+        [(工作进程数, 行/秒, 加速比), ...]
+    """
+    curve = []
+    stream.write(f'{"workers":>8} {"rows/s":>12} {"speedup":>8}\n')
+    for workers in range(1, max_workers + 1):
+        started_at = time.perf_counter()
+        with open(input_path, newline='', encoding='utf-8') as input_file, \
+                open(os.devnull, 'w', newline='') as output_file:
+            rows = process_csv(input_file, output_file, chunk_size=chunk_size, workers=workers)
+        rate = rows / (time.perf_counter() - started_at)
+        speedup = rate / curve[0][1] if curve else 1.0
+        curve.append((workers, rate, speedup))
+        stream.write(f'{workers:>8} {rate:>12,.0f} {speedup:>8.2f}\n')
+        stream.flush()
+    return curve
+
+
+def scaling_command(args) -> int:
+    if args.input:
+        measure_scaling(args.input, args.max_workers, args.chunk_size)
+        return 0
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'employees.csv')
+        write_synthetic_csv(path, args.rows, seed=args.seed)
+        measure_scaling(path, args.max_workers, args.chunk_size)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='工资表批量计税工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='计算员工CSV并输出结果CSV')
+    run_parser.add_argument('input', help='输入CSV文件，"-" 表示标准输入')
+    run_parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认输出到标准输出')
+    run_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    run_parser.add_argument('--id-column', action='append', default=[],
+                            help='原样复制到结果中的列（如工号），可重复指定')
+    run_parser.add_argument('--progress-interval', type=float, default=1.0,
+                            help='进度报告间隔（秒），默认1秒')
+    run_parser.add_argument('-q', '--quiet', action='store_true', help='不输出进度')
+    run_parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='工作进程数，默认1（单进程），0表示使用全部CPU核')
+    run_parser.add_argument('--tax-year', type=int, help='纳税年度，默认使用规则默认年度')
+    run_parser.set_defaults(handler=run_command)
+
+    scaling_parser = subparsers.add_parser('scaling', help='测量1到N个工作进程的处理速度')
+    scaling_parser.add_argument('--input', help='用于测速的CSV文件，默认生成合成数据')
+    scaling_parser.add_argument('--rows', type=int, default=500000, help='合成数据的行数，默认500000')
+    scaling_parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    scaling_parser.add_argument('--max-workers', type=int, default=os.cpu_count(),
+                                help='最大工作进程数，默认为CPU核数')
+    scaling_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                                help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    scaling_parser.set_defaults(handler=scaling_command)
+
+    traps_parser = subparsers.add_parser('traps', help='检测年终奖落在雷区的员工')
+    traps_parser.add_argument('input', help='输入CSV文件（需要 bonus 列），"-" 表示标准输入')
+    traps_parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认输出到标准输出')
+    traps_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                              help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    traps_parser.add_argument('--id-column', action='append', default=[],
+                              help='原样复制到结果中的列（如工号），可重复指定')
+    traps_parser.add_argument('--bonus-table', choices=('annual', 'monthly'), default='annual',
+                              help='年终奖单独计税的速算扣除数：annual 与计算器一致（默认），'
+                                   'monthly 使用月度税率表的速算扣除数')
+    traps_parser.add_argument('--tax-year', type=int, help='纳税年度，默认使用规则默认年度')
+    traps_parser.add_argument('--all', action='store_true', help='输出所有行，默认只输出落在雷区的行')
+    traps_parser.add_argument('-q', '--quiet', action='store_true', help='不输出汇总')
+    traps_parser.set_defaults(handler=traps_command)
+
+    withhold_parser = subparsers.add_parser('withhold', help='按累计预扣法处理一个月的工资并更新台账')
+    withhold_parser.add_argument('input', help='当月工资CSV文件（需要员工标识列和 salary 列），"-" 表示标准输入')
+    withhold_parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认输出到标准输出')
+    withhold_parser.add_argument('--ledger', required=True, help='台账快照文件，不存在时新建')
+    withhold_parser.add_argument('--month', type=int, required=True, help='发薪月份（1-12）')
+    withhold_parser.add_argument('--id-column', default='id', help='员工标识列，默认 id')
+    withhold_parser.add_argument('--tax-year', type=int, help='新建台账的纳税年度，默认使用规则默认年度')
+    withhold_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                                 help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    withhold_parser.add_argument('-q', '--quiet', action='store_true', help='不输出汇总')
+    withhold_parser.set_defaults(handler=withhold_command)
+
+    payments_parser = subparsers.add_parser('payments', help='计算劳务报酬、稿酬、特许权使用费的按次预扣税额')
+    payments_parser.add_argument('input', help='支付CSV文件（需要收款人、category、amount 列，period 列可选），'
+                                               '"-" 表示标准输入')
+    payments_parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认输出到标准输出')
+    payments_parser.add_argument('--payee-column', default='payee', help='收款人列，默认 payee')
+    payments_parser.add_argument('--by-payee', action='store_true', help='按收款人汇总输出，默认逐笔输出')
+    payments_parser.add_argument('--tax-year', type=int, help='纳税年度，默认使用规则默认年度')
+    payments_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                                 help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    payments_parser.add_argument('-q', '--quiet', action='store_true', help='不输出汇总')
+    payments_parser.set_defaults(handler=payments_command)
+
+    reconcile_parser = subparsers.add_parser('reconcile', help='计算综合所得年度汇算的应退或应补税额')
+    reconcile_parser.add_argument('input', help='全年收入CSV文件（另需 withheld_tax 列），"-" 表示标准输入')
+    reconcile_parser.add_argument('-o', '--output', default='-', help='输出CSV文件，默认输出到标准输出')
+    reconcile_parser.add_argument('--id-column', action='append', default=[],
+                                  help='原样复制到结果中的列（如工号），可重复指定')
+    reconcile_parser.add_argument('--tax-year', type=int, help='纳税年度，默认使用规则默认年度')
+    reconcile_parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                                  help=f'每块处理的行数，默认{DEFAULT_CHUNK_SIZE}')
+    reconcile_parser.add_argument('-q', '--quiet', action='store_true', help='不输出汇总')
+    reconcile_parser.set_defaults(handler=reconcile_command)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
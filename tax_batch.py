@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+个人所得税批量计算引擎
+基于NumPy列数组的向量化实现，计算结果与 tax_calculator.calculate_tax 逐项一致
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+from tax_calculator import TaxCalculator, TaxRuleSet, get_rules
+from tax_contributions import city_array
+# 结果字段定义在 tax_records 中，这里重新导出以保持原有的导入路径
+from tax_records import RESULT_FIELDS  # noqa: F401
+
+# 曲线扫描可以变化的输入参数
+SWEEP_AXES = (
+    'salary',
+    'bonus',
+    'labor_income',
+    'manuscript_income',
+    'license_income',
+    'social_security_base',
+    'housing_fund_rate',
+)
+
+# 曲线扫描默认返回的字段，另可选择 RESULT_FIELDS 中的任意字段
+SWEEP_FIELDS = ('net_income', 'total_tax', 'marginal_rate', 'bonus_rate', 'effective_rate')
+
+
+class BatchTaxCalculator:
+    def __init__(self, calculator: TaxCalculator = None):
+        if calculator is None:
+            calculator = TaxCalculator()
+        self.basic_deduction = calculator.basic_deduction
+        self.social_security_rate = calculator.social_security_rate
+        self.contributions = calculator.contributions
+
+        # 将编译税率表展开为列数组，供 searchsorted 查找
+        tax_table = calculator.tax_table
+        self.upper_bounds = np.array(tax_table.upper_bounds, dtype=np.float64)
+        self.monthly_upper_bounds = np.array(tax_table.monthly_upper_bounds, dtype=np.float64)
+        self.rates = np.array(tax_table.rates, dtype=np.float64)
+        self.quick_deductions = np.array(tax_table.quick_deductions, dtype=np.float64)
+        self.after_tax_upper_bounds = np.array(tax_table.after_tax_upper_bounds, dtype=np.float64)
+        self.bonus_quick_deductions = np.array(tax_table.bonus_quick_deductions, dtype=np.float64)
+
+    def calculate_contributions(self, social_security_base, housing_fund_rate, city=None):
+        """
+        向量化的每月社保和公积金，对应 TaxCalculator.calculate_contributions
+
+        Args:
+            social_security_base: 社保缴纳基数数组
+            housing_fund_rate: 公积金缴纳比例数组
+            city: 城市数组或标量，为 None 或空字符串的行按统一的社保比例计算
+
+        Returns:
+            (社保合计数组, 公积金数组)
+        """
+        monthly_social_security = social_security_base * self.social_security_rate
+        monthly_housing_fund = social_security_base * (housing_fund_rate / 100)
+        if city is None:
+            return monthly_social_security, monthly_housing_fund
+
+        # 只对给出城市的行查找城市规则
+        city = np.broadcast_to(city_array(city), np.shape(monthly_social_security))
+        rows = np.flatnonzero(city.ravel() != '')
+        if not len(rows):
+            return monthly_social_security, monthly_housing_fund
+        contributions = self.contributions.calculate_batch(
+            city.ravel()[rows], np.ravel(social_security_base)[rows], np.ravel(housing_fund_rate)[rows])
+        monthly_social_security = np.array(monthly_social_security, dtype=np.float64)
+        monthly_housing_fund = np.array(monthly_housing_fund, dtype=np.float64)
+        monthly_social_security.ravel()[rows] = contributions['social_insurance']
+        monthly_housing_fund.ravel()[rows] = contributions['housing_fund']
+        return monthly_social_security, monthly_housing_fund
+
+    def calculate_accumulated_tax(self, accumulated_income, accumulated_deduction, previous_tax=0):
+        """
+        向量化的累计预扣预缴应纳税额，对应 TaxCalculator.calculate_accumulated_tax
+
+        Args:
+            accumulated_income: 累计收入数组
+            accumulated_deduction: 累计扣除额数组（含基本减除费用）
+            previous_tax: 之前已预缴的税额（数组或标量）
+
+        Returns:
+            当前应缴纳的税额数组
+        """
+        taxable_income = np.asarray(accumulated_income, dtype=np.float64) - accumulated_deduction
+
+        # 区间为左开右闭 (lower, upper]，side='left' 恰好落在 upper >= 所得额的第一档
+        index = np.searchsorted(self.upper_bounds, taxable_income, side='left')
+        index = np.minimum(index, len(self.upper_bounds) - 1)
+
+        total_tax = taxable_income * self.rates[index] - self.quick_deductions[index]
+        current_tax = np.maximum(total_tax - previous_tax, 0)
+        return np.where(taxable_income > 0, current_tax, 0.0)
+
+    def calculate_bonus_tax(self, bonus):
+        """
+        向量化的年终奖单独计税，对应 TaxCalculator.calculate_bonus_tax
+
+        Args:
+            bonus: 年终奖金额数组
+
+        Returns:
+            应缴纳的税额数组
+        """
+        bonus = np.asarray(bonus, dtype=np.float64)
+        monthly_equivalent = bonus / 12
+
+        index = np.searchsorted(self.monthly_upper_bounds, monthly_equivalent, side='left')
+        index = np.minimum(index, len(self.monthly_upper_bounds) - 1)
+
+        tax = bonus * self.rates[index] - self.bonus_quick_deductions[index]
+        return np.where(monthly_equivalent > 0, tax, 0.0)
+
+    def calculate_withholding_schedule(self, monthly_incomes, monthly_social_insurance=0,
+                                       monthly_special_deductions=0):
+        """
+        批量计算全年累计预扣预缴明细，对应 TaxCalculator.calculate_withholding_schedule
+
+        Args:
+            monthly_incomes: 形状为 (员工数, 月数) 的各月收入数组
+            monthly_social_insurance: 各月三险一金，可广播到 monthly_incomes 的形状
+            monthly_special_deductions: 各月专项附加扣除，可广播到 monthly_incomes 的形状
+
+        Returns:
+            {字段名: 形状为 (员工数, 月数) 的数组} 形式的结果，字段与单人版本相同
+
+        Raises:
+            ValueError: 超过12个月，或各月扣除不能广播到 monthly_incomes 的形状
+        """
+        monthly_incomes = np.atleast_2d(np.asarray(monthly_incomes, dtype=np.float64))
+        if monthly_incomes.shape[1] > 12:
+            raise ValueError(f'At most 12 months are allowed, got {monthly_incomes.shape[1]}')
+        monthly_deductions = self.basic_deduction + np.broadcast_to(
+            np.asarray(monthly_social_insurance, dtype=np.float64), monthly_incomes.shape
+        ) + np.broadcast_to(np.asarray(monthly_special_deductions, dtype=np.float64), monthly_incomes.shape)
+
+        accumulated_income = np.cumsum(monthly_incomes, axis=1)
+        accumulated_deduction = np.cumsum(monthly_deductions, axis=1)
+        taxable_income = accumulated_income - accumulated_deduction
+        accumulated_tax = self.calculate_accumulated_tax(accumulated_income, accumulated_deduction)
+
+        # 累计已预缴税额是累计应纳税额的前缀最大值（预扣时不退税）
+        paid_tax = np.maximum.accumulate(accumulated_tax, axis=1)
+        previous_paid_tax = np.zeros_like(paid_tax)
+        previous_paid_tax[:, 1:] = paid_tax[:, :-1]
+        monthly_tax = np.maximum(accumulated_tax - previous_paid_tax, 0)
+
+        bracket = np.minimum(np.searchsorted(self.upper_bounds, taxable_income, side='left'),
+                             len(self.upper_bounds) - 1)
+        bracket = np.where(taxable_income > 0, bracket, -1)
+        marginal_rate = np.where(taxable_income > 0, self.rates[bracket], 0.0)
+
+        return {
+            'monthly_tax': monthly_tax,
+            'accumulated_taxable_income': taxable_income,
+            'accumulated_tax': paid_tax,
+            'bracket': bracket,
+            'marginal_rate': marginal_rate,
+        }
+
+    def optimize_bonus_split(self, annual_salary, bonus, monthly_deductions=0):
+        """
+        批量计算年终奖最优拆分，对应 TaxCalculator.optimize_bonus_split
+
+        每名员工只在税档分界点构成的候选集合上求值，候选点数与税档数成正比。
+
+        Args:
+            annual_salary: 年度工资收入数组
+            bonus: 年终奖金额数组
+            monthly_deductions: 月度专项附加扣除总额数组
+
+            各参数也可以是标量，广播为一维数组
+
+        Returns:
+            包含 separate_bonus、combined_bonus、tax、net_income、tax_saved 列的字典
+        """
+        annual_salary, bonus, monthly_deductions = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(column, dtype=np.float64))
+              for column in (annual_salary, bonus, monthly_deductions)))
+        accumulated_deductions = (self.basic_deduction + monthly_deductions) * 12
+
+        finite_upper_bounds = self.upper_bounds[np.isfinite(self.upper_bounds)]
+        combined_points = (annual_salary + bonus - accumulated_deductions)[:, np.newaxis]
+        candidates = np.concatenate([
+            np.zeros_like(bonus)[:, np.newaxis],
+            bonus[:, np.newaxis],
+            np.broadcast_to(finite_upper_bounds, (len(bonus), len(finite_upper_bounds))),
+            combined_points - finite_upper_bounds,
+            combined_points,
+        ], axis=1)
+        # 超出 [0, bonus] 的候选点替换为0，排序后取第一个最小值，与单人版本的取舍一致
+        candidates = np.where((candidates >= 0) & (candidates <= bonus[:, np.newaxis]), candidates, 0.0)
+        candidates = np.sort(candidates, axis=1)
+
+        combined_tax = self.calculate_accumulated_tax(
+            annual_salary[:, np.newaxis] + (bonus[:, np.newaxis] - candidates),
+            accumulated_deductions[:, np.newaxis])
+        total_tax = self.calculate_bonus_tax(candidates) + combined_tax
+
+        rows = np.arange(len(bonus))
+        best = np.argmin(total_tax, axis=1)
+        separate_bonus = candidates[rows, best]
+        tax = total_tax[rows, best]
+        # 两端方案：全部并入（候选点0）和全部单独计税（候选点等于奖金）
+        all_combined_tax = total_tax[:, 0]
+        all_separate_tax = total_tax[rows, np.argmax(candidates, axis=1)]
+
+        return {
+            'separate_bonus': separate_bonus,
+            'combined_bonus': bonus - separate_bonus,
+            'tax': tax,
+            'net_income': annual_salary + bonus - tax,
+            'tax_saved': np.minimum(all_combined_tax, all_separate_tax) - tax,
+        }
+
+    def solve_taxable_income(self, after_tax_income):
+        """向量化的税后所得反推应纳税所得额，对应 TaxBracketTable.solve_taxable_income"""
+        after_tax_income = np.asarray(after_tax_income, dtype=np.float64)
+        index = np.minimum(np.searchsorted(self.after_tax_upper_bounds, after_tax_income, side='left'),
+                           len(self.rates) - 1)
+        taxable_income = (after_tax_income - self.quick_deductions[index]) / (1 - self.rates[index])
+        return np.where(after_tax_income > 0, taxable_income, after_tax_income)
+
+    def calculate_gross_from_net(self, net_income, salary_type='monthly', bonus=0, bonus_type='separate',
+                                 social_security_base=0, housing_fund_rate=0, special_deductions=None,
+                                 city=None):
+        """
+        批量税前反推，参数与 calculate_gross_from_net 相同，每个参数可以是列数组或标量
+
+        Returns:
+            包含 salary、annual_salary 列的字典；目标税后收入过低的行为 NaN
+        """
+        if special_deductions is None:
+            monthly_special_deductions = 0
+        elif isinstance(special_deductions, dict):
+            monthly_special_deductions = 0
+            for value in special_deductions.values():
+                monthly_special_deductions = monthly_special_deductions + np.asarray(value, dtype=np.float64)
+        else:
+            monthly_special_deductions = special_deductions
+
+        net_income, bonus, social_security_base, housing_fund_rate, monthly_special_deductions = np.broadcast_arrays(
+            *(np.asarray(column, dtype=np.float64) for column in (
+                net_income, bonus, social_security_base, housing_fund_rate, monthly_special_deductions)))
+
+        monthly_social_security, monthly_housing_fund = self.calculate_contributions(
+            social_security_base, housing_fund_rate, city)
+        annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+        total_deductions = annual_deductions + monthly_special_deductions * 12 + self.basic_deduction * 12
+
+        after_tax_income = net_income - (total_deductions - annual_deductions)
+        separate = np.asarray(bonus_type) == 'separate'
+        after_tax_income = np.where(separate, after_tax_income - (bonus - self.calculate_bonus_tax(bonus)),
+                                    after_tax_income)
+        annual_salary = self.solve_taxable_income(after_tax_income) + total_deductions
+        annual_salary = np.where(separate, annual_salary, annual_salary - bonus)
+        annual_salary = np.where(annual_salary >= 0, annual_salary, np.nan)
+
+        return {
+            'salary': np.where(np.asarray(salary_type) == 'monthly', annual_salary / 12, annual_salary),
+            'annual_salary': annual_salary,
+        }
+
+    def calculate_tax(self, salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                      labor_income=0, manuscript_income=0, license_income=0,
+                      social_security_base=0, housing_fund_rate=0,
+                      special_deductions=None, city=None):
+        """
+        批量计算个人所得税，参数含义与 calculate_tax 相同，但每个参数可以是列数组或标量
+
+        Args:
+            salary: 工资收入
+            salary_type: 工资类型（'monthly' 或 'annual'）
+            bonus: 年终奖
+            bonus_type: 奖金计税方式（'separate' 或 'combined'）
+            labor_income: 劳务报酬
+            manuscript_income: 稿酬收入
+            license_income: 特许权使用费
+            social_security_base: 社保缴纳基数
+            housing_fund_rate: 公积金缴纳比例
+            special_deductions: 月度专项附加扣除总额数组，
+                或 {扣除项名称: 数组} 形式的字典
+            city: 城市数组或标量，为 None 或空字符串的行按统一的社保比例计算
+
+        Returns:
+            {字段名: 数组} 形式的列式结果，字段与 calculate_tax 相同
+        """
+        # 专项附加扣除按项累加，顺序与 sum(special_deductions.values()) 一致
+        if special_deductions is None:
+            monthly_special_deductions = 0
+        elif isinstance(special_deductions, dict):
+            monthly_special_deductions = 0
+            for value in special_deductions.values():
+                monthly_special_deductions = monthly_special_deductions + np.asarray(value, dtype=np.float64)
+        else:
+            monthly_special_deductions = special_deductions
+
+        (salary, bonus, labor_income, manuscript_income, license_income,
+         social_security_base, housing_fund_rate, monthly_special_deductions) = np.broadcast_arrays(
+            *(np.asarray(column, dtype=np.float64) for column in (
+                salary, bonus, labor_income, manuscript_income, license_income,
+                social_security_base, housing_fund_rate, monthly_special_deductions))
+        )
+        salary_type = np.asarray(salary_type)
+        bonus_type = np.asarray(bonus_type)
+
+        # 计算年度工资收入
+        annual_salary = np.where(salary_type == 'monthly', salary * 12, salary)
+
+        # 计算社保和公积金
+        monthly_social_security, monthly_housing_fund = self.calculate_contributions(
+            social_security_base, housing_fund_rate, city)
+        annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+
+        # 计算专项附加扣除总额
+        annual_special_deductions = monthly_special_deductions * 12
+        basic_deductions = self.basic_deduction * 12
+        total_deductions = annual_deductions + annual_special_deductions + basic_deductions
+
+        # 计算工资薪金所得税
+        salary_taxable_income = annual_salary - annual_deductions - annual_special_deductions - basic_deductions
+        salary_tax = self.calculate_accumulated_tax(annual_salary, total_deductions)
+
+        # 计算年终奖个税，两种方式都算一遍再按 bonus_type 选择
+        separate_bonus_tax = self.calculate_bonus_tax(bonus)
+        combined_bonus_tax = self.calculate_accumulated_tax(annual_salary + bonus, total_deductions) - salary_tax
+        bonus_tax = np.where(bonus_type == 'separate', separate_bonus_tax, combined_bonus_tax)
+
+        # 计算其他收入的税款
+        labor_tax = np.where(labor_income > 0, labor_income * 0.2, 0.0)
+        manuscript_tax = np.where(manuscript_income > 0, manuscript_income * 0.14, 0.0)  # 稿酬所得适用70%计税
+        license_tax = np.where(license_income > 0, license_income * 0.2, 0.0)
+
+        # 计算总税额和税后收入
+        total_tax = salary_tax + bonus_tax + labor_tax + manuscript_tax + license_tax
+        total_income = annual_salary + bonus + labor_income + manuscript_income + license_income
+        net_income = total_income - total_tax - annual_deductions
+
+        return {
+            'salary_taxable_income': salary_taxable_income,
+            'salary_tax': salary_tax,
+            'bonus_taxable_income': bonus,
+            'bonus_tax': bonus_tax,
+            'labor_income': labor_income,
+            'labor_tax': labor_tax,
+            'manuscript_income': manuscript_income,
+            'manuscript_tax': manuscript_tax,
+            'license_income': license_income,
+            'license_tax': license_tax,
+            'total_taxable_income': total_income - annual_deductions - basic_deductions,
+            'total_tax': total_tax,
+            'total_deductions': total_deductions,
+            'net_income': net_income,
+        }
+
+    def _bracket_levels(self, upper_bounds, amount):
+        """
+        所得额所处的档位：0 表示不纳税，k 表示第 k 档
+
+        以 0 和各档上限为分界点，相邻两点档位不同即说明中间跨过了分界点。
+        """
+        boundaries = np.concatenate(([0.0], upper_bounds[:-1]))
+        return np.searchsorted(boundaries, amount, side='left'), boundaries
+
+    def sweep(self, profile: dict, axes: dict, fields=SWEEP_FIELDS):
+        """
+        在基础参数上按网格扫描一组输入，一次向量化计算整条曲线
+
+        Args:
+            profile: calculate_tax 的基础参数
+            axes: {参数名: 取值数组}，多个参数时按给定顺序展开为网格（第一个参数变化最慢）
+            fields: 返回的字段，可以是 SWEEP_FIELDS 或 RESULT_FIELDS 中的字段
+
+        Returns:
+            {'shape': 网格形状, 'columns': {字段: 展平后的数组},
+             'breakpoints': {'axis', 'kind', 'index', 'value', 'rate': 数组}}；
+            kind 为 'salary' 表示综合所得跨档，'bonus' 表示单独计税的年终奖跨档，
+            index 为跨档后第一个点的下标，value 为分界点处该参数的精确取值
+        """
+        names = list(axes)
+        values = [np.asarray(axes[name], dtype=np.float64) for name in names]
+        shape = tuple(len(axis_values) for axis_values in values)
+        grid = np.meshgrid(*values, indexing='ij')
+
+        inputs = dict(profile)
+        for name, axis_grid in zip(names, grid):
+            inputs[name] = axis_grid.ravel()
+        results = self.calculate_tax(**inputs)
+
+        # 综合所得的应纳税所得额：合并计税时含年终奖
+        salary_type = np.asarray(inputs.get('salary_type', 'monthly'))
+        bonus_type = np.asarray(inputs.get('bonus_type', 'separate'))
+        bonus = np.broadcast_to(np.asarray(inputs.get('bonus', 0), dtype=np.float64), results['total_tax'].shape)
+        combined = bonus_type == 'combined'
+        taxable_income = np.where(combined, results['salary_taxable_income'] + bonus,
+                                  results['salary_taxable_income'])
+        salary_levels, salary_boundaries = self._bracket_levels(self.upper_bounds, taxable_income)
+        bonus_levels, bonus_boundaries = self._bracket_levels(self.monthly_upper_bounds, bonus / 12)
+        bonus_levels = np.where(combined, 0, bonus_levels)
+        level_rates = np.concatenate(([0.0], self.rates))
+
+        columns = {}
+        for field in fields:
+            if field == 'marginal_rate':
+                columns[field] = level_rates[salary_levels]
+            elif field == 'bonus_rate':
+                columns[field] = np.where(combined, level_rates[salary_levels], level_rates[bonus_levels])
+            elif field == 'effective_rate':
+                salary = np.asarray(inputs.get('salary', 0), dtype=np.float64)
+                total_income = (np.where(salary_type == 'monthly', salary * 12, salary) + bonus
+                                + results['labor_income'] + results['manuscript_income']
+                                + results['license_income'])
+                columns[field] = np.divide(results['total_tax'], total_income,
+                                           out=np.zeros_like(results['total_tax']), where=total_income > 0)
+            elif field in results:
+                columns[field] = results[field]
+            else:
+                raise ValueError(f'Unknown sweep field: {field}')
+
+        breakpoints = {'axis': [], 'kind': [], 'index': [], 'value': [], 'rate': []}
+        for kind, levels, amount, boundaries in (
+                ('salary', salary_levels, taxable_income, salary_boundaries),
+                ('bonus', bonus_levels, bonus / 12, bonus_boundaries)):
+            levels = levels.reshape(shape)
+            amount = amount.reshape(shape)
+            for axis, name in enumerate(names):
+                # 沿该参数方向比较相邻两点的档位
+                before = (slice(None),) * axis + (slice(None, -1),)
+                after = (slice(None),) * axis + (slice(1, None),)
+                changed = np.nonzero(levels[before] != levels[after])
+                for position in zip(*changed):
+                    first = position
+                    second = position[:axis] + (position[axis] + 1,) + position[axis + 1:]
+                    first_level, second_level = int(levels[first]), int(levels[second])
+                    x0, x1 = values[axis][first[axis]], values[axis][second[axis]]
+                    t0, t1 = amount[first], amount[second]
+                    # 所得额是各参数的线性函数，线性插值得到的分界点是精确的
+                    # 档位 L 与 L+1 的分界点为 boundaries[L]，rate 为跨过分界点后的税率
+                    if second_level > first_level:
+                        crossings = [(boundaries[level], level + 1) for level in range(first_level, second_level)]
+                    else:
+                        crossings = [(boundaries[level - 1], level - 1)
+                                     for level in range(first_level, second_level, -1)]
+                    for boundary, new_level in crossings:
+                        breakpoints['axis'].append(name)
+                        breakpoints['kind'].append(kind)
+                        breakpoints['index'].append(int(np.ravel_multi_index(second, shape)))
+                        breakpoints['value'].append(float(x0 + (boundary - t0) / (t1 - t0) * (x1 - x0)))
+                        breakpoints['rate'].append(float(level_rates[new_level]))
+
+        return {'shape': shape, 'columns': columns, 'breakpoints': breakpoints}
+
+
+@lru_cache(maxsize=32)
+def _batch_calculator_for_rules(rules: TaxRuleSet) -> BatchTaxCalculator:
+    return BatchTaxCalculator(TaxCalculator(rules=rules))
+
+
+def get_batch_calculator(tax_year: int = None):
+    """返回指定年度规则（默认为默认年度）的共享批量计算器，按规则对象缓存，首次使用时构建"""
+    return _batch_calculator_for_rules(get_rules(tax_year))
+
+
+def calculate_tax_batch(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                        labor_income=0, manuscript_income=0, license_income=0,
+                        social_security_base=0, housing_fund_rate=0,
+                        special_deductions=None, tax_year=None, city=None):
+    """
+    批量计算个人所得税
+
+    参数与 calculate_tax 相同，每个参数都可以传入等长的列数组（或标量，自动广播）；
+    tax_year 对整批数据生效。
+
+    Returns:
+        {字段名: numpy数组} 形式的列式结果，字段与 calculate_tax 返回的字典相同
+    """
+    return get_batch_calculator(tax_year).calculate_tax(
+        salary=salary,
+        salary_type=salary_type,
+        bonus=bonus,
+        bonus_type=bonus_type,
+        labor_income=labor_income,
+        manuscript_income=manuscript_income,
+        license_income=license_income,
+        social_security_base=social_security_base,
+        housing_fund_rate=housing_fund_rate,
+        special_deductions=special_deductions,
+        city=city
+    )
+
+
+def calculate_withholding_schedule_batch(monthly_incomes, monthly_social_insurance=0,
+                                         monthly_special_deductions=0, tax_year=None):
+    """
+    批量计算多名员工的全年累计预扣预缴明细
+
+    Args:
+        monthly_incomes: 形状为 (员工数, 月数) 的各月收入数组
+        monthly_social_insurance: 各月三险一金，可广播到 monthly_incomes 的形状
+        monthly_special_deductions: 各月专项附加扣除，可广播到 monthly_incomes 的形状
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        {字段名: 形状为 (员工数, 月数) 的数组} 形式的结果
+    """
+    return get_batch_calculator(tax_year).calculate_withholding_schedule(
+        monthly_incomes, monthly_social_insurance, monthly_special_deductions)
+
+
+def optimize_bonus_split_batch(annual_salary, bonus, monthly_deductions=0, tax_year=None):
+    """
+    批量计算年终奖单独计税与并入年收入的最优拆分
+
+    Args:
+        annual_salary: 年度工资收入数组
+        bonus: 年终奖金额数组
+        monthly_deductions: 月度专项附加扣除总额数组
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        包含 separate_bonus、combined_bonus、tax、net_income、tax_saved 列的字典
+    """
+    return get_batch_calculator(tax_year).optimize_bonus_split(annual_salary, bonus, monthly_deductions)
+
+
+def calculate_gross_from_net_batch(net_income, salary_type='monthly', bonus=0, bonus_type='separate',
+                                   social_security_base=0, housing_fund_rate=0, special_deductions=None,
+                                   tax_year=None, city=None):
+    """
+    批量税前反推，参数与 tax_calculator.calculate_gross_from_net 相同
+
+    Returns:
+        包含 salary、annual_salary 列的字典；目标税后收入过低的行为 NaN
+    """
+    return get_batch_calculator(tax_year).calculate_gross_from_net(
+        net_income, salary_type=salary_type, bonus=bonus, bonus_type=bonus_type,
+        social_security_base=social_security_base, housing_fund_rate=housing_fund_rate,
+        special_deductions=special_deductions, city=city)
+
+
+def calculate_payments_batch(category, amount, tax_year=None):
+    """
+    批量计算劳务报酬、稿酬、特许权使用费的单笔预扣税额
+
+    Args:
+        category: 所得类别数组或标量（'labor'、'manuscript'、'license'）
+        amount: 每笔支付金额数组
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        {字段名: 数组} 形式的结果，字段见 tax_payments.PAYMENT_FIELDS
+    """
+    return get_rules(tax_year).payments.calculate_batch(category, amount)
+
+
+def aggregate_payments_batch(payee, category, amount, period=None, tax_year=None):
+    """
+    批量计算单笔支付并按收款人汇总，参数见 PaymentTaxTable.aggregate
+
+    Returns:
+        {'payee': 收款人数组, 汇总字段: 数组}，汇总字段见 tax_payments.PAYEE_FIELDS
+    """
+    return get_rules(tax_year).payments.aggregate(payee, category, amount, period)
+
+
+def iter_result_rows(columns: dict):
+    """将列式结果逐行转换为与 calculate_tax 相同的字典"""
+    lists = [columns[field].tolist() for field in RESULT_FIELDS]
+    for values in zip(*lists):
+        yield dict(zip(RESULT_FIELDS, values))
+
+
+def sweep_axis_values(spec) -> np.ndarray:
+    """
+    解析单个扫描参数的取值：{'start': X, 'stop': Y, 'steps': N}（含两端的等距网格）
+    或 {'values': [...]}（任意网格，例如若干档年终奖）
+
+    Raises:
+        ValueError: 格式不正确
+    """
+    if not isinstance(spec, dict):
+        raise ValueError('Sweep spec must be an object')
+    if 'values' in spec:
+        values = np.asarray(spec['values'], dtype=np.float64)
+        if values.ndim != 1 or not len(values):
+            raise ValueError('Sweep values must be a non-empty list')
+    else:
+        steps = int(spec['steps'])
+        if steps < 1:
+            raise ValueError('Sweep steps must be positive')
+        values = np.linspace(float(spec['start']), float(spec['stop']), steps)
+    if not np.all(np.isfinite(values)):
+        raise ValueError('Sweep values must be finite')
+    return values
+
+
+def calculate_sweep(profile: dict, sweep: dict, fields=SWEEP_FIELDS, max_points: int = None):
+    """
+    收入曲线扫描：在基础参数上扫描一个或多个参数，用于绘制税后收入、边际税率和实际税率曲线
+
+    Args:
+        profile: calculate_tax 的基础参数，可以包含 tax_year
+        sweep: {参数名: 扫描设置}，扫描设置的格式见 sweep_axis_values
+        fields: 返回的字段
+        max_points: 网格点数上限，超过时抛出 ValueError
+
+    Returns:
+        BatchTaxCalculator.sweep 的结果，另含 'axes': {参数名: 取值数组}
+    """
+    unknown = [name for name in sweep if name not in SWEEP_AXES]
+    if unknown:
+        raise ValueError(f'Unknown sweep parameter: {", ".join(unknown)}')
+    if not sweep:
+        raise ValueError('Sweep must contain at least one parameter')
+    axes = {name: sweep_axis_values(spec) for name, spec in sweep.items()}
+    points = int(np.prod([len(values) for values in axes.values()]))
+    if max_points is not None and points > max_points:
+        raise ValueError(f'Sweep has {points} points, the limit is {max_points}')
+    profile = dict(profile)
+    tax_year = profile.pop('tax_year', None)
+    result = get_batch_calculator(tax_year).sweep(profile, axes, fields)
+    result['axes'] = axes
+    return result
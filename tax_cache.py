@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+个税计算结果缓存
+以规范化后的输入作为键的进程内LRU缓存，并为Web接口生成强ETag
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from tax_calculator import calculate_tax_record, get_rules
+from tax_records import TaxInput, TaxResult
+
+# 缓存键格式或计算规则变化时递增，使旧的ETag全部失效
+CACHE_KEY_VERSION = 3
+
+_MISSING = object()
+
+
+def _normalize_number(value) -> float:
+    """统一数值表示：整数与浮点数等价，-0.0 归一为 0.0"""
+    value = float(value)
+    return value if value != 0 else 0.0
+
+
+def make_cache_key(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                   labor_income=0, manuscript_income=0, license_income=0,
+                   social_security_base=0, housing_fund_rate=0,
+                   special_deductions=None, tax_year=None, city=None) -> tuple:
+    """
+    生成 calculate_tax 参数的规范化缓存键
+
+    数值统一转换为浮点数，专项附加扣除按名称排序，因此字段顺序或数值写法
+    不同但含义相同的请求会命中同一个缓存项。键中包含实际使用的纳税年度和规则摘要，
+    规则文件重新加载后旧的缓存项和ETag自然失效。
+
+    Raises:
+        ValueError, TypeError: 参数无法转换为数值，或没有该年度或该城市的规则时
+    """
+    rules = get_rules(tax_year)
+    if city and city not in rules.contributions:
+        raise ValueError(f'No contribution rules for city {city}')
+    return (
+        _normalize_number(salary),
+        str(salary_type),
+        _normalize_number(bonus),
+        str(bonus_type),
+        _normalize_number(labor_income),
+        _normalize_number(manuscript_income),
+        _normalize_number(license_income),
+        _normalize_number(social_security_base),
+        _normalize_number(housing_fund_rate),
+        tuple(sorted((str(name), _normalize_number(amount))
+                     for name, amount in (special_deductions or {}).items())),
+        str(city or ''),
+        rules.tax_year,
+        rules.fingerprint,
+    )
+
+
+def etag_for_key(key: tuple) -> str:
+    """根据缓存键生成强ETag，计算结果只取决于输入，因此无需先计算响应体"""
+    digest = hashlib.sha256(repr((CACHE_KEY_VERSION, key)).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def calculate_record_for_key(key: tuple) -> TaxResult:
+    """
+    按缓存键中的规范化参数计算，返回结果记录
+
+    生成键之后规则恰好重新加载时，结果按新规则计算但存放在旧摘要的键下，
+    之后的请求只会生成新摘要的键，不会读到这一项。
+    """
+    (salary, salary_type, bonus, bonus_type, labor_income, manuscript_income,
+     license_income, social_security_base, housing_fund_rate, special_deductions, city, tax_year, _) = key
+    return calculate_tax_record(TaxInput(
+        salary=salary,
+        salary_type=salary_type,
+        bonus=bonus,
+        bonus_type=bonus_type,
+        labor_income=labor_income,
+        manuscript_income=manuscript_income,
+        license_income=license_income,
+        social_security_base=social_security_base,
+        housing_fund_rate=housing_fund_rate,
+        special_deductions=dict(special_deductions),
+        tax_year=tax_year,
+        city=city
+    ))
+
+
+def calculate_tax_for_key(key: tuple) -> dict:
+    """按缓存键中的规范化参数调用 calculate_tax，返回结果字典"""
+    return calculate_record_for_key(key).to_dict()
+
+
+class TaxResultCache:
+    """
+    线程安全的LRU结果缓存
+
+    Args:
+        maxsize: 最多缓存的结果数，为0时不缓存
+        ttl: 缓存项的有效期（秒），为0或None时不过期
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl or None
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """查找缓存项，命中时将其移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """写入缓存项，超出容量时淘汰最久未使用的项"""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+    def calculate_record(self, key: tuple, compute=calculate_record_for_key) -> TaxResult:
+        """
+        返回缓存键对应的结果记录，未命中时调用 compute(key) 计算并写入缓存
+
+        compute 也可以返回结果字典，写入缓存前转换为记录。返回的记录与缓存共享，调用方不能修改。
+        """
+        result = self.get(key)
+        if result is None:
+            result = compute(key)
+            if not isinstance(result, TaxResult):
+                result = TaxResult.from_dict(result)
+            self.put(key, result)
+        return result
+
+    def calculate(self, key: tuple, compute=calculate_record_for_key) -> dict:
+        """返回缓存键对应的计算结果字典，未命中时调用 compute(key) 计算并写入缓存"""
+        # 返回新字典，避免调用方修改缓存中的结果
+        return self.calculate_record(key, compute).to_dict()
+
+
+def calculate_tax_cached(cache: TaxResultCache, **kwargs) -> dict:
+    """带缓存的 calculate_tax，参数与 calculate_tax 相同"""
+    return cache.calculate(make_cache_key(**kwargs))
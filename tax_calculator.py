@@ -6,21 +6,46 @@
 实现2024年最新个税计算规则
 """
 
+from functools import lru_cache
+
+# 税率表和规则注册表定义在 tax_rules 中，这里重新导出以保持原有的导入路径
+from tax_rules import ANNUAL_TAX_BRACKETS, DEFAULT_TAX_TABLE, TaxBracketTable, TaxRuleSet, get_rules  # noqa: F401
+from tax_records import RESULT_FIELDS, TaxInput, TaxResult  # noqa: F401
+
 class TaxCalculator:
-    def __init__(self):
-        # 年度累计预扣预缴税率表
-        self.annual_tax_brackets = [
-            (0, 36000, 0.03, 0),        # 不超过36000元的部分
-            (36000, 144000, 0.10, 2520),  # 超过36000元至144000元的部分
-            (144000, 300000, 0.20, 16920), # 超过144000元至300000元的部分
-            (300000, 420000, 0.25, 31920), # 超过300000元至420000元的部分
-            (420000, 660000, 0.30, 52920), # 超过420000元至660000元的部分
-            (660000, 960000, 0.35, 85920), # 超过660000元至960000元的部分
-            (960000, float('inf'), 0.45, 181920) # 超过960000元的部分
-        ]
+    def __init__(self, tax_table: TaxBracketTable = None, rules: TaxRuleSet = None):
+        # 个税规则，默认使用规则注册表中默认年度的规则
+        self.rules = rules if rules is not None else get_rules()
+        
+        # 年度累计预扣预缴税率表，默认使用规则中编译好的税率表
+        self.tax_table = tax_table if tax_table is not None else self.rules.tax_table
+        self.annual_tax_brackets = self.tax_table.brackets
         
         # 每月基本减除费用
-        self.basic_deduction = 5000
+        self.basic_deduction = self.rules.basic_deduction
+        # 社保个人缴纳总比例，未指定城市时使用
+        self.social_security_rate = self.rules.social_security_rate
+        # 按城市的社保公积金缴纳规则
+        self.contributions = self.rules.contributions
+        
+    def calculate_contributions(self, social_security_base: float, housing_fund_rate: float,
+                                city: str = None) -> tuple:
+        """
+        计算每月个人缴纳的社保和公积金
+        
+        Args:
+            social_security_base: 社保缴纳基数
+            housing_fund_rate: 公积金缴纳比例（百分比）
+            city: 城市，为空时按统一的社保比例计算，公积金不设上下限
+            
+        Returns:
+            (社保合计, 公积金)
+        """
+        if not city:
+            return (social_security_base * self.social_security_rate,
+                    social_security_base * (housing_fund_rate / 100))
+        contributions = self.contributions.calculate(city, social_security_base, housing_fund_rate)
+        return contributions['social_insurance'], contributions['housing_fund']
         
     def calculate_accumulated_tax(self, accumulated_income: float, accumulated_deduction: float, 
                                 previous_tax: float = 0) -> float:
@@ -42,15 +67,12 @@ class TaxCalculator:
             return 0
             
         # 查找适用税率和速算扣除数
-        for lower, upper, rate, deduction in self.annual_tax_brackets:
-            if lower < taxable_income <= upper:
-                # 计算累计应纳税额
-                total_tax = taxable_income * rate - deduction
-                # 扣除已预缴税额
-                current_tax = total_tax - previous_tax
-                return max(current_tax, 0)
-                
-        return 0
+        index = self.tax_table.find_bracket(taxable_income)
+        # 计算累计应纳税额
+        total_tax = taxable_income * self.tax_table.rates[index] - self.tax_table.quick_deductions[index]
+        # 扣除已预缴税额
+        current_tax = total_tax - previous_tax
+        return max(current_tax, 0)
         
     def calculate_monthly_tax(self, month: int, monthly_income: float, special_deductions: dict) -> float:
         """
@@ -98,6 +120,76 @@ class TaxCalculator:
         
         return current_tax
         
+    def calculate_withholding_schedule(self, monthly_incomes, monthly_social_insurance=0,
+                                       monthly_special_deductions=0) -> dict:
+        """
+        一次遍历计算全年累计预扣预缴明细，支持每月收入和扣除不同
+        
+        Args:
+            monthly_incomes: 各月收入序列（从1月开始，最多12个月）
+            monthly_social_insurance: 各月三险一金序列，或每月相同的金额
+            monthly_special_deductions: 各月专项附加扣除序列，或每月相同的金额
+            
+        Raises:
+            ValueError: 超过12个月，或各月序列的长度不一致
+            
+        Returns:
+            包含逐月结果列表的字典：
+                - monthly_tax: 当月预扣税额
+                - accumulated_taxable_income: 累计应纳税所得额
+                - accumulated_tax: 累计已预缴税额
+                - bracket: 累计所得额所在税档下标（未超过减除费用时为-1）
+                - marginal_rate: 适用的边际税率
+        """
+        months = len(monthly_incomes)
+        if months > 12:
+            raise ValueError(f'At most 12 months are allowed, got {months}')
+        if not hasattr(monthly_social_insurance, '__len__'):
+            monthly_social_insurance = [monthly_social_insurance] * months
+        if not hasattr(monthly_special_deductions, '__len__'):
+            monthly_special_deductions = [monthly_special_deductions] * months
+        for name, values in (('monthly_social_insurance', monthly_social_insurance),
+                             ('monthly_special_deductions', monthly_special_deductions)):
+            if len(values) != months:
+                raise ValueError(f'{name} has {len(values)} months, expected {months}')
+            
+        schedule = {
+            'monthly_tax': [],
+            'accumulated_taxable_income': [],
+            'accumulated_tax': [],
+            'bracket': [],
+            'marginal_rate': []
+        }
+        accumulated_income = 0
+        accumulated_deduction = 0
+        paid_tax = 0
+        for income, insurance, special in zip(monthly_incomes, monthly_social_insurance,
+                                              monthly_special_deductions):
+            # 累计收入和累计扣除只需在上月基础上增加当月数额
+            accumulated_income += income
+            accumulated_deduction += self.basic_deduction + insurance + special
+            taxable_income = accumulated_income - accumulated_deduction
+            
+            # 当月预扣税额 = 累计应纳税额 - 累计已预缴税额，不足时当月不退税
+            accumulated_tax = self.calculate_accumulated_tax(accumulated_income, accumulated_deduction)
+            monthly_tax = max(accumulated_tax - paid_tax, 0)
+            paid_tax = max(paid_tax, accumulated_tax)
+            
+            if taxable_income > 0:
+                bracket = self.tax_table.find_bracket(taxable_income)
+                marginal_rate = self.tax_table.rates[bracket]
+            else:
+                bracket = -1
+                marginal_rate = 0
+                
+            schedule['monthly_tax'].append(monthly_tax)
+            schedule['accumulated_taxable_income'].append(taxable_income)
+            schedule['accumulated_tax'].append(paid_tax)
+            schedule['bracket'].append(bracket)
+            schedule['marginal_rate'].append(marginal_rate)
+            
+        return schedule
+        
     def calculate_bonus_tax(self, bonus: float) -> float:
         """
         计算年终奖个税（单独计税方法）
@@ -111,12 +203,12 @@ class TaxCalculator:
         # 将年终奖除以12计算适用税率
         monthly_equivalent = bonus / 12
         
+        if monthly_equivalent <= 0:
+            return 0
+            
         # 查找适用税率和速算扣除数
-        for lower, upper, rate, deduction in self.annual_tax_brackets:
-            if lower / 12 < monthly_equivalent <= upper / 12:
-                return bonus * rate - deduction
-                
-        return 0
+        index = self.tax_table.find_bonus_bracket(monthly_equivalent)
+        return bonus * self.tax_table.rates[index] - self.tax_table.bonus_quick_deductions[index]
         
     def optimize_bonus_plan(self, annual_salary: float, bonus: float, 
                           monthly_deductions: float) -> dict:
@@ -156,6 +248,137 @@ class TaxCalculator:
             },
             'recommendation': 'combined' if combined_net > separate_net else 'separate'
         }
+        
+    def bonus_split_candidates(self, annual_salary: float, bonus: float,
+                               accumulated_deductions: float) -> list:
+        """
+        年终奖拆分方案的候选点（单独计税部分的金额）
+        
+        总税额是单独计税金额的分段线性函数，最小值只可能出现在两端或各税档的分界点：
+        单独计税部分落在年终奖税档分界处，或并入部分使综合所得落在税档分界处。
+        """
+        candidates = [0, bonus]
+        for upper in self.tax_table.upper_bounds:
+            if upper == float('inf'):
+                continue
+            # 单独计税部分的月度换算额恰好落在税档上限
+            candidates.append(upper)
+            # 并入部分使综合所得应纳税所得额恰好落在税档上限
+            candidates.append(annual_salary + bonus - accumulated_deductions - upper)
+        # 并入部分使应纳税所得额恰好为0
+        candidates.append(annual_salary + bonus - accumulated_deductions)
+        return sorted({candidate for candidate in candidates if 0 <= candidate <= bonus})
+        
+    def optimize_bonus_split(self, annual_salary: float, bonus: float,
+                             monthly_deductions: float) -> dict:
+        """
+        计算年终奖单独计税与并入年收入的最优拆分
+        
+        Args:
+            annual_salary: 年度工资收入
+            bonus: 年终奖金额
+            monthly_deductions: 月度专项附加扣除总额
+            
+        Returns:
+            最优拆分方案及完整的税额曲线：
+                - separate_bonus: 单独计税的部分
+                - combined_bonus: 并入年收入的部分
+                - tax: 最优方案的总税额
+                - net_income: 最优方案的税后收入
+                - tax_saved: 相比全部单独计税和全部并入中较优者节省的税额
+                - curve: 各候选点 (单独计税金额, 总税额) 列表，相邻点之间税额线性变化
+        """
+        accumulated_deductions = (self.basic_deduction + monthly_deductions) * 12
+        
+        curve = []
+        for separate_bonus in self.bonus_split_candidates(annual_salary, bonus, accumulated_deductions):
+            combined_tax = self.calculate_accumulated_tax(annual_salary + (bonus - separate_bonus),
+                                                          accumulated_deductions)
+            curve.append((separate_bonus, self.calculate_bonus_tax(separate_bonus) + combined_tax))
+            
+        # 税额相同时取单独计税金额最小的方案
+        separate_bonus, tax = min(curve, key=lambda point: point[1])
+        extremes_tax = min(curve[0][1], curve[-1][1])
+        
+        return {
+            'separate_bonus': separate_bonus,
+            'combined_bonus': bonus - separate_bonus,
+            'tax': tax,
+            'net_income': annual_salary + bonus - tax,
+            'tax_saved': extremes_tax - tax,
+            'curve': curve
+        }
+
+    def calculate(self, tax_input: TaxInput) -> TaxResult:
+        """
+        按本计算器的规则计算个人所得税，tax_input.tax_year 不参与选择规则
+        
+        Args:
+            tax_input: 计算参数，字段含义见 calculate_tax
+        
+        Returns:
+            计算结果记录，字段为 RESULT_FIELDS
+        """
+        salary, bonus, bonus_type = tax_input.salary, tax_input.bonus, tax_input.bonus_type
+        labor_income, manuscript_income, license_income = (
+            tax_input.labor_income, tax_input.manuscript_income, tax_input.license_income)
+        
+        # 计算年度工资收入
+        if tax_input.salary_type == 'monthly':
+            annual_salary = salary * 12
+        else:
+            annual_salary = salary
+        
+        # 计算社保和公积金
+        monthly_social_security, monthly_housing_fund = self.calculate_contributions(
+            tax_input.social_security_base, tax_input.housing_fund_rate, tax_input.city)
+        annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+        
+        # 计算专项附加扣除总额
+        monthly_special_deductions = sum(tax_input.special_deductions.values())
+        annual_special_deductions = monthly_special_deductions * 12
+        
+        # 计算工资薪金所得税
+        salary_taxable_income = annual_salary - annual_deductions - annual_special_deductions - (self.basic_deduction * 12)
+        salary_tax = self.calculate_accumulated_tax(annual_salary, annual_deductions + annual_special_deductions + (self.basic_deduction * 12))
+        
+        # 计算年终奖个税
+        if bonus_type == 'separate':
+            bonus_tax = self.calculate_bonus_tax(bonus)
+            bonus_taxable_income = bonus
+        else:
+            # 并入年收入计算
+            total_income = annual_salary + bonus
+            total_tax = self.calculate_accumulated_tax(total_income, annual_deductions + annual_special_deductions + (self.basic_deduction * 12))
+            bonus_tax = total_tax - salary_tax
+            bonus_taxable_income = bonus
+        
+        # 计算其他收入的税款
+        labor_tax = labor_income * 0.2 if labor_income > 0 else 0
+        manuscript_tax = manuscript_income * 0.14 if manuscript_income > 0 else 0  # 稿酬所得适用70%计税
+        license_tax = license_income * 0.2 if license_income > 0 else 0
+        
+        # 计算总税额和税后收入
+        total_tax = salary_tax + bonus_tax + labor_tax + manuscript_tax + license_tax
+        total_income = annual_salary + bonus + labor_income + manuscript_income + license_income
+        net_income = total_income - total_tax - annual_deductions
+        
+        return TaxResult(
+            salary_taxable_income=salary_taxable_income,
+            salary_tax=salary_tax,
+            bonus_taxable_income=bonus_taxable_income,
+            bonus_tax=bonus_tax,
+            labor_income=labor_income,
+            labor_tax=labor_tax,
+            manuscript_income=manuscript_income,
+            manuscript_tax=manuscript_tax,
+            license_income=license_income,
+            license_tax=license_tax,
+            total_taxable_income=total_income - annual_deductions - (self.basic_deduction * 12),
+            total_tax=total_tax,
+            total_deductions=annual_deductions + annual_special_deductions + (self.basic_deduction * 12),
+            net_income=net_income
+        )
 
 def format_money(amount: float) -> str:
     """格式化金额显示"""
@@ -180,7 +403,7 @@ def main():
                 monthly_salary = float(input("请输入月收入（元）："))
                 deductions = float(input("请输入月度专项附加扣除总额（元）："))
                 
-                monthly_tax = calculator.calculate_monthly_tax(monthly_salary, deductions)
+                monthly_tax = calculator.calculate_monthly_tax(1, monthly_salary, {'other': deductions})
                 print("\n计算结果：")
                 print(f"应缴纳月度个税：{format_money(monthly_tax)}元")
                 print(f"税后收入：{format_money(monthly_salary - monthly_tax)}元")
@@ -213,10 +436,26 @@ def main():
         else:
             print("无效的选择，请重试！")
 
+@lru_cache(maxsize=32)
+def _calculator_for_rules(rules: TaxRuleSet) -> TaxCalculator:
+    return TaxCalculator(rules=rules)
+
+def get_calculator(tax_year: int = None) -> TaxCalculator:
+    """
+    返回指定年度规则的共享计算器，TaxCalculator 本身无状态，可以跨线程复用
+    
+    计算器按规则对象缓存，规则文件重新加载后自动换用新规则的计算器。
+    """
+    return _calculator_for_rules(get_rules(tax_year))
+
+def calculate_tax_record(tax_input: TaxInput) -> TaxResult:
+    """按 tax_input.tax_year 年度的规则计算个人所得税，返回结果记录"""
+    return get_calculator(tax_input.tax_year).calculate(tax_input)
+
 def calculate_tax(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
                  labor_income=0, manuscript_income=0, license_income=0,
                  social_security_base=0, housing_fund_rate=0,
-                 special_deductions=None):
+                 special_deductions=None, tax_year=None, city=None):
     """
     计算个人所得税
     
@@ -231,70 +470,66 @@ def calculate_tax(salary=0, salary_type='monthly', bonus=0, bonus_type='separate
         social_security_base: 社保缴纳基数
         housing_fund_rate: 公积金缴纳比例
         special_deductions: 专项附加扣除字典
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+        city: 城市，给出时按该城市的缴费基数上下限和比例计算社保公积金
     
     Returns:
-        包含计算结果的字典
+        包含计算结果的字典，字段顺序为 RESULT_FIELDS
     """
-    calculator = TaxCalculator()
+    return calculate_tax_record(TaxInput(salary, salary_type, bonus, bonus_type, labor_income, manuscript_income,
+                                         license_income, social_security_base, housing_fund_rate,
+                                         special_deductions, tax_year, city)).to_dict()
+
+def calculate_gross_from_net(net_income, salary_type='monthly', bonus=0, bonus_type='separate',
+                             social_security_base=0, housing_fund_rate=0,
+                             special_deductions=None, tax_year=None, city=None):
+    """
+    税前反推：求使 calculate_tax 的税后收入等于 net_income 的工资
+    
+    Args:
+        net_income: 目标年度税后收入（与 calculate_tax 返回的 net_income 含义相同）
+        salary_type: 返回的工资类型（'monthly' 或 'annual'）
+        bonus: 年终奖（已知金额）
+        bonus_type: 奖金计税方式（'separate' 或 'combined'）
+        social_security_base: 社保缴纳基数
+        housing_fund_rate: 公积金缴纳比例
+        special_deductions: 专项附加扣除字典
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+        city: 城市，给出时按该城市的缴费基数上下限和比例计算社保公积金
+    
+    Returns:
+        包含 salary（按 salary_type）、annual_salary、bonus、net_income 的字典
+        
+    Raises:
+        ValueError: 目标税后收入低于工资为0时的税后收入
+    """
+    calculator = get_calculator(tax_year)
     
-    # 处理专项附加扣除
     if special_deductions is None:
         special_deductions = {}
     
-    # 计算年度工资收入
-    if salary_type == 'monthly':
-        annual_salary = salary * 12
-    else:
-        annual_salary = salary
-    
-    # 计算社保和公积金
-    monthly_social_security = social_security_base * 0.205  # 假设社保总比例为20.5%
-    monthly_housing_fund = social_security_base * (housing_fund_rate / 100)
+    # 与 calculate_tax 相同的扣除计算
+    monthly_social_security, monthly_housing_fund = calculator.calculate_contributions(
+        social_security_base, housing_fund_rate, city)
     annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+    annual_special_deductions = sum(special_deductions.values()) * 12
+    total_deductions = annual_deductions + annual_special_deductions + (calculator.basic_deduction * 12)
     
-    # 计算专项附加扣除总额
-    monthly_special_deductions = sum(special_deductions.values())
-    annual_special_deductions = monthly_special_deductions * 12
-    
-    # 计算工资薪金所得税
-    salary_taxable_income = annual_salary - annual_deductions - annual_special_deductions - (calculator.basic_deduction * 12)
-    salary_tax = calculator.calculate_accumulated_tax(annual_salary, annual_deductions + annual_special_deductions + (calculator.basic_deduction * 12))
-    
-    # 计算年终奖个税
+    # 税后收入 = (所得额 - 所得额应纳税额) + 扣除总额 - 三险一金 [+ 单独计税的税后年终奖]
+    after_tax_income = net_income - (total_deductions - annual_deductions)
     if bonus_type == 'separate':
-        bonus_tax = calculator.calculate_bonus_tax(bonus)
-        bonus_taxable_income = bonus
+        after_tax_income -= bonus - calculator.calculate_bonus_tax(bonus)
+        annual_salary = calculator.tax_table.solve_taxable_income(after_tax_income) + total_deductions
     else:
-        # 并入年收入计算
-        total_income = annual_salary + bonus
-        total_tax = calculator.calculate_accumulated_tax(total_income, annual_deductions + annual_special_deductions + (calculator.basic_deduction * 12))
-        bonus_tax = total_tax - salary_tax
-        bonus_taxable_income = bonus
-    
-    # 计算其他收入的税款
-    labor_tax = labor_income * 0.2 if labor_income > 0 else 0
-    manuscript_tax = manuscript_income * 0.14 if manuscript_income > 0 else 0  # 稿酬所得适用70%计税
-    license_tax = license_income * 0.2 if license_income > 0 else 0
+        annual_salary = calculator.tax_table.solve_taxable_income(after_tax_income) + total_deductions - bonus
     
-    # 计算总税额和税后收入
-    total_tax = salary_tax + bonus_tax + labor_tax + manuscript_tax + license_tax
-    total_income = annual_salary + bonus + labor_income + manuscript_income + license_income
-    net_income = total_income - total_tax - annual_deductions
+    if annual_salary < 0:
+        raise ValueError('目标税后收入低于工资为0时的税后收入')
     
     return {
-        'salary_taxable_income': salary_taxable_income,
-        'salary_tax': salary_tax,
-        'bonus_taxable_income': bonus_taxable_income,
-        'bonus_tax': bonus_tax,
-        'labor_income': labor_income,
-        'labor_tax': labor_tax,
-        'manuscript_income': manuscript_income,
-        'manuscript_tax': manuscript_tax,
-        'license_income': license_income,
-        'license_tax': license_tax,
-        'total_taxable_income': total_income - annual_deductions - (calculator.basic_deduction * 12),
-        'total_tax': total_tax,
-        'total_deductions': annual_deductions + annual_special_deductions + (calculator.basic_deduction * 12),
+        'salary': annual_salary / 12 if salary_type == 'monthly' else annual_salary,
+        'annual_salary': annual_salary,
+        'bonus': bonus,
         'net_income': net_income
     }
 
@@ -1,10 +1,156 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tax_calculator import TaxCalculator, format_money
 
+# 实时计算：最后一次输入后等待的毫秒数，以及检查后台计算结果的间隔
+DEBOUNCE_MS = 250
+POLL_MS = 50
+
+# 只影响三险一金的输入
+INSURANCE_INPUTS = ('insurance_base', 'housing_fund_ratio')
+
+# 专项附加扣除输入，按此顺序相加
+ADDITIONAL_INPUTS = ('children_education', 'continuing_education', 'housing_loan', 'housing_rent', 'elderly_care')
+
+def calculate_insurance(calculator, base, ratio):
+    """按当前规则的个人缴纳比例计算每月三险一金"""
+    insurance_rates = calculator.rules.employee_insurance_rates
+    return {
+        'pension': base * insurance_rates.get('pension', 0),  # 养老保险
+        'medical': base * insurance_rates.get('medical', 0),  # 医疗保险
+        'unemployment': base * insurance_rates.get('unemployment', 0),  # 失业保险
+        'housing_fund': base * (ratio / 100)  # 住房公积金
+    }
+
+def calculate_summary(calculator, inputs, insurance):
+    """计算收入、扣除和应纳税额，计算量很小，每次输入变化都重新计算"""
+    if inputs['salary_type'] == "monthly":
+        annual_salary = inputs['salary'] * 12
+    else:
+        annual_salary = inputs['salary']
+    bonus = inputs['bonus']
+    insurance_total = (insurance['pension'] + insurance['medical'] + insurance['unemployment']
+                       + insurance['housing_fund'])
+    additional_total = sum(inputs[name] for name in ADDITIONAL_INPUTS)
+    
+    # 年度基本减除费用，来自当前规则
+    basic_deductions = calculator.basic_deduction * 12
+    total_deductions = basic_deductions + insurance_total * 12 + additional_total * 12
+    
+    # 不含年终奖的总收入，年终奖方案对比以此为基础
+    base_income = annual_salary + inputs['labor'] + inputs['royalty'] + inputs['license_fee']
+    total_income = base_income
+    if inputs['bonus_type'] == "combined":
+        total_income += bonus
+    
+    bonus_tax = 0
+    if bonus > 0 and inputs['bonus_type'] == "separate":
+        bonus_tax = calculator.calculate_bonus_tax(bonus)
+    return {
+        'inputs': inputs,
+        'annual_salary': annual_salary,
+        'base_income': base_income,
+        'total_income': total_income,
+        'insurance_total': insurance_total,
+        'additional_total': additional_total,
+        'basic_deductions': basic_deductions,
+        'total_deductions': total_deductions,
+        'taxable_income': total_income - basic_deductions - insurance_total * 12 - additional_total * 12,
+        'tax': calculator.calculate_accumulated_tax(total_income, total_deductions, 0),
+        'bonus_tax': bonus_tax
+    }
+
+def comparison_key(summary):
+    """年终奖方案对比只取决于不含年终奖的收入、扣除和年终奖金额，与所选计税方式无关"""
+    return (summary['base_income'], summary['total_deductions'], summary['inputs']['bonus'],
+            summary['insurance_total'] + summary['additional_total'])
+
+def calculate_bonus_comparison(calculator, base_income, total_deductions, bonus, monthly_deductions):
+    """年终奖单独计税、并入年收入和最优拆分三种方案的税额，在后台线程中计算"""
+    separate_bonus_tax = calculator.calculate_bonus_tax(bonus)
+    separate_total_tax = calculator.calculate_accumulated_tax(base_income, total_deductions, 0) + separate_bonus_tax
+    combined_tax = calculator.calculate_accumulated_tax(base_income + bonus, total_deductions, 0)
+    split = calculator.optimize_bonus_split(base_income, bonus, monthly_deductions)
+    return {
+        'separate_bonus_tax': separate_bonus_tax,
+        'separate_total_tax': separate_total_tax,
+        'combined_tax': combined_tax,
+        'split_separate_bonus': split['separate_bonus'],
+        'split_combined_bonus': split['combined_bonus'],
+        'split_tax': split['tax'],
+        'split_tax_saved': split['tax_saved']
+    }
+
+def build_result_lines(summary, comparison):
+    """
+    生成结果文本的各行，comparison 为 None 表示方案对比仍在计算
+    
+    逐行收集后再拼接，避免反复拼接长字符串；界面按行比较，只改写变化的行。
+    """
+    inputs = summary['inputs']
+    bonus = inputs['bonus']
+    separate = inputs['bonus_type'] == "separate"
+    lines = ["=== 个人所得税计算结果 ===", "", "【收入项】",
+             f"工资薪金（年）：{format_money(summary['annual_salary'])}元"]
+    if bonus > 0:
+        lines.append(f"年终奖金：{format_money(bonus)}元 ({'单独计税' if separate else '并入年收入'})")
+    if inputs['labor'] > 0:
+        lines.append(f"劳务报酬：{format_money(inputs['labor'])}元")
+    if inputs['royalty'] > 0:
+        lines.append(f"稿酬收入：{format_money(inputs['royalty'])}元")
+    if inputs['license_fee'] > 0:
+        lines.append(f"特许权使用费：{format_money(inputs['license_fee'])}元")
+    lines += [
+        f"总收入：{format_money(summary['total_income'])}元",
+        "",
+        "【费用扣除项】",
+        f"基本减除费用：{format_money(summary['basic_deductions'])}元",
+        f"三险一金（年）：{format_money(summary['insurance_total'] * 12)}元",
+        f"专项附加扣除（年）：{format_money(summary['additional_total'] * 12)}元",
+        f"扣除总额：{format_money(summary['total_deductions'])}元",
+        "",
+        "【应纳税额】",
+        f"应纳税所得额：{format_money(summary['taxable_income'])}元"
+    ]
+    if separate and bonus > 0:
+        lines.append(f"年终奖单独缴税：{format_money(summary['bonus_tax'])}元")
+        lines.append(f"总应缴税额：{format_money(summary['tax'] + summary['bonus_tax'])}元")
+    else:
+        lines.append(f"总应缴税额：{format_money(summary['tax'])}元")
+    
+    if bonus > 0:
+        lines += ["", "【年终奖方案对比】"]
+        if comparison is None:
+            lines.append("计算中……")
+            return lines
+        separate_total_tax = comparison['separate_total_tax']
+        combined_tax = comparison['combined_tax']
+        lines += [
+            "方案1 - 单独计税：",
+            f"  年终奖税额：{format_money(comparison['separate_bonus_tax'])}元",
+            f"  总税额：{format_money(separate_total_tax)}元",
+            "",
+            "方案2 - 合并计税：",
+            f"  总税额：{format_money(combined_tax)}元",
+            "",
+            f"税额差额：{format_money(abs(combined_tax - separate_total_tax))}元",
+            f"建议方案：{'单独计税' if separate_total_tax < combined_tax else '合并计税'}"
+        ]
+        if comparison['split_tax_saved'] > 0:
+            lines += [
+                "",
+                f"最优拆分：单独计税{format_money(comparison['split_separate_bonus'])}元，"
+                f"并入年收入{format_money(comparison['split_combined_bonus'])}元",
+                f"  总税额：{format_money(comparison['split_tax'])}元"
+                f"（比建议方案少{format_money(comparison['split_tax_saved'])}元）"
+            ]
+    return lines
+
 class TaxCalculatorGUI:
     def __init__(self, root):
         self.root = root
@@ -12,6 +158,23 @@ class TaxCalculatorGUI:
         self.root.geometry("1200x800")  # 增加窗口宽度以适应新布局
         self.calculator = TaxCalculator()
         
+        # 实时计算状态：上一次的输入、各阶段的结果和当前显示的结果行
+        self.live_mode = tk.BooleanVar(value=True)
+        self._pending = None
+        self._inputs = None
+        self._insurance = None
+        self._insurance_key = None
+        self._summary = None
+        self._comparison_key = None
+        self._comparison = None
+        self._lines = []
+        
+        # 年终奖方案对比在后台线程计算，结果经队列交回主线程
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = threading.Thread(target=self._work, name='tax-gui-worker', daemon=True)
+        self._worker.start()
+        
         # 设置样式
         style = ttk.Style()
         style.configure("TLabel", padding=5, font=('微软雅黑', 10))
@@ -42,6 +205,14 @@ class TaxCalculatorGUI:
         # 在右侧框架中设置结果显示部分
         self.setup_result_section()
         
+        # 输入变化时延迟重新计算
+        for entry in (self.salary_entry, self.bonus_entry, self.labor_entry, self.royalty_entry,
+                      self.license_fee_entry, self.children_education, self.continuing_education,
+                      self.housing_loan, self.housing_rent, self.elderly_care):
+            entry.bind('<KeyRelease>', self.schedule_recompute)
+        self.root.after(POLL_MS, self._poll_results)
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        
     def setup_income_section(self):
         # 收入部分
         income_frame = ttk.LabelFrame(self.left_frame, text="收入项（请输入）", padding="10", style="Section.TLabelframe")
@@ -54,9 +225,9 @@ class TaxCalculatorGUI:
         ttk.Label(salary_frame, text="工资薪金：").grid(row=0, column=0, sticky=tk.W)
         self.salary_type = tk.StringVar(value="monthly")
         ttk.Radiobutton(salary_frame, text="月收入", variable=self.salary_type, 
-                       value="monthly").grid(row=0, column=1)
+                       value="monthly", command=self.schedule_recompute).grid(row=0, column=1)
         ttk.Radiobutton(salary_frame, text="年收入", variable=self.salary_type, 
-                       value="annual").grid(row=0, column=2)
+                       value="annual", command=self.schedule_recompute).grid(row=0, column=2)
         self.salary_entry = ttk.Entry(salary_frame, width=20)
         self.salary_entry.grid(row=0, column=3, padx=5)
         ttk.Label(salary_frame, text="元").grid(row=0, column=4)
@@ -71,9 +242,9 @@ class TaxCalculatorGUI:
         ttk.Label(bonus_frame, text="元").grid(row=0, column=2)
         self.bonus_type = tk.StringVar(value="separate")
         ttk.Radiobutton(bonus_frame, text="单独计税", variable=self.bonus_type, 
-                       value="separate").grid(row=0, column=3)
+                       value="separate", command=self.schedule_recompute).grid(row=0, column=3)
         ttk.Radiobutton(bonus_frame, text="并入年收入", variable=self.bonus_type, 
-                       value="combined").grid(row=0, column=4)
+                       value="combined", command=self.schedule_recompute).grid(row=0, column=4)
         
         # 其他收入
         other_income_frame = ttk.Frame(income_frame)
@@ -118,29 +289,37 @@ class TaxCalculatorGUI:
         self.housing_fund_ratio.grid(row=0, column=4, padx=5)
         ttk.Label(base_frame, text="%").grid(row=0, column=5)
         
-        # 三险一金（自动计算）
+        # 三险一金（自动计算），只读输入框绑定到 StringVar，数值变化时才更新显示
+        self.insurance_vars = {name: tk.StringVar() for name in
+                               ('pension', 'medical', 'unemployment', 'housing_fund')}
         insurance_frame = ttk.Frame(deduction_frame)
         insurance_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=5)
         
         ttk.Label(insurance_frame, text="养老保险：").grid(row=0, column=0, sticky=tk.W)
-        self.pension_entry = ttk.Entry(insurance_frame, width=15, state='readonly')
+        self.pension_entry = ttk.Entry(insurance_frame, width=15, state='readonly',
+                                       textvariable=self.insurance_vars['pension'])
         self.pension_entry.grid(row=0, column=1, padx=5)
         
         ttk.Label(insurance_frame, text="医疗保险：").grid(row=0, column=2, sticky=tk.W, padx=(20,0))
-        self.medical_entry = ttk.Entry(insurance_frame, width=15, state='readonly')
+        self.medical_entry = ttk.Entry(insurance_frame, width=15, state='readonly',
+                                       textvariable=self.insurance_vars['medical'])
         self.medical_entry.grid(row=0, column=3, padx=5)
         
         ttk.Label(insurance_frame, text="失业保险：").grid(row=1, column=0, sticky=tk.W, pady=5)
-        self.unemployment_entry = ttk.Entry(insurance_frame, width=15, state='readonly')
+        self.unemployment_entry = ttk.Entry(insurance_frame, width=15, state='readonly',
+                                            textvariable=self.insurance_vars['unemployment'])
         self.unemployment_entry.grid(row=1, column=1, padx=5)
         
         ttk.Label(insurance_frame, text="住房公积金：").grid(row=1, column=2, sticky=tk.W, padx=(20,0))
-        self.housing_fund_entry = ttk.Entry(insurance_frame, width=15, state='readonly')
+        self.housing_fund_entry = ttk.Entry(insurance_frame, width=15, state='readonly',
+                                            textvariable=self.insurance_vars['housing_fund'])
         self.housing_fund_entry.grid(row=1, column=3, padx=5)
         
         # 绑定基数变化事件
         self.insurance_base.bind('<KeyRelease>', self.update_insurance)
         self.housing_fund_ratio.bind('<KeyRelease>', self.update_insurance)
+        # 输入过程中不改写比例，离开输入框时再按5-12%规范显示
+        self.housing_fund_ratio.bind('<FocusOut>', self.normalize_housing_fund_ratio)
         
         # 专项附加扣除
         additional_frame = ttk.LabelFrame(self.left_frame, text="专项附加扣除（请输入）", padding="10", style="Section.TLabelframe")
@@ -176,47 +355,46 @@ class TaxCalculatorGUI:
         button_frame.grid(row=3, column=0, sticky=(tk.E), pady=20)
         ttk.Button(button_frame, text="计算个人所得税", command=self.calculate_tax, 
                   style="TButton").pack(side=tk.RIGHT, padx=10)
+        ttk.Checkbutton(button_frame, text="实时计算", variable=self.live_mode,
+                        command=self.schedule_recompute).pack(side=tk.RIGHT)
+        
+    def housing_fund_rate(self):
+        """当前公积金缴纳比例，未填写时为5%，限制在5-12%之间"""
+        ratio = float(self.housing_fund_ratio.get() or 5)
+        return max(5, min(12, ratio))
+        
+    def normalize_housing_fund_ratio(self, event=None):
+        """把公积金比例输入框改写为限制后的比例"""
+        try:
+            text = f"{self.housing_fund_rate():g}"
+        except ValueError:
+            return
+        if self.housing_fund_ratio.get() != text:
+            self.housing_fund_ratio.delete(0, tk.END)
+            self.housing_fund_ratio.insert(0, text)
+        self.update_insurance()
         
     def update_insurance(self, event=None):
         """根据基数和比例更新三险一金金额"""
         try:
             base = float(self.insurance_base.get() or 0)
-            ratio = float(self.housing_fund_ratio.get() or 5)
-            
-            # 限制公积金比例在5-12%之间
-            ratio = max(5, min(12, ratio))
-            self.housing_fund_ratio.delete(0, tk.END)
-            self.housing_fund_ratio.insert(0, str(ratio))
-            
-            # 计算各项保险金额
-            pension = base * 0.08  # 养老保险 8%
-            medical = base * 0.02  # 医疗保险 2%
-            unemployment = base * 0.005  # 失业保险 0.5%
-            housing_fund = base * (ratio / 100)  # 住房公积金
-            
-            # 更新显示
-            self.pension_entry.configure(state='normal')
-            self.medical_entry.configure(state='normal')
-            self.unemployment_entry.configure(state='normal')
-            self.housing_fund_entry.configure(state='normal')
-            
-            self.pension_entry.delete(0, tk.END)
-            self.medical_entry.delete(0, tk.END)
-            self.unemployment_entry.delete(0, tk.END)
-            self.housing_fund_entry.delete(0, tk.END)
-            
-            self.pension_entry.insert(0, format_money(pension))
-            self.medical_entry.insert(0, format_money(medical))
-            self.unemployment_entry.insert(0, format_money(unemployment))
-            self.housing_fund_entry.insert(0, format_money(housing_fund))
-            
-            self.pension_entry.configure(state='readonly')
-            self.medical_entry.configure(state='readonly')
-            self.unemployment_entry.configure(state='readonly')
-            self.housing_fund_entry.configure(state='readonly')
-            
+            ratio = self.housing_fund_rate()
         except ValueError:
-            pass
+            return
+        self.set_insurance(base, ratio)
+        if event is not None:
+            self.schedule_recompute()
+            
+    def set_insurance(self, base, ratio):
+        """重新计算三险一金，只改写金额有变化的输入框"""
+        if self._insurance is not None and self._insurance_key == (base, ratio):
+            return
+        self._insurance_key = (base, ratio)
+        self._insurance = calculate_insurance(self.calculator, base, ratio)
+        for name, amount in self._insurance.items():
+            text = format_money(amount)
+            if self.insurance_vars[name].get() != text:
+                self.insurance_vars[name].set(text)
             
     def setup_result_section(self):
         # 计算结果显示区域
@@ -253,129 +431,141 @@ class TaxCalculatorGUI:
         """处理鼠标滚轮事件"""
         self.result_text.yview_scroll(int(-1 * (event.delta / 120)), "units")
         
-    def get_deductions_total(self):
-        """计算专项扣除和专项附加扣除总额"""
+    def read_inputs(self):
+        """读取全部输入，未填写的金额为0"""
         try:
-            # 三险一金
-            pension = float(self.pension_entry.get() or 0)
-            medical = float(self.medical_entry.get() or 0)
-            unemployment = float(self.unemployment_entry.get() or 0)
-            housing_fund = float(self.housing_fund_entry.get() or 0)
-            
-            # 专项附加扣除
-            children_edu = float(self.children_education.get() or 0)
-            continuing_edu = float(self.continuing_education.get() or 0)
-            housing_loan = float(self.housing_loan.get() or 0)
-            housing_rent = float(self.housing_rent.get() or 0)
-            elderly_care = float(self.elderly_care.get() or 0)
-            
-            insurance_total = pension + medical + unemployment + housing_fund
-            additional_total = (children_edu + continuing_edu + housing_loan + 
-                              housing_rent + elderly_care)
-            
-            return insurance_total, additional_total
-            
+            inputs = {
+                'salary': float(self.salary_entry.get() or 0),
+                'salary_type': self.salary_type.get(),
+                'bonus': float(self.bonus_entry.get() or 0),
+                'bonus_type': self.bonus_type.get(),
+                'labor': float(self.labor_entry.get() or 0),
+                'royalty': float(self.royalty_entry.get() or 0),
+                'license_fee': float(self.license_fee_entry.get() or 0),
+                'insurance_base': float(self.insurance_base.get() or 0),
+                'housing_fund_ratio': self.housing_fund_rate()
+            }
+            for name in ADDITIONAL_INPUTS:
+                inputs[name] = float(getattr(self, name).get() or 0)
+            return inputs
         except ValueError:
             raise ValueError("请输入有效的数字！")
             
-    def calculate_tax(self):
+    def get_deductions_total(self):
+        """计算专项扣除和专项附加扣除总额"""
+        inputs = self.read_inputs()
+        self.set_insurance(inputs['insurance_base'], inputs['housing_fund_ratio'])
+        summary = calculate_summary(self.calculator, inputs, self._insurance)
+        return summary['insurance_total'], summary['additional_total']
+        
+    def schedule_recompute(self, event=None):
+        """实时计算模式下，输入停止 DEBOUNCE_MS 毫秒后重新计算"""
+        if not self.live_mode.get():
+            return
+        if self._pending is not None:
+            self.root.after_cancel(self._pending)
+        self._pending = self.root.after(DEBOUNCE_MS, self._live_recompute)
+        
+    def _live_recompute(self):
+        self._pending = None
         try:
-            # 获取收入数据
-            salary = float(self.salary_entry.get() or 0)
-            if self.salary_type.get() == "monthly":
-                annual_salary = salary * 12
-            else:
-                annual_salary = salary
-                
-            bonus = float(self.bonus_entry.get() or 0)
-            labor = float(self.labor_entry.get() or 0)
-            royalty = float(self.royalty_entry.get() or 0)
-            license_fee = float(self.license_fee_entry.get() or 0)
-            
-            # 获取扣除数据
-            insurance_total, additional_total = self.get_deductions_total()
-            
-            # 计算总收入
-            total_income = annual_salary + labor + royalty + license_fee
-            if self.bonus_type.get() == "combined":
-                total_income += bonus
-            
-            # 计算应纳税所得额
-            taxable_income = total_income - 60000 - insurance_total * 12 - additional_total * 12
-            
-            # 计算税额
-            tax = self.calculator.calculate_accumulated_tax(total_income, 
-                                                         60000 + insurance_total * 12 + additional_total * 12, 
-                                                         0)
-            
-            # 如果年终奖单独计税
-            bonus_tax = 0
-            if bonus > 0 and self.bonus_type.get() == "separate":
-                bonus_tax = self.calculator.calculate_bonus_tax(bonus)
-            
-            # 显示结果
-            result = "=== 个人所得税计算结果 ===\n\n"
-            result += "【收入项】\n"
-            result += f"工资薪金（年）：{format_money(annual_salary)}元\n"
-            if bonus > 0:
-                result += f"年终奖金：{format_money(bonus)}元 ({self.bonus_type.get() == 'separate' and '单独计税' or '并入年收入'})\n"
-            if labor > 0:
-                result += f"劳务报酬：{format_money(labor)}元\n"
-            if royalty > 0:
-                result += f"稿酬收入：{format_money(royalty)}元\n"
-            if license_fee > 0:
-                result += f"特许权使用费：{format_money(license_fee)}元\n"
-            result += f"总收入：{format_money(total_income)}元\n\n"
-            
-            result += "【费用扣除项】\n"
-            result += f"基本减除费用：{format_money(60000)}元\n"
-            result += f"三险一金（年）：{format_money(insurance_total * 12)}元\n"
-            result += f"专项附加扣除（年）：{format_money(additional_total * 12)}元\n"
-            result += f"扣除总额：{format_money(60000 + insurance_total * 12 + additional_total * 12)}元\n\n"
+            self.recompute()
+        except ValueError:
+            # 输入不完整时保留上一次的结果
+            pass
             
-            result += "【应纳税额】\n"
-            result += f"应纳税所得额：{format_money(taxable_income)}元\n"
-            if self.bonus_type.get() == "separate" and bonus > 0:
-                result += f"年终奖单独缴税：{format_money(bonus_tax)}元\n"
-                result += f"总应缴税额：{format_money(tax + bonus_tax)}元\n"
-            else:
-                result += f"总应缴税额：{format_money(tax)}元\n"
+    def recompute(self, synchronous=False):
+        """
+        按变化的输入重新计算
+        
+        三险一金只在基数或比例变化时重算；年终奖方案对比只在其依赖的金额变化时重算，
+        实时计算时交给后台线程，结果返回前该部分显示为计算中。
+        """
+        inputs = self.read_inputs()
+        if inputs == self._inputs and not synchronous:
+            return
+        self._inputs = inputs
+        self.set_insurance(inputs['insurance_base'], inputs['housing_fund_ratio'])
+        summary = calculate_summary(self.calculator, inputs, self._insurance)
+        
+        if inputs['bonus'] > 0:
+            key = comparison_key(summary)
+            if key != self._comparison_key:
+                self._comparison_key = key
+                self._comparison = None
+                if not synchronous:
+                    self._jobs.put(key)
+            if synchronous and self._comparison is None:
+                self._comparison = calculate_bonus_comparison(self.calculator, *key)
+        self._summary = summary
+        self._render()
+        
+    def _work(self):
+        """后台线程：只计算队列中最新的方案对比请求"""
+        while True:
+            key = self._jobs.get()
+            while key is not None:
+                try:
+                    key = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+            if key is None:
+                return
+            self._results.put((key, calculate_bonus_comparison(self.calculator, *key)))
             
-            # 计算并显示年终奖两种方案的对比
-            if bonus > 0:
-                result += "\n【年终奖方案对比】\n"
-                # 单独计税
-                separate_bonus_tax = self.calculator.calculate_bonus_tax(bonus)
-                separate_total_tax = tax + separate_bonus_tax
-                
-                # 合并计税
-                combined_total_income = total_income + bonus
-                combined_tax = self.calculator.calculate_accumulated_tax(
-                    combined_total_income,
-                    60000 + insurance_total * 12 + additional_total * 12,
-                    0
-                )
-                
-                result += f"方案1 - 单独计税：\n"
-                result += f"  年终奖税额：{format_money(separate_bonus_tax)}元\n"
-                result += f"  总税额：{format_money(separate_total_tax)}元\n\n"
-                
-                result += f"方案2 - 合并计税：\n"
-                result += f"  总税额：{format_money(combined_tax)}元\n\n"
-                
-                # 计算差额
-                tax_diff = abs(combined_tax - separate_total_tax)
-                better_plan = "单独计税" if separate_total_tax < combined_tax else "合并计税"
-                result += f"税额差额：{format_money(tax_diff)}元\n"
-                result += f"建议方案：{better_plan}\n"
+    def _poll_results(self):
+        """在主线程中取回后台计算结果，Tk 组件只在主线程中更新"""
+        updated = False
+        while True:
+            try:
+                key, comparison = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if key == self._comparison_key and self._comparison is None:
+                self._comparison = comparison
+                updated = True
+        if updated:
+            self._render()
+        self.root.after(POLL_MS, self._poll_results)
+        
+    def _render(self):
+        self._show_lines(build_result_lines(self._summary, self._comparison))
+        
+    def _show_lines(self, lines):
+        """只改写与当前显示不同的结果行"""
+        old = self._lines
+        if self.result_text.get('1.0', 'end-1c') != "\n".join(old):
+            # 结果区被手动修改过，整体重写
+            old = []
+            self.result_text.delete('1.0', tk.END)
+        if len(old) == len(lines):
+            for number, (before, after) in enumerate(zip(old, lines), 1):
+                if before != after:
+                    self.result_text.delete(f'{number}.0', f'{number}.end')
+                    self.result_text.insert(f'{number}.0', after)
+        else:
+            prefix = 0
+            while prefix < min(len(old), len(lines)) and old[prefix] == lines[prefix]:
+                prefix += 1
+            if prefix == 0:
+                self.result_text.delete('1.0', tk.END)
+                self.result_text.insert('1.0', "\n".join(lines))
             else:
-                result += f"总应缴税额：{format_money(tax)}元\n"
-            
-            self.result_text.delete(1.0, tk.END)
-            self.result_text.insert(tk.END, result)
-            
+                self.result_text.delete(f'{prefix}.end', tk.END)
+                if lines[prefix:]:
+                    self.result_text.insert(tk.END, "\n" + "\n".join(lines[prefix:]))
+        self._lines = lines
+        
+    def calculate_tax(self):
+        try:
+            self.normalize_housing_fund_ratio()
+            self.recompute(synchronous=True)
         except ValueError as e:
             messagebox.showerror("错误", str(e))
+            
+    def close(self):
+        self._jobs.put(None)
+        self.root.destroy()
 
 def main():
     root = tk.Tk()
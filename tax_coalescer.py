@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+请求合并器
+把短时间窗口内并发到达的单条计算请求合并为一次批量计算，再把结果分发回各个请求。
+需要配合多线程的Web worker（如 gunicorn --threads）才会有并发请求可合并。
+"""
+
+import threading
+import time
+from collections import deque
+
+from tax_batch import calculate_tax_batch
+from tax_metrics import Histogram
+from tax_records import TaxResult
+
+# 批大小直方图的分桶上限
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class _PendingRequest:
+    __slots__ = ('key', 'enqueued_at', 'done', 'result', 'error')
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def calculate_keys(keys: list) -> list:
+    """
+    计算一组缓存键（见 tax_cache.make_cache_key），按顺序返回结果记录（TaxResult）
+
+    同一纳税年度的键用一次向量化调用计算。
+    """
+    years = {key[11] for key in keys}
+    if len(years) > 1:
+        results = [None] * len(keys)
+        for year in years:
+            positions = [position for position, key in enumerate(keys) if key[11] == year]
+            for position, result in zip(positions, calculate_keys([keys[position] for position in positions])):
+                results[position] = result
+        return results
+
+    columns = list(zip(*keys))
+    special_deductions = [float(sum(amount for _, amount in items)) for items in columns[9]]
+    results = calculate_tax_batch(
+        salary=columns[0],
+        salary_type=columns[1],
+        bonus=columns[2],
+        bonus_type=columns[3],
+        labor_income=columns[4],
+        manuscript_income=columns[5],
+        license_income=columns[6],
+        social_security_base=columns[7],
+        housing_fund_rate=columns[8],
+        special_deductions=special_deductions,
+        tax_year=columns[11][0],
+        city=columns[10]
+    )
+    return TaxResult.from_columns(results)
+
+
+class RequestCoalescer:
+    """
+    微批量请求合并器
+
+    第一个请求到达后最多等待 window 秒，或凑满 max_batch_size 个请求，
+    然后在后台线程中一次性计算整批请求。
+
+    Args:
+        window: 合并窗口（秒）
+        max_batch_size: 每批最多合并的请求数
+        timeout: 等待所在批次结果的最长时间（秒），超时（如后台线程异常退出）后直接计算该请求
+    """
+
+    def __init__(self, window: float = 0.002, max_batch_size: int = 64, timeout: float = 1.0):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+
+        # 统计指标
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.timeouts = 0
+        # 批大小分布，可直接注册到 MetricsRegistry 以Prometheus直方图输出
+        self.batch_sizes = Histogram('tax_coalescer_batch_size', 'Requests per coalesced batch',
+                                     buckets=BATCH_SIZE_BUCKETS)
+        self.queue_delays = Histogram('tax_coalescer_queue_delay_seconds',
+                                      'Time requests wait in the coalescer queue')
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def _ensure_started(self):
+        # gunicorn 等预先fork的服务器中，线程必须在worker进程里启动
+        if self._thread is None or not self._thread.is_alive():
+            with self._condition:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='tax-coalescer', daemon=True)
+                    self._thread.start()
+
+    def calculate(self, key: tuple) -> TaxResult:
+        """提交一个缓存键并等待所在批次计算完成，返回结果记录（TaxResult）"""
+        self._ensure_started()
+        pending = _PendingRequest(key)
+        with self._condition:
+            self._queue.append(pending)
+            self._condition.notify()
+        if not pending.done.wait(self.timeout):
+            with self._stats_lock:
+                self.timeouts += 1
+            # 后台线程来不及处理或已经退出时不再等待，之后补算出的结果直接丢弃
+            return calculate_keys([key])[0]
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _next_batch(self) -> list:
+        with self._condition:
+            while not self._queue:
+                self._condition.wait()
+            deadline = self._queue[0].enqueued_at + self.window
+            while len(self._queue) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            size = min(len(self._queue), self.max_batch_size)
+            return [self._queue.popleft() for _ in range(size)]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started_at = time.perf_counter()
+            try:
+                results = calculate_keys([pending.key for pending in batch])
+                for pending, result in zip(batch, results):
+                    pending.result = result
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            for pending in batch:
+                pending.done.set()
+            self._record(batch, started_at)
+
+    def _record(self, batch: list, started_at: float):
+        delays = [started_at - pending.enqueued_at for pending in batch]
+        self.batch_sizes.observe(len(batch))
+        for delay in delays:
+            self.queue_delays.observe(delay)
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.queue_delay_total += sum(delays)
+            self.queue_delay_max = max(self.queue_delay_max, max(delays))
+
+    def stats(self) -> dict:
+        """返回批大小和排队延迟统计"""
+        with self._stats_lock:
+            labels = [str(upper) for upper in BATCH_SIZE_BUCKETS] + ['+Inf']
+            batch_size_counts, _ = self.batch_sizes.snapshot()
+            return {
+                'window': self.window,
+                'max_batch_size': self.max_batch_size,
+                'batches': self.batches,
+                'requests': self.requests,
+                'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+                'batch_size_histogram': dict(zip(labels, batch_size_counts)),
+                'mean_queue_delay': self.queue_delay_total / self.requests if self.requests else 0.0,
+                'max_queue_delay': self.queue_delay_max,
+                'timeouts': self.timeouts
+            }
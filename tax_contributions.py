@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+城市社保公积金缴纳规则
+按城市给出养老、医疗、失业保险和住房公积金的缴费基数上下限及个人缴纳比例，
+编译为按城市下标索引的列数组，批量计算时一次查找所有员工所在城市的规则。
+"""
+
+import numpy as np
+
+# 社会保险险种，合计时按此顺序相加
+INSURANCE_CATEGORIES = ('pension', 'medical', 'unemployment')
+
+
+def city_array(city) -> np.ndarray:
+    """
+    把城市列转换为字符串数组，None 等空值转换为空字符串
+
+    直接用 np.asarray(city, dtype=str) 会把 None 转换为字符串 'None'。
+    """
+    city = np.asarray(city)
+    if city.dtype == object:
+        city = np.array([value or '' for value in city.ravel().tolist()], dtype=str).reshape(city.shape)
+    return city.astype(str, copy=False)
+
+
+class ContributionTable:
+    """
+    编译后的城市缴纳规则表，对象不可变
+
+    Args:
+        cities: {城市: {'pension'|'medical'|'unemployment': {'rate', 'floor', 'cap'},
+                        'housing_fund': {'floor', 'cap', 'min_rate', 'max_rate'}}}，
+            比例为小数，未给出 cap 时不设上限
+    """
+    __slots__ = ('cities', 'index', 'rows', 'floors', 'caps', 'rates',
+                 'housing_floors', 'housing_caps', 'housing_min_rates', 'housing_max_rates')
+
+    def __init__(self, cities: dict):
+        names = tuple(sorted(cities))
+        rows = []
+        for name in names:
+            rules = cities[name]
+            insurance = tuple(
+                (float(rules[category].get('floor', 0)), float(rules[category].get('cap', float('inf'))),
+                 float(rules[category]['rate']))
+                for category in INSURANCE_CATEGORIES)
+            housing = rules.get('housing_fund', {})
+            rows.append((insurance, (float(housing.get('floor', 0)), float(housing.get('cap', float('inf'))),
+                                     float(housing.get('min_rate', 0)), float(housing.get('max_rate', 1)))))
+
+        object.__setattr__(self, 'cities', names)
+        object.__setattr__(self, 'index', {name: position for position, name in enumerate(names)})
+        object.__setattr__(self, 'rows', tuple(rows))
+        # 形状为 (城市数, 险种数) 的基数下限、上限和比例
+        shape = (len(names), len(INSURANCE_CATEGORIES))
+        object.__setattr__(self, 'floors', np.array([[floor for floor, _, _ in insurance]
+                                                     for insurance, _ in rows], dtype=np.float64).reshape(shape))
+        object.__setattr__(self, 'caps', np.array([[cap for _, cap, _ in insurance]
+                                                   for insurance, _ in rows], dtype=np.float64).reshape(shape))
+        object.__setattr__(self, 'rates', np.array([[rate for _, _, rate in insurance]
+                                                    for insurance, _ in rows], dtype=np.float64).reshape(shape))
+        housing = np.array([housing for _, housing in rows], dtype=np.float64).reshape(len(names), 4)
+        object.__setattr__(self, 'housing_floors', housing[:, 0])
+        object.__setattr__(self, 'housing_caps', housing[:, 1])
+        object.__setattr__(self, 'housing_min_rates', housing[:, 2])
+        object.__setattr__(self, 'housing_max_rates', housing[:, 3])
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ContributionTable is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('ContributionTable is immutable')
+
+    def __len__(self) -> int:
+        return len(self.cities)
+
+    def __contains__(self, city) -> bool:
+        return city in self.index
+
+    def calculate(self, city: str, social_security_base: float, housing_fund_rate: float) -> dict:
+        """
+        计算单个员工的月度个人缴纳金额
+
+        缴费基数按城市上下限截取，公积金比例（百分比）按城市允许的范围截取；
+        基数或公积金比例为0表示不参保或不缴存。
+
+        Returns:
+            包含各险种、social_insurance（社保合计）和 housing_fund 的字典
+
+        Raises:
+            ValueError: 没有该城市的规则
+        """
+        position = self.index.get(city)
+        if position is None:
+            raise ValueError(f'No contribution rules for city {city}')
+        insurance, (housing_floor, housing_cap, min_rate, max_rate) = self.rows[position]
+
+        result = {}
+        social_insurance = 0
+        for category, (floor, cap, rate) in zip(INSURANCE_CATEGORIES, insurance):
+            amount = min(max(social_security_base, floor), cap) * rate if social_security_base > 0 else 0
+            result[category] = amount
+            social_insurance = social_insurance + amount
+        result['social_insurance'] = social_insurance
+
+        if social_security_base > 0 and housing_fund_rate > 0:
+            rate = min(max(housing_fund_rate / 100, min_rate), max_rate)
+            result['housing_fund'] = min(max(social_security_base, housing_floor), housing_cap) * rate
+        else:
+            result['housing_fund'] = 0
+        return result
+
+    def lookup(self, city) -> np.ndarray:
+        """
+        把城市列转换为城市下标数组
+
+        只对去重后的城市查一次字典，员工分布在几百个城市时查找次数与城市数而非行数成正比。
+
+        Raises:
+            ValueError: 有城市没有规则
+        """
+        names, inverse = np.unique(np.asarray(city, dtype=str), return_inverse=True)
+        positions = np.empty(len(names), dtype=np.intp)
+        for offset, name in enumerate(names.tolist()):
+            position = self.index.get(name)
+            if position is None:
+                raise ValueError(f'No contribution rules for city {name}')
+            positions[offset] = position
+        return positions[inverse].reshape(np.shape(city))
+
+    def calculate_batch(self, city, social_security_base, housing_fund_rate) -> dict:
+        """
+        向量化计算一批员工的月度个人缴纳金额，结果与逐行调用 calculate 一致
+
+        Args:
+            city: 城市数组或标量
+            social_security_base: 缴费基数数组或标量
+            housing_fund_rate: 公积金比例（百分比）数组或标量
+
+        Returns:
+            {字段名: 数组} 形式的结果，字段与 calculate 相同
+        """
+        city, social_security_base, housing_fund_rate = np.broadcast_arrays(
+            np.asarray(city, dtype=str),
+            np.asarray(social_security_base, dtype=np.float64),
+            np.asarray(housing_fund_rate, dtype=np.float64))
+        position = self.lookup(city)
+        enrolled = social_security_base > 0
+
+        result = {}
+        social_insurance = 0
+        for column, category in enumerate(INSURANCE_CATEGORIES):
+            base = np.minimum(np.maximum(social_security_base, self.floors[position, column]),
+                              self.caps[position, column])
+            amount = np.where(enrolled, base * self.rates[position, column], 0.0)
+            result[category] = amount
+            social_insurance = social_insurance + amount
+        result['social_insurance'] = social_insurance
+
+        rate = np.minimum(np.maximum(housing_fund_rate / 100, self.housing_min_rates[position]),
+                          self.housing_max_rates[position])
+        base = np.minimum(np.maximum(social_security_base, self.housing_floors[position]),
+                          self.housing_caps[position])
+        result['housing_fund'] = np.where(enrolled & (housing_fund_rate > 0), base * rate, 0.0)
+        return result
+
+
+EMPTY_CONTRIBUTION_TABLE = ContributionTable({})
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+整数分（定点数）个税计算引擎
+所有金额以整数“分”表示，所有比例以整数“基点”（1基点 = 0.01%）表示，
+每一步乘以比例后按四舍五入（ROUND_HALF_UP）保留到分，结果在任何机器上逐位一致。
+"""
+
+import math
+from bisect import bisect_left
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache
+
+import numpy as np
+
+from tax_batch import RESULT_FIELDS
+from tax_calculator import DEFAULT_TAX_TABLE, TaxBracketTable, TaxRuleSet, get_rules
+from tax_contributions import INSURANCE_CATEGORIES, city_array
+
+# 基点分母：金额(分) * 比例(基点) / 10000 = 金额(分)
+BASIS_POINTS = 10000
+
+# 劳务报酬、稿酬（按70%计税后为14%）、特许权使用费的比例，与 calculate_tax 相同
+LABOR_RATE_BPS = 2000
+MANUSCRIPT_RATE_BPS = 1400
+LICENSE_RATE_BPS = 2000
+
+# 最高一档没有上限，用int64最大值代替无穷大
+_NO_UPPER_BOUND = np.iinfo(np.int64).max
+
+
+def to_cents(amount) -> int:
+    """
+    将以元为单位的金额转换为整数分
+
+    整数和字符串按十进制精确换算并四舍五入；浮点数按 floor(x * 100 + 0.5) 换算，
+    与 to_cents_array 的规则相同。
+    """
+    if isinstance(amount, int):
+        return amount * 100
+    if isinstance(amount, (str, Decimal)):
+        return int(Decimal(amount).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    return math.floor(float(amount) * 100 + 0.5)
+
+
+def to_cents_array(amounts) -> np.ndarray:
+    """将以元为单位的金额数组转换为int64分数组，规则与 to_cents 对浮点数的处理相同"""
+    return np.floor(np.asarray(amounts, dtype=np.float64) * 100 + 0.5).astype(np.int64)
+
+
+def to_basis_points(rate: float) -> int:
+    """将比例（如 0.03）转换为整数基点"""
+    return int(Decimal(str(rate)).scaleb(4).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def percent_to_basis_points(percent) -> int:
+    """将百分比（如公积金比例 7 表示7%）转换为整数基点"""
+    return int(Decimal(str(percent)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def apply_rate(amount_cents: int, rate_bps: int) -> int:
+    """金额乘以比例，按四舍五入保留到分（金额不为负）"""
+    return (amount_cents * rate_bps + BASIS_POINTS // 2) // BASIS_POINTS
+
+
+def apply_rate_array(amount_cents: np.ndarray, rate_bps) -> np.ndarray:
+    """apply_rate 的向量化版本"""
+    return (amount_cents * rate_bps + BASIS_POINTS // 2) // BASIS_POINTS
+
+
+class FixedPointTaxTable:
+    """
+    以分和基点表示的税率表
+
+    Args:
+        tax_table: 编译后的税率表，默认使用共享税率表
+    """
+    __slots__ = ('upper_bounds', 'rates', 'quick_deductions', 'bonus_quick_deductions',
+                 'upper_bounds_array', 'rates_array', 'quick_deductions_array', 'bonus_quick_deductions_array')
+
+    def __init__(self, tax_table: TaxBracketTable = None):
+        if tax_table is None:
+            tax_table = DEFAULT_TAX_TABLE
+        self.upper_bounds = tuple(_NO_UPPER_BOUND if math.isinf(upper) else to_cents(upper)
+                                  for upper in tax_table.upper_bounds)
+        self.rates = tuple(to_basis_points(rate) for rate in tax_table.rates)
+        self.quick_deductions = tuple(to_cents(deduction) for deduction in tax_table.quick_deductions)
+        self.upper_bounds_array = np.array(self.upper_bounds, dtype=np.int64)
+        self.rates_array = np.array(self.rates, dtype=np.int64)
+        self.quick_deductions_array = np.array(self.quick_deductions, dtype=np.int64)
+        self.bonus_quick_deductions = tuple(to_cents(deduction) for deduction in tax_table.bonus_quick_deductions)
+        self.bonus_quick_deductions_array = np.array(self.bonus_quick_deductions, dtype=np.int64)
+
+    def find_bracket(self, taxable_cents: int) -> int:
+        """返回应纳税所得额（分）所在税档的下标"""
+        return min(bisect_left(self.upper_bounds, taxable_cents), len(self.upper_bounds) - 1)
+
+    def calculate_tax(self, taxable_cents: int) -> int:
+        """按年度税率表计算应纳税额（分），所得额不为正时为0"""
+        if taxable_cents <= 0:
+            return 0
+        index = self.find_bracket(taxable_cents)
+        return max(apply_rate(taxable_cents, self.rates[index]) - self.quick_deductions[index], 0)
+
+    def calculate_tax_array(self, taxable_cents: np.ndarray) -> np.ndarray:
+        """calculate_tax 的向量化版本"""
+        index = np.minimum(np.searchsorted(self.upper_bounds_array, taxable_cents, side='left'),
+                           len(self.upper_bounds_array) - 1)
+        tax = apply_rate_array(taxable_cents, self.rates_array[index]) - self.quick_deductions_array[index]
+        return np.where(taxable_cents > 0, np.maximum(tax, 0), 0)
+
+
+def _cents_bound(amount: float) -> int:
+    return _NO_UPPER_BOUND if math.isinf(amount) else to_cents(amount)
+
+
+class FixedPointRules:
+    """
+    由一套 TaxRuleSet 换算的定点规则：税率表、每月基本减除费用（分）、
+    统一社保比例（基点）和按城市的缴费基数上下限（分）及比例（基点）。
+    通过 get_fixed_point_rules 获取，每套规则只换算一次。
+
+    Args:
+        rules: 编译后的个税规则
+    """
+    __slots__ = ('rules', 'table', 'basic_deduction', 'social_security_rate_bps', 'contributions', 'city_rows',
+                 'floors', 'caps', 'rates', 'housing_floors', 'housing_caps', 'housing_min_rates',
+                 'housing_max_rates')
+
+    def __init__(self, rules: TaxRuleSet):
+        self.rules = rules
+        self.table = FixedPointTaxTable(rules.tax_table)
+        self.basic_deduction = to_cents(rules.basic_deduction)
+        self.social_security_rate_bps = to_basis_points(rules.social_security_rate)
+        self.contributions = rules.contributions
+        # 每个城市: ((各险种 (下限, 上限, 比例)...), (公积金下限, 上限, 最低比例, 最高比例))
+        self.city_rows = tuple(
+            (tuple((to_cents(floor), _cents_bound(cap), to_basis_points(rate)) for floor, cap, rate in insurance),
+             (to_cents(housing_floor), _cents_bound(housing_cap), to_basis_points(min_rate),
+              to_basis_points(max_rate)))
+            for insurance, (housing_floor, housing_cap, min_rate, max_rate) in rules.contributions.rows)
+        shape = (len(self.city_rows), len(INSURANCE_CATEGORIES))
+        for position, field in enumerate(('floors', 'caps', 'rates')):
+            setattr(self, field, np.array([[category[position] for category in insurance]
+                                           for insurance, _ in self.city_rows], dtype=np.int64).reshape(shape))
+        housing = np.array([housing for _, housing in self.city_rows], dtype=np.int64).reshape(len(self.city_rows), 4)
+        for position, field in enumerate(('housing_floors', 'housing_caps', 'housing_min_rates', 'housing_max_rates')):
+            setattr(self, field, housing[:, position])
+
+    def calculate_contributions(self, social_security_base: int, housing_fund_rate_bps: int,
+                                city: str = None) -> tuple:
+        """
+        计算每月个人缴纳的社保和公积金（分），规则与 TaxCalculator.calculate_contributions 相同，
+        各险种分别四舍五入到分后相加
+
+        Raises:
+            ValueError: 没有该城市的规则
+        """
+        if not city:
+            return (apply_rate(social_security_base, self.social_security_rate_bps),
+                    apply_rate(social_security_base, housing_fund_rate_bps))
+        position = self.contributions.index.get(city)
+        if position is None:
+            raise ValueError(f'No contribution rules for city {city}')
+        insurance, (housing_floor, housing_cap, min_rate, max_rate) = self.city_rows[position]
+        if social_security_base <= 0:
+            return 0, 0
+        social_insurance = sum(apply_rate(min(max(social_security_base, floor), cap), rate)
+                               for floor, cap, rate in insurance)
+        if housing_fund_rate_bps <= 0:
+            return social_insurance, 0
+        rate = min(max(housing_fund_rate_bps, min_rate), max_rate)
+        return social_insurance, apply_rate(min(max(social_security_base, housing_floor), housing_cap), rate)
+
+    def calculate_contributions_array(self, social_security_base: np.ndarray, housing_fund_rate_bps: np.ndarray,
+                                      city=None) -> tuple:
+        """calculate_contributions 的向量化版本，city 为 None 或空字符串的行按统一的社保比例计算"""
+        social_insurance = apply_rate_array(social_security_base, self.social_security_rate_bps)
+        housing_fund = apply_rate_array(social_security_base, housing_fund_rate_bps)
+        if city is None:
+            return social_insurance, housing_fund
+        city = np.broadcast_to(city_array(city), social_security_base.shape)
+        has_city = city != ''
+        if not has_city.any():
+            return social_insurance, housing_fund
+
+        position = self.contributions.lookup(city[has_city])
+        base = social_security_base[has_city]
+        rate_bps = housing_fund_rate_bps[has_city]
+        enrolled = base > 0
+        amount = 0
+        for column in range(len(INSURANCE_CATEGORIES)):
+            clamped = np.minimum(np.maximum(base, self.floors[position, column]), self.caps[position, column])
+            amount = amount + np.where(enrolled, apply_rate_array(clamped, self.rates[position, column]), 0)
+        rate = np.minimum(np.maximum(rate_bps, self.housing_min_rates[position]), self.housing_max_rates[position])
+        clamped = np.minimum(np.maximum(base, self.housing_floors[position]), self.housing_caps[position])
+
+        social_insurance = social_insurance.copy()
+        housing_fund = housing_fund.copy()
+        social_insurance[has_city] = amount
+        housing_fund[has_city] = np.where(enrolled & (rate_bps > 0), apply_rate_array(clamped, rate), 0)
+        return social_insurance, housing_fund
+
+
+@lru_cache(maxsize=32)
+def _fixed_point_rules_for(rules: TaxRuleSet) -> FixedPointRules:
+    return FixedPointRules(rules)
+
+
+def get_fixed_point_rules(tax_year: int = None) -> FixedPointRules:
+    """返回指定年度规则换算后的定点规则，规则文件重新加载后自动换用新规则"""
+    return _fixed_point_rules_for(get_rules(tax_year))
+
+
+def calculate_tax_cents(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                        labor_income=0, manuscript_income=0, license_income=0,
+                        social_security_base=0, housing_fund_rate_bps=0,
+                        special_deductions=0, table: FixedPointTaxTable = None,
+                        tax_year=None, city=None) -> dict:
+    """
+    以整数分计算个人所得税，规则与 calculate_tax 相同
+
+    Args:
+        salary: 工资收入（分）
+        salary_type: 工资类型（'monthly' 或 'annual'）
+        bonus: 年终奖（分）
+        bonus_type: 奖金计税方式（'separate' 或 'combined'）
+        labor_income: 劳务报酬（分）
+        manuscript_income: 稿酬收入（分）
+        license_income: 特许权使用费（分）
+        social_security_base: 社保缴纳基数（分）
+        housing_fund_rate_bps: 公积金缴纳比例（基点，7% 为 700）
+        special_deductions: 月度专项附加扣除总额（分）
+        table: 定点税率表，默认使用 tax_year 年度规则的税率表
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+        city: 城市，给出时按该城市的缴费基数上下限和比例计算社保公积金
+
+    Returns:
+        字段与 calculate_tax 相同、金额均为整数分的字典
+
+    Raises:
+        ValueError: 没有该城市的规则
+    """
+    rules = get_fixed_point_rules(tax_year)
+    if table is None:
+        table = rules.table
+
+    annual_salary = salary * 12 if salary_type == 'monthly' else salary
+
+    # 社保和公积金按月四舍五入到分后再乘以12
+    monthly_social_security, monthly_housing_fund = rules.calculate_contributions(
+        social_security_base, housing_fund_rate_bps, city)
+    annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+    annual_special_deductions = special_deductions * 12
+    basic_deductions = rules.basic_deduction * 12
+    total_deductions = annual_deductions + annual_special_deductions + basic_deductions
+
+    salary_taxable_income = annual_salary - total_deductions
+    salary_tax = table.calculate_tax(salary_taxable_income)
+
+    if bonus_type == 'separate':
+        # 月度换算额与 上限/12 比较，等价于奖金与上限直接比较
+        if bonus > 0:
+            index = table.find_bracket(bonus)
+            bonus_tax = apply_rate(bonus, table.rates[index]) - table.bonus_quick_deductions[index]
+        else:
+            bonus_tax = 0
+    else:
+        bonus_tax = table.calculate_tax(salary_taxable_income + bonus) - salary_tax
+
+    labor_tax = apply_rate(labor_income, LABOR_RATE_BPS) if labor_income > 0 else 0
+    manuscript_tax = apply_rate(manuscript_income, MANUSCRIPT_RATE_BPS) if manuscript_income > 0 else 0
+    license_tax = apply_rate(license_income, LICENSE_RATE_BPS) if license_income > 0 else 0
+
+    total_tax = salary_tax + bonus_tax + labor_tax + manuscript_tax + license_tax
+    total_income = annual_salary + bonus + labor_income + manuscript_income + license_income
+
+    return {
+        'salary_taxable_income': salary_taxable_income,
+        'salary_tax': salary_tax,
+        'bonus_taxable_income': bonus,
+        'bonus_tax': bonus_tax,
+        'labor_income': labor_income,
+        'labor_tax': labor_tax,
+        'manuscript_income': manuscript_income,
+        'manuscript_tax': manuscript_tax,
+        'license_income': license_income,
+        'license_tax': license_tax,
+        'total_taxable_income': total_income - annual_deductions - basic_deductions,
+        'total_tax': total_tax,
+        'total_deductions': total_deductions,
+        'net_income': total_income - total_tax - annual_deductions
+    }
+
+
+def calculate_tax_cents_batch(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                              labor_income=0, manuscript_income=0, license_income=0,
+                              social_security_base=0, housing_fund_rate_bps=0,
+                              special_deductions=0, table: FixedPointTaxTable = None,
+                              tax_year=None, city=None) -> dict:
+    """
+    calculate_tax_cents 的向量化版本，金额参数为int64分数组（或标量，自动广播）；
+    city 可以是城市数组，为 None 或空字符串的行按统一的社保比例计算，tax_year 对整批数据生效
+
+    Returns:
+        {字段名: int64数组} 形式的列式结果，与逐条调用 calculate_tax_cents 逐位一致
+    """
+    rules = get_fixed_point_rules(tax_year)
+    if table is None:
+        table = rules.table
+
+    (salary, bonus, labor_income, manuscript_income, license_income,
+     social_security_base, housing_fund_rate_bps, special_deductions) = np.broadcast_arrays(
+        *(np.asarray(column, dtype=np.int64) for column in (
+            salary, bonus, labor_income, manuscript_income, license_income,
+            social_security_base, housing_fund_rate_bps, special_deductions))
+    )
+
+    annual_salary = np.where(np.asarray(salary_type) == 'monthly', salary * 12, salary)
+
+    monthly_social_security, monthly_housing_fund = rules.calculate_contributions_array(
+        social_security_base, housing_fund_rate_bps, city)
+    annual_deductions = (monthly_social_security + monthly_housing_fund) * 12
+    basic_deductions = rules.basic_deduction * 12
+    total_deductions = annual_deductions + special_deductions * 12 + basic_deductions
+
+    salary_taxable_income = annual_salary - total_deductions
+    salary_tax = table.calculate_tax_array(salary_taxable_income)
+
+    index = np.minimum(np.searchsorted(table.upper_bounds_array, bonus, side='left'),
+                       len(table.upper_bounds_array) - 1)
+    separate_bonus_tax = np.where(
+        bonus > 0, apply_rate_array(bonus, table.rates_array[index]) - table.bonus_quick_deductions_array[index], 0)
+    combined_bonus_tax = table.calculate_tax_array(salary_taxable_income + bonus) - salary_tax
+    bonus_tax = np.where(np.asarray(bonus_type) == 'separate', separate_bonus_tax, combined_bonus_tax)
+
+    labor_tax = np.where(labor_income > 0, apply_rate_array(labor_income, LABOR_RATE_BPS), 0)
+    manuscript_tax = np.where(manuscript_income > 0, apply_rate_array(manuscript_income, MANUSCRIPT_RATE_BPS), 0)
+    license_tax = np.where(license_income > 0, apply_rate_array(license_income, LICENSE_RATE_BPS), 0)
+
+    total_tax = salary_tax + bonus_tax + labor_tax + manuscript_tax + license_tax
+    total_income = annual_salary + bonus + labor_income + manuscript_income + license_income
+
+    return {
+        'salary_taxable_income': salary_taxable_income,
+        'salary_tax': salary_tax,
+        'bonus_taxable_income': bonus,
+        'bonus_tax': bonus_tax,
+        'labor_income': labor_income,
+        'labor_tax': labor_tax,
+        'manuscript_income': manuscript_income,
+        'manuscript_tax': manuscript_tax,
+        'license_income': license_income,
+        'license_tax': license_tax,
+        'total_taxable_income': total_income - annual_deductions - basic_deductions,
+        'total_tax': total_tax,
+        'total_deductions': total_deductions,
+        'net_income': total_income - total_tax - annual_deductions,
+    }
+
+
+def calculate_tax_fixed(salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                        labor_income=0, manuscript_income=0, license_income=0,
+                        social_security_base=0, housing_fund_rate=0,
+                        special_deductions=None, tax_year=None, city=None) -> dict:
+    """
+    参数与 calculate_tax 相同（金额以元为单位），内部按整数分计算
+
+    Returns:
+        字段与 calculate_tax 相同的字典，金额为精确到分的 Decimal
+    """
+    cents = calculate_tax_cents(
+        salary=to_cents(salary),
+        salary_type=salary_type,
+        bonus=to_cents(bonus),
+        bonus_type=bonus_type,
+        labor_income=to_cents(labor_income),
+        manuscript_income=to_cents(manuscript_income),
+        license_income=to_cents(license_income),
+        social_security_base=to_cents(social_security_base),
+        housing_fund_rate_bps=percent_to_basis_points(housing_fund_rate),
+        special_deductions=sum(to_cents(amount) for amount in (special_deductions or {}).values()),
+        tax_year=tax_year,
+        city=city
+    )
+    return {field: Decimal(cents[field]).scaleb(-2) for field in RESULT_FIELDS}
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+家庭专项附加扣除分摊优化
+子女教育、婴幼儿照护和住房贷款利息可以在夫妻之间按规定比例分摊，赡养老人可以在兄弟姐妹之间
+分摊（每人每月不超过1500元）。按家庭成员的收入搜索合法的分摊方案，使全家工资薪金税额合计最低。
+
+工资薪金税额是扣除额的凸分段线性函数，只有在扣除额可能使某人的应纳税所得额跨过税档分界点时
+才需要分支：剩余的扣除无论怎样分摊都不跨档时，每一项直接分给边际税率最高的人。
+同一阶段的相同分摊状态只搜索一次。
+"""
+
+import numpy as np
+
+from tax_batch import calculate_tax_batch
+from tax_calculator import calculate_tax, get_calculator
+
+# 可分摊的专项附加扣除：amount 为每月扣除标准；ratios 为两人之间允许的分摊比例，第一个为默认方案；
+# 赡养老人按 step 元为单位在成员之间分摊，每人不超过 cap，默认均摊
+SHARED_DEDUCTION_RULES = {
+    'children_education': {'amount': 2000, 'ratios': ((0.5, 0.5), (1, 0), (0, 1))},
+    'infant_care': {'amount': 2000, 'ratios': ((0.5, 0.5), (1, 0), (0, 1))},
+    'housing_loan': {'amount': 1000, 'ratios': ((1, 0), (0, 1))},
+    'elderly_care': {'amount': 3000, 'cap': 1500, 'step': 100},
+}
+
+
+class _Item:
+    """一项待分摊的扣除：members 为可以分摊的成员下标，options 为离散方案（每人每月金额）"""
+    __slots__ = ('type', 'members', 'options', 'amount', 'cap', 'step', 'default')
+
+    def __init__(self, dependent: dict, earners: int):
+        item_type = dependent.get('type')
+        rules = SHARED_DEDUCTION_RULES.get(item_type)
+        if rules is None:
+            raise ValueError(f'Unknown shared deduction type: {item_type}')
+        members = tuple(int(member) for member in dependent.get('members', (0,)))
+        if not members or len(set(members)) != len(members) or not all(0 <= m < earners for m in members):
+            raise ValueError(f'Invalid members for {item_type}: {list(members)}')
+        self.type = item_type
+        self.members = members
+        self.amount = float(dependent.get('amount', rules['amount']))
+        if not 0 <= self.amount <= rules['amount']:
+            raise ValueError(f'{item_type} amount must be between 0 and {rules["amount"]}')
+
+        if 'ratios' in rules:
+            if len(members) > 2:
+                raise ValueError(f'{item_type} can only be shared between two spouses')
+            # 只有一人享受时全额扣除
+            ratios = rules['ratios'] if len(members) == 2 else ((1,),)
+            self.options = tuple(self._vector(earners, [ratio * self.amount for ratio in shares])
+                                 for shares in ratios)
+            self.cap = self.step = None
+            self.default = self.options[0]
+        else:
+            # 独生子女由本人全额扣除，不受每人上限限制
+            self.cap = self.amount if dependent.get('only_child') or len(members) == 1 else float(rules['cap'])
+            self.step = float(rules['step'])
+            if self.amount > self.cap * len(members):
+                raise ValueError(f'{item_type} amount exceeds the per-person cap for {len(members)} members')
+            self.options = None
+            share = min(self.amount / len(members), self.cap)
+            self.default = self._vector(earners, [share] * len(members))
+
+    def _vector(self, earners: int, shares) -> tuple:
+        vector = [0.0] * earners
+        for member, share in zip(self.members, shares):
+            vector[member] = float(share)
+        return tuple(vector)
+
+    def max_shares(self, earners: int) -> tuple:
+        """每名成员最多能分到的金额"""
+        if self.options is not None:
+            return tuple(max(option[member] for option in self.options) for member in range(earners))
+        return self._vector(earners, [min(self.cap, self.amount)] * len(self.members))
+
+
+class HouseholdOptimizer:
+    """
+    单个家庭的分摊搜索
+
+    Args:
+        incomes: 各成员参与累计计税的全年收入（工资，年终奖并入计税时含年终奖）
+        deductions: 各成员不含待分摊项目的全年扣除总额（含基本减除费用）
+        dependents: [{'type': 扣除类型, 'members': [成员下标, ...], 'amount': 每月金额（可选），
+                      'only_child': 是否独生子女（赡养老人，可选）}, ...]
+        tax_year: 纳税年度
+    """
+
+    def __init__(self, incomes, deductions, dependents, tax_year: int = None):
+        self.calculator = get_calculator(tax_year)
+        self.incomes = tuple(float(income) for income in incomes)
+        self.deductions = tuple(float(deduction) for deduction in deductions)
+        earners = len(self.incomes)
+        items = [_Item(dependent, earners) for dependent in dependents]
+        # 连续分摊的项目（赡养老人）放在最后，在前面的方案确定后直接求最优分摊
+        self.order = sorted(range(len(items)), key=lambda index: items[index].options is None)
+        self.items = [items[index] for index in self.order]
+        # remaining[k][i]：第 k 项及之后成员 i 最多还能分到的每月金额
+        remaining = [(0.0,) * earners]
+        for item in reversed(self.items):
+            remaining.append(tuple(a + b for a, b in zip(remaining[-1], item.max_shares(earners))))
+        self.remaining = remaining[::-1]
+        table = self.calculator.tax_table
+        self.kinks = (0.0,) + tuple(upper for upper in table.upper_bounds if upper != float('inf'))
+        self._memo = {}
+
+    def _taxable(self, member: int, allocated: float) -> float:
+        return self.incomes[member] - (self.deductions[member] + allocated * 12)
+
+    def _tax(self, allocation) -> float:
+        return sum(self.calculator.calculate_accumulated_tax(income, deduction + allocated * 12)
+                   for income, deduction, allocated in zip(self.incomes, self.deductions, allocation))
+
+    def _marginal_rate(self, taxable_income: float) -> float:
+        if taxable_income <= 0:
+            return 0.0
+        table = self.calculator.tax_table
+        return table.rates[table.find_bracket(taxable_income)]
+
+    def _linear_rates(self, k: int, allocation) -> tuple:
+        """剩余扣除无论怎样分摊都不会使任何人跨档时返回各人的边际税率，否则返回 None"""
+        rates = []
+        for member, allocated in enumerate(allocation):
+            high = self._taxable(member, allocated)
+            low = high - self.remaining[k][member] * 12
+            if any(low < kink < high for kink in self.kinks):
+                return None
+            rates.append(self._marginal_rate(high))
+        return tuple(rates)
+
+    def _fill(self, item: _Item, allocation) -> tuple:
+        """
+        在当前状态下求连续分摊项目的最优方案：每次把 step 元分给减税最多的成员
+
+        税额是扣除额的凸函数，追加扣除的减税额单调不增，逐份贪心分配即为最优。
+        """
+        shares = dict.fromkeys(item.members, 0.0)
+        left = item.amount
+        while left > 1e-9:
+            unit = min(item.step, left)
+            best = None
+            for member in item.members:
+                if shares[member] + unit > item.cap + 1e-9:
+                    continue
+                allocated = allocation[member] + shares[member]
+                saving = (self.calculator.calculate_accumulated_tax(
+                    self.incomes[member], self.deductions[member] + allocated * 12)
+                          - self.calculator.calculate_accumulated_tax(
+                    self.incomes[member], self.deductions[member] + (allocated + unit) * 12))
+                if best is None or saving > best[0]:
+                    best = (saving, member)
+            shares[best[1]] += unit
+            left -= unit
+        return item._vector(len(allocation), [shares[member] for member in item.members])
+
+    def _options(self, k: int, allocation) -> tuple:
+        item = self.items[k]
+        if item.options is None:
+            return (self._fill(item, allocation),)
+        return item.options
+
+    def _search(self, k: int, allocation) -> tuple:
+        """返回 (第 k 项起的最优方案下的全家税额, 第 k 项起各项的方案)"""
+        if k == len(self.items):
+            return self._tax(allocation), ()
+        key = (k, allocation)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+
+        rates = self._linear_rates(k, allocation)
+        if rates is not None:
+            # 剩余部分税额是分摊金额的线性函数，逐项分给边际税率最高的人
+            choices = []
+            for item_index in range(k, len(self.items)):
+                option = max(self._options(item_index, allocation),
+                             key=lambda option: sum(rate * share for rate, share in zip(rates, option)))
+                choices.append(option)
+                allocation = tuple(a + b for a, b in zip(allocation, option))
+            result = (self._tax(allocation), tuple(choices))
+        else:
+            result = None
+            for option in self._options(k, allocation):
+                tax, choices = self._search(k + 1, tuple(a + b for a, b in zip(allocation, option)))
+                # 税额相同时保留靠前（默认）的方案
+                if result is None or tax < result[0] - 1e-9:
+                    result = (tax, (option,) + choices)
+        self._memo[key] = result
+        return result
+
+    def solve(self) -> list:
+        """返回按输入顺序排列的各项扣除的最优方案（每名成员每月金额）"""
+        _, choices = self._search(0, (0.0,) * len(self.incomes))
+        ordered = [None] * len(choices)
+        for position, index in enumerate(self.order):
+            ordered[index] = choices[position]
+        return ordered
+
+    def defaults(self) -> list:
+        """按输入顺序排列的各项扣除的默认方案"""
+        ordered = [None] * len(self.items)
+        for position, index in enumerate(self.order):
+            ordered[index] = self.items[position].default
+        return ordered
+
+
+def _annual_income(earner: dict) -> float:
+    salary = earner.get('salary', 0)
+    annual_salary = salary * 12 if earner.get('salary_type', 'monthly') == 'monthly' else salary
+    if earner.get('bonus_type', 'separate') != 'separate':
+        annual_salary += earner.get('bonus', 0)
+    return annual_salary
+
+
+def _merge_deductions(earners: list, dependents: list, allocations: list) -> list:
+    """把各项方案合并到每名成员自己的专项附加扣除字典中"""
+    merged = [dict(earner.get('special_deductions') or {}) for earner in earners]
+    for dependent, option in zip(dependents, allocations):
+        for member, share in enumerate(option):
+            if share:
+                merged[member][dependent['type']] = merged[member].get(dependent['type'], 0) + share
+    return merged
+
+
+def _household_result(earners, dependents, allocations, deductions, taxes, baseline_taxes) -> dict:
+    total_tax = sum(taxes)
+    baseline_tax = sum(baseline_taxes)
+    return {
+        'allocations': [{'type': dependent['type'], 'members': list(dependent.get('members', (0,))),
+                         'shares': [option[member] for member in dependent.get('members', (0,))]}
+                        for dependent, option in zip(dependents, allocations)],
+        'special_deductions': deductions,
+        'taxes': taxes,
+        'total_tax': total_tax,
+        'baseline_taxes': baseline_taxes,
+        'baseline_tax': baseline_tax,
+        'tax_saved': baseline_tax - total_tax,
+    }
+
+
+def optimize_household(earners: list, dependents: list, tax_year: int = None) -> dict:
+    """
+    求一个家庭专项附加扣除的最优分摊方案
+
+    Args:
+        earners: 各成员的收入资料，字段与 calculate_tax 的参数相同，
+            special_deductions 只填本人独享的扣除（如继续教育、住房租金）
+        dependents: 待分摊的扣除项目，格式见 HouseholdOptimizer
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        字典：
+            - allocations: 各项扣除的分摊方案 [{'type', 'members', 'shares': 每人每月金额}, ...]
+            - special_deductions: 各成员合并后的专项附加扣除字典，可直接传给 calculate_tax
+            - taxes / total_tax: 按最优方案计算的各成员税额和全家合计
+            - baseline_taxes / baseline_tax: 按默认方案（平均分摊、住房贷款由第一人扣除）计算的税额
+            - tax_saved: 相比默认方案少缴的税额
+    """
+    own = [calculate_tax(**{**earner, 'tax_year': tax_year}) for earner in earners]
+    optimizer = HouseholdOptimizer([_annual_income(earner) for earner in earners],
+                                   [result['total_deductions'] for result in own], dependents, tax_year)
+    allocations = optimizer.solve()
+
+    def taxes_for(plan):
+        deductions = _merge_deductions(earners, dependents, plan)
+        return deductions, [calculate_tax(**{**earner, 'special_deductions': special, 'tax_year': tax_year})
+                            ['total_tax'] for earner, special in zip(earners, deductions)]
+
+    deductions, taxes = taxes_for(allocations)
+    _, baseline_taxes = taxes_for(optimizer.defaults())
+    return _household_result(earners, dependents, allocations, deductions, taxes, baseline_taxes)
+
+
+def _earner_columns(earners: list, special_deductions: list) -> dict:
+    columns = {column: np.array([earner.get(column, 0) for earner in earners], dtype=np.float64)
+               for column in ('salary', 'bonus', 'labor_income', 'manuscript_income', 'license_income',
+                              'social_security_base', 'housing_fund_rate')}
+    columns['salary_type'] = np.array([earner.get('salary_type', 'monthly') for earner in earners])
+    columns['bonus_type'] = np.array([earner.get('bonus_type', 'separate') for earner in earners])
+    columns['special_deductions'] = np.array([float(sum(special.values())) for special in special_deductions],
+                                             dtype=np.float64)
+    columns['city'] = np.array([earner.get('city') or '' for earner in earners])
+    return columns
+
+
+def optimize_households_batch(households: list, tax_year: int = None) -> list:
+    """
+    批量求多个家庭的最优分摊方案
+
+    全部成员的社保公积金、扣除总额和最终税额各用一次向量化计算得出，每个家庭只做分摊搜索。
+
+    Args:
+        households: [{'earners': [...], 'dependents': [...]}, ...]，格式同 optimize_household
+        tax_year: 纳税年度，对整批家庭生效
+
+    Returns:
+        与 households 顺序相同的结果列表，每项格式同 optimize_household（税额为 float）
+    """
+    earners = [earner for household in households for earner in household['earners']]
+    if not earners:
+        return [_household_result([], household.get('dependents', []), [], [], [], []) for household in households]
+    own = calculate_tax_batch(**_earner_columns(earners, [earner.get('special_deductions') or {}
+                                                          for earner in earners]), tax_year=tax_year)
+
+    plans = []
+    start = 0
+    for household in households:
+        members = household['earners']
+        end = start + len(members)
+        optimizer = HouseholdOptimizer([_annual_income(earner) for earner in members],
+                                       own['total_deductions'][start:end].tolist(),
+                                       household.get('dependents', []), tax_year)
+        plans.append((optimizer.solve(), optimizer.defaults()))
+        start = end
+
+    merged = {}
+    for name, plan_index in (('optimized', 0), ('baseline', 1)):
+        deductions = [special for household, plans_for in zip(households, plans)
+                      for special in _merge_deductions(household['earners'], household.get('dependents', []),
+                                                       plans_for[plan_index])]
+        merged[name] = (deductions, calculate_tax_batch(**_earner_columns(earners, deductions),
+                                                        tax_year=tax_year)['total_tax'].tolist())
+
+    results = []
+    start = 0
+    for household, (allocations, _) in zip(households, plans):
+        end = start + len(household['earners'])
+        results.append(_household_result(
+            household['earners'], household.get('dependents', []), allocations,
+            merged['optimized'][0][start:end], merged['optimized'][1][start:end],
+            merged['baseline'][1][start:end]))
+        start = end
+    return results
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+累计预扣预缴台账
+按员工保存累计收入、累计扣除和累计已预缴税额，每月只需处理当月的发薪事件。
+所有事件按顺序记入列式事件日志，更正某月数据时只重放该员工的事件。
+状态和事件日志可以保存为本地快照文件，下个月从快照恢复后继续处理。
+"""
+
+import os
+
+import numpy as np
+
+from tax_batch import get_batch_calculator
+from tax_calculator import get_calculator
+
+# 事件类型
+EVENT_PAY = 0          # 发薪
+EVENT_RESET = 1        # 入职或转入新单位，从该月起重新累计
+EVENT_CORRECTION = 2   # 更正已发薪月份的数据
+
+# 快照文件格式版本
+SNAPSHOT_VERSION = 1
+
+
+class WithholdingLedger:
+    """
+    累计预扣预缴台账
+
+    员工状态和事件日志都保存在按需扩容的列数组中，每名员工的状态约30字节。
+    发薪事件的处理与 TaxCalculator.calculate_withholding_schedule 逐月结果一致：
+    当月预扣税额 = 累计应纳税额 - 累计已预缴税额，不足时当月不退税。
+
+    Args:
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+        capacity: 初始容量（员工数）
+    """
+
+    def __init__(self, tax_year: int = None, capacity: int = 1024):
+        calculator = get_calculator(tax_year)
+        self.tax_year = calculator.rules.tax_year
+        self.ids = []
+        self.index = {}
+        capacity = max(capacity, 1)
+        # 员工状态列
+        self.income = np.zeros(capacity)
+        self.deduction = np.zeros(capacity)
+        self.tax_paid = np.zeros(capacity)
+        self.months = np.zeros(capacity, dtype=np.int8)
+        self.last_month = np.zeros(capacity, dtype=np.int8)
+        # 每名员工最后一条事件在日志中的位置，没有事件时为-1
+        self.last_event = np.full(capacity, -1, dtype=np.int64)
+        # 事件日志列
+        self.event_count = 0
+        self.event_employee = np.zeros(capacity, dtype=np.int64)
+        self.event_kind = np.zeros(capacity, dtype=np.int8)
+        self.event_month = np.zeros(capacity, dtype=np.int8)
+        self.event_income = np.zeros(capacity)
+        self.event_insurance = np.zeros(capacity)
+        self.event_special = np.zeros(capacity)
+        self.event_tax = np.zeros(capacity)
+        # 同一员工上一条事件的位置，串成按员工的链表，查找一名员工的事件不必扫描整个日志
+        self.event_previous = np.full(capacity, -1, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def calculator(self):
+        return get_calculator(self.tax_year)
+
+    def _grow_employees(self, size: int):
+        capacity = len(self.income)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name in ('income', 'deduction', 'tax_paid', 'months', 'last_month', 'last_event'):
+            column = getattr(self, name)
+            grown = np.full(capacity, -1 if name == 'last_event' else 0, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _grow_events(self, size: int):
+        capacity = len(self.event_kind)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name in ('event_employee', 'event_kind', 'event_month', 'event_income',
+                     'event_insurance', 'event_special', 'event_tax', 'event_previous'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.event_count] = column[:self.event_count]
+            setattr(self, name, grown)
+
+    def _employee(self, employee_id) -> int:
+        position = self.index.get(employee_id)
+        if position is None:
+            position = len(self.ids)
+            self._grow_employees(position + 1)
+            self.ids.append(employee_id)
+            self.index[employee_id] = position
+        return position
+
+    def _employees(self, employee_ids) -> np.ndarray:
+        get = self.index.get
+        positions = np.fromiter((get(employee_id, -1) for employee_id in employee_ids),
+                                dtype=np.int64, count=len(employee_ids))
+        # 新员工按出现顺序登记
+        for offset in np.flatnonzero(positions < 0).tolist():
+            positions[offset] = self._employee(employee_ids[offset])
+        return positions
+
+    def _record(self, positions, kind, month, income=0.0, insurance=0.0, special=0.0, tax=0.0):
+        positions = np.atleast_1d(positions)
+        start = self.event_count
+        end = start + len(positions)
+        self._grow_events(end)
+        self.event_employee[start:end] = positions
+        self.event_kind[start:end] = kind
+        self.event_month[start:end] = month
+        self.event_income[start:end] = income
+        self.event_insurance[start:end] = insurance
+        self.event_special[start:end] = special
+        self.event_tax[start:end] = tax
+        # 同一批中每名员工只出现一次，可以直接整列接到各自链表的末尾
+        self.event_previous[start:end] = self.last_event[positions]
+        self.last_event[positions] = np.arange(start, end)
+        self.event_count = end
+
+    @staticmethod
+    def _check_month(month):
+        if np.any((np.asarray(month) < 1) | (np.asarray(month) > 12)):
+            raise ValueError('month must be between 1 and 12')
+
+    def state(self, employee_id) -> dict:
+        """返回员工的当前累计状态"""
+        position = self.index.get(employee_id)
+        if position is None:
+            raise KeyError(employee_id)
+        return {
+            'accumulated_income': float(self.income[position]),
+            'accumulated_deduction': float(self.deduction[position]),
+            'accumulated_tax': float(self.tax_paid[position]),
+            'months': int(self.months[position]),
+            'last_month': int(self.last_month[position]),
+        }
+
+    def pay(self, employee_id, month: int, income: float, social_insurance: float = 0,
+            special_deductions: float = 0) -> float:
+        """
+        处理一条发薪事件，只更新该员工的累计状态
+
+        Args:
+            employee_id: 员工标识
+            month: 发薪月份（1-12），必须晚于该员工上一次发薪的月份
+            income: 当月收入
+            social_insurance: 当月三险一金
+            special_deductions: 当月专项附加扣除
+
+        Returns:
+            当月预扣税额
+
+        Raises:
+            ValueError: 月份无效或不晚于上一次发薪的月份（更正请使用 correct）
+        """
+        self._check_month(month)
+        position = self._employee(employee_id)
+        if month <= self.last_month[position]:
+            raise ValueError(f'{employee_id} already has pay for month {self.last_month[position]}, '
+                             'use correct() to amend earlier months')
+        calculator = self.calculator
+        accumulated_income = float(self.income[position]) + income
+        accumulated_deduction = (float(self.deduction[position])
+                                 + (calculator.basic_deduction + social_insurance + special_deductions))
+        accumulated_tax = calculator.calculate_accumulated_tax(accumulated_income, accumulated_deduction)
+        paid_tax = float(self.tax_paid[position])
+        monthly_tax = max(accumulated_tax - paid_tax, 0)
+
+        self.income[position] = accumulated_income
+        self.deduction[position] = accumulated_deduction
+        self.tax_paid[position] = max(paid_tax, accumulated_tax)
+        self.months[position] += 1
+        self.last_month[position] = month
+        self._record(position, EVENT_PAY, month, income, social_insurance, special_deductions, monthly_tax)
+        return monthly_tax
+
+    def pay_batch(self, employee_ids, month, income, social_insurance=0, special_deductions=0) -> np.ndarray:
+        """
+        向量化处理一批发薪事件（通常是全公司当月的工资），每名员工在一批中最多出现一次
+
+        Args:
+            employee_ids: 员工标识列表
+            month: 发薪月份，标量或数组
+            income: 当月收入数组
+            social_insurance: 当月三险一金数组或标量
+            special_deductions: 当月专项附加扣除数组或标量
+
+        Returns:
+            当月预扣税额数组
+        """
+        positions = self._employees(employee_ids)
+        if len(positions) and np.bincount(positions).max() > 1:
+            raise ValueError('each employee can appear at most once in a pay batch')
+        month, income, social_insurance, special_deductions = np.broadcast_arrays(
+            np.asarray(month, dtype=np.int8), np.asarray(income, dtype=np.float64),
+            np.asarray(social_insurance, dtype=np.float64), np.asarray(special_deductions, dtype=np.float64))
+        month = np.broadcast_to(month, positions.shape)
+        self._check_month(month)
+        stale = month <= self.last_month[positions]
+        if stale.any():
+            employee_id = employee_ids[int(np.flatnonzero(stale)[0])]
+            raise ValueError(f'{employee_id} already has pay for this month, use correct() to amend earlier months')
+
+        batch_calculator = get_batch_calculator(self.tax_year)
+        accumulated_income = self.income[positions] + income
+        accumulated_deduction = (self.deduction[positions]
+                                 + ((batch_calculator.basic_deduction + social_insurance) + special_deductions))
+        accumulated_tax = batch_calculator.calculate_accumulated_tax(accumulated_income, accumulated_deduction)
+        paid_tax = self.tax_paid[positions]
+        monthly_tax = np.maximum(accumulated_tax - paid_tax, 0)
+
+        self.income[positions] = accumulated_income
+        self.deduction[positions] = accumulated_deduction
+        self.tax_paid[positions] = np.maximum(paid_tax, accumulated_tax)
+        self.months[positions] += 1
+        self.last_month[positions] = month
+        self._record(positions, EVENT_PAY, month, income, social_insurance, special_deductions, monthly_tax)
+        return monthly_tax
+
+    def reset(self, employee_id, month: int):
+        """
+        员工在 month 月入职或转入新的扣缴单位，累计数据从该月起重新计算
+
+        之后的发薪月份必须不早于 month。
+        """
+        self._check_month(month)
+        position = self._employee(employee_id)
+        self.income[position] = 0
+        self.deduction[position] = 0
+        self.tax_paid[position] = 0
+        self.months[position] = 0
+        self.last_month[position] = month - 1
+        self._record(position, EVENT_RESET, month)
+
+    def _events_for(self, position: int) -> np.ndarray:
+        """该员工全部事件在日志中的位置，按发生顺序排列，只访问该员工自己的事件"""
+        events = []
+        event = int(self.last_event[position])
+        previous = self.event_previous
+        while event >= 0:
+            events.append(event)
+            event = int(previous[event])
+        return np.array(events[::-1], dtype=np.int64)
+
+    def _rebuild_event_index(self):
+        """根据事件日志重建按员工的事件链表"""
+        count = self.event_count
+        employees = self.event_employee[:count]
+        # 稳定排序后同一员工的事件相邻且保持发生顺序
+        order = np.argsort(employees, kind='stable')
+        same = employees[order[1:]] == employees[order[:-1]]
+        self.event_previous[:count] = -1
+        self.event_previous[order[1:][same]] = order[:-1][same]
+        self.last_event[:] = -1
+        last = order[np.append(~same, True)] if count else order
+        self.last_event[employees[last]] = last
+
+    def replay(self, employee_id) -> dict:
+        """
+        根据事件日志重新计算员工的累计状态
+
+        更正事件替换对应月份的收入和扣除；累计已预缴税额是实际预扣的税额之和，
+        已经预扣的月份不会改变，差额在之后的月份补扣，或在年度汇算时退还。
+        """
+        position = self.index.get(employee_id)
+        if position is None:
+            raise KeyError(employee_id)
+        months = {}
+        paid_tax = 0.0
+        last_month = 0
+        for event in self._events_for(position).tolist():
+            kind = self.event_kind[event]
+            month = int(self.event_month[event])
+            if kind == EVENT_RESET:
+                months = {}
+                paid_tax = 0.0
+                last_month = month - 1
+                continue
+            amounts = (float(self.event_income[event]), float(self.event_insurance[event]),
+                       float(self.event_special[event]))
+            if kind == EVENT_PAY:
+                paid_tax += float(self.event_tax[event])
+                last_month = month
+            months[month] = amounts
+
+        # 按月份顺序重新累计，与逐月处理的加法顺序一致
+        basic_deduction = self.calculator.basic_deduction
+        accumulated_income = 0.0
+        accumulated_deduction = 0.0
+        for month in sorted(months):
+            income, insurance, special = months[month]
+            accumulated_income += income
+            accumulated_deduction += basic_deduction + insurance + special
+
+        self.income[position] = accumulated_income
+        self.deduction[position] = accumulated_deduction
+        self.tax_paid[position] = paid_tax
+        self.months[position] = len(months)
+        self.last_month[position] = last_month
+        return self.state(employee_id)
+
+    def correct(self, employee_id, month: int, income: float, social_insurance: float = 0,
+                special_deductions: float = 0) -> dict:
+        """
+        更正已发薪月份的数据并重放该员工的事件
+
+        只能更正最近一次 reset 之后发薪的月份，之前的月份属于已经结束的累计期间。
+
+        Returns:
+            更正后的累计状态，另含 adjustment：按更正后数据计算的累计应纳税额与
+            累计已预缴税额之差，正数将在下次发薪时补扣，负数为多扣的税额
+
+        Raises:
+            KeyError: 员工不存在
+            ValueError: 月份无效，或当前累计期间内该月没有发薪
+        """
+        self._check_month(month)
+        position = self.index.get(employee_id)
+        if position is None:
+            raise KeyError(employee_id)
+        events = self._events_for(position)
+        kinds = self.event_kind[events]
+        resets = np.flatnonzero(kinds == EVENT_RESET)
+        if len(resets):
+            events = events[resets[-1] + 1:]
+            kinds = kinds[resets[-1] + 1:]
+        paid_months = self.event_month[events][kinds == EVENT_PAY]
+        if month not in paid_months.tolist():
+            raise ValueError(f'{employee_id} has no pay for month {month} since the last reset')
+        self._record(position, EVENT_CORRECTION, month, income, social_insurance, special_deductions)
+        state = self.replay(employee_id)
+        accumulated_tax = self.calculator.calculate_accumulated_tax(state['accumulated_income'],
+                                                                    state['accumulated_deduction'])
+        state['adjustment'] = accumulated_tax - state['accumulated_tax']
+        return state
+
+    def save(self, path: str):
+        """把状态和事件日志写入快照文件，先写临时文件再替换，中途失败不会损坏原快照"""
+        employees = len(self.ids)
+        events = self.event_count
+        temporary_path = f'{path}.tmp-{os.getpid()}'
+        with open(temporary_path, 'wb') as f:
+            np.savez(
+                f,
+                version=np.array(SNAPSHOT_VERSION),
+                tax_year=np.array(-1 if self.tax_year is None else self.tax_year),
+                ids=np.array(self.ids, dtype=str),
+                income=self.income[:employees],
+                deduction=self.deduction[:employees],
+                tax_paid=self.tax_paid[:employees],
+                months=self.months[:employees],
+                last_month=self.last_month[:employees],
+                event_employee=self.event_employee[:events],
+                event_kind=self.event_kind[:events],
+                event_month=self.event_month[:events],
+                event_income=self.event_income[:events],
+                event_insurance=self.event_insurance[:events],
+                event_special=self.event_special[:events],
+                event_tax=self.event_tax[:events],
+            )
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'WithholdingLedger':
+        """从快照文件恢复台账，员工标识恢复为字符串"""
+        with np.load(path) as snapshot:
+            if int(snapshot['version']) != SNAPSHOT_VERSION:
+                raise ValueError(f'Unsupported ledger snapshot version: {int(snapshot["version"])}')
+            tax_year = int(snapshot['tax_year'])
+            ids = snapshot['ids'].tolist()
+            ledger = cls(None if tax_year < 0 else tax_year, capacity=len(ids))
+            ledger.ids = ids
+            ledger.index = {employee_id: position for position, employee_id in enumerate(ids)}
+            for name in ('income', 'deduction', 'tax_paid', 'months', 'last_month'):
+                getattr(ledger, name)[:len(ids)] = snapshot[name]
+            events = len(snapshot['event_kind'])
+            ledger._grow_events(events)
+            for name in ('event_employee', 'event_kind', 'event_month', 'event_income',
+                         'event_insurance', 'event_special', 'event_tax'):
+                getattr(ledger, name)[:events] = snapshot[name]
+            ledger.event_count = events
+        # 事件链表不写入快照，恢复时一次排序重建
+        ledger._rebuild_event_index()
+        return ledger
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+轻量级指标收集，以Prometheus文本格式输出
+每次记录只做一次加锁的整数/浮点累加，可以在满负载下常开。
+多进程部署（gunicorn多个worker）时每个进程各自统计。
+"""
+
+import threading
+from bisect import bisect_left
+
+# 默认延迟分桶（秒），覆盖几十微秒到一秒
+DEFAULT_LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """只增不减的计数器，可按标签区分"""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        with self._lock:
+            return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            yield self.name + _format_labels(self.labelnames, labelvalues), value
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+
+    type_name = 'gauge'
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = value
+
+
+class Histogram:
+    """按固定分桶统计观测值的分布"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # [各分桶计数..., +Inf 分桶计数, 总和]
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def snapshot(self, *labelvalues) -> tuple:
+        """返回 (各分桶计数列表（不累计，最后一项为 +Inf 分桶）, 观测值总和)"""
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                return [0] * (len(self.buckets) + 1), 0.0
+            return series[:-1], series[-1]
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labelvalues, list(series)) for labelvalues, series in self._series.items())
+        for labelvalues, series in items:
+            cumulative = 0
+            for upper, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                yield (self.name + '_bucket' +
+                       _format_labels(self.labelnames, labelvalues, f'le="{_format_value(upper)}"'),
+                       cumulative)
+            yield self.name + '_sum' + _format_labels(self.labelnames, labelvalues), series[-1]
+            yield self.name + '_count' + _format_labels(self.labelnames, labelvalues), cumulative
+
+
+class MetricsRegistry:
+    """指标注册表，负责输出Prometheus文本格式"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register(self, metric):
+        """注册由其他组件创建并更新的指标对象"""
+        return self._register(metric)
+
+    def add_collector(self, collector):
+        """
+        注册在输出时才采集的指标
+
+        collector() 返回 [(名称, 类型, 说明, [(标签字典, 数值), ...]), ...]，
+        用于缓存命中率等已由其他组件统计的数据，平时不产生任何开销。
+        """
+        self._collectors.append(collector)
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for sample_name, value in metric.samples():
+                lines.append(f'{sample_name} {_format_value(value)}')
+        for collector in self._collectors:
+            for name, type_name, documentation, samples in collector():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {type_name}')
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f'{name}{_format_labels(names, tuple(labels[key] for key in names))} '
+                                 f'{_format_value(value)}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按次计税的非工资所得
+劳务报酬、稿酬和特许权使用费按次预扣：每次收入不超过4000元减除800元费用，
+超过4000元减除20%费用，稿酬再按70%计算，之后按各自的预扣率表计税。
+规则由规则文件编译为按所得类别下标索引的列数组，批量处理单笔支付并按收款人汇总。
+"""
+
+import numpy as np
+
+# 内置规则：{类别: {'expense_threshold', 'fixed_expense', 'expense_rate', 'income_rate',
+#                   'brackets': [[应纳税所得额上限, 预扣率, 速算扣除数], ...]}}，最高档上限为 None
+DEFAULT_PAYMENT_RULES = {
+    'labor': {
+        'expense_threshold': 4000,
+        'fixed_expense': 800,
+        'expense_rate': 0.2,
+        'income_rate': 1.0,
+        'brackets': [[20000, 0.2, 0], [50000, 0.3, 2000], [None, 0.4, 7000]],
+    },
+    'manuscript': {
+        'expense_threshold': 4000,
+        'fixed_expense': 800,
+        'expense_rate': 0.2,
+        'income_rate': 0.7,
+        'brackets': [[None, 0.2, 0]],
+    },
+    'license': {
+        'expense_threshold': 4000,
+        'fixed_expense': 800,
+        'expense_rate': 0.2,
+        'income_rate': 1.0,
+        'brackets': [[None, 0.2, 0]],
+    },
+}
+
+# 单笔计税结果的字段
+PAYMENT_FIELDS = ('taxable_income', 'rate', 'quick_deduction', 'tax', 'net_income')
+
+# 按收款人汇总结果的字段
+PAYEE_FIELDS = ('payments', 'income', 'taxable_income', 'tax', 'net_income')
+
+
+class PaymentTaxTable:
+    """
+    编译后的按次计税规则表，对象不可变
+
+    Args:
+        categories: {类别: 规则}，格式同 DEFAULT_PAYMENT_RULES
+    """
+    __slots__ = ('categories', 'index', 'rows', 'thresholds', 'fixed_expenses', 'expense_rates',
+                 'income_rates', 'upper_bounds', 'rates', 'quick_deductions')
+
+    def __init__(self, categories: dict):
+        names = tuple(sorted(categories))
+        rows = []
+        for name in names:
+            rules = categories[name]
+            brackets = tuple((float('inf') if upper is None else float(upper), float(rate), float(deduction))
+                             for upper, rate, deduction in rules['brackets'])
+            upper_bounds = [upper for upper, _, _ in brackets]
+            if not brackets or upper_bounds != sorted(upper_bounds) or upper_bounds[-1] != float('inf'):
+                raise ValueError(f'{name}: bracket upper bounds must increase and end with null')
+            rows.append((float(rules['expense_threshold']), float(rules['fixed_expense']),
+                         float(rules['expense_rate']), float(rules.get('income_rate', 1)), brackets))
+
+        object.__setattr__(self, 'categories', names)
+        object.__setattr__(self, 'index', {name: position for position, name in enumerate(names)})
+        object.__setattr__(self, 'rows', tuple(rows))
+        for position, field in enumerate(('thresholds', 'fixed_expenses', 'expense_rates', 'income_rates')):
+            object.__setattr__(self, field, np.array([row[position] for row in rows], dtype=np.float64))
+        # 形状为 (类别数, 最多档数) 的预扣率表，档数不足的类别用最高档补齐
+        width = max((len(row[4]) for row in rows), default=1)
+        padded = [row[4] + row[4][-1:] * (width - len(row[4])) for row in rows]
+        for position, field in enumerate(('upper_bounds', 'rates', 'quick_deductions')):
+            object.__setattr__(self, field, np.array([[bracket[position] for bracket in brackets]
+                                                      for brackets in padded],
+                                                     dtype=np.float64).reshape(len(names), width))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('PaymentTaxTable is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('PaymentTaxTable is immutable')
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def __contains__(self, category) -> bool:
+        return category in self.index
+
+    def income_factor(self, category: str) -> float:
+        """
+        年度汇算时收入额占收入的比例：减除 expense_rate 的费用后再乘以计入比例，
+        不适用按次的800元固定减除
+
+        Raises:
+            ValueError: 没有该类别的规则
+        """
+        position = self.index.get(category)
+        if position is None:
+            raise ValueError(f'No payment tax rules for category {category}')
+        _, _, expense_rate, income_rate, _ = self.rows[position]
+        return (1 - expense_rate) * income_rate
+
+    def calculate(self, category: str, amount: float) -> dict:
+        """
+        计算单笔支付的预扣税额
+
+        Returns:
+            包含 PAYMENT_FIELDS 各字段的字典
+
+        Raises:
+            ValueError: 没有该类别的规则
+        """
+        position = self.index.get(category)
+        if position is None:
+            raise ValueError(f'No payment tax rules for category {category}')
+        threshold, fixed_expense, expense_rate, income_rate, brackets = self.rows[position]
+
+        expense = fixed_expense if amount <= threshold else amount * expense_rate
+        taxable_income = max(amount - expense, 0) * income_rate
+        for upper, rate, deduction in brackets:
+            if taxable_income <= upper:
+                break
+        tax = taxable_income * rate - deduction if taxable_income > 0 else 0
+        return {
+            'taxable_income': taxable_income,
+            'rate': rate,
+            'quick_deduction': deduction,
+            'tax': tax,
+            'net_income': amount - tax,
+        }
+
+    def lookup(self, category) -> np.ndarray:
+        """
+        把类别列转换为类别下标数组，只对去重后的类别查一次字典
+
+        Raises:
+            ValueError: 有类别没有规则
+        """
+        names, inverse = np.unique(np.asarray(category, dtype=str), return_inverse=True)
+        positions = np.empty(len(names), dtype=np.intp)
+        for offset, name in enumerate(names.tolist()):
+            position = self.index.get(name)
+            if position is None:
+                raise ValueError(f'No payment tax rules for category {name}')
+            positions[offset] = position
+        return positions[inverse].reshape(np.shape(category))
+
+    def calculate_batch(self, category, amount) -> dict:
+        """
+        向量化计算一批单笔支付的预扣税额，结果与逐笔调用 calculate 一致
+
+        Args:
+            category: 所得类别数组或标量
+            amount: 每笔支付金额数组
+
+        Returns:
+            {字段名: 数组} 形式的结果，字段为 PAYMENT_FIELDS
+        """
+        category, amount = np.broadcast_arrays(np.asarray(category, dtype=str),
+                                               np.asarray(amount, dtype=np.float64))
+        position = self.lookup(category)
+
+        expense = np.where(amount <= self.thresholds[position], self.fixed_expenses[position],
+                           amount * self.expense_rates[position])
+        taxable_income = np.maximum(amount - expense, 0) * self.income_rates[position]
+        # 区间左开右闭：所得额超过的上限个数就是所在档的下标
+        bracket = (taxable_income[..., np.newaxis] > self.upper_bounds[position]).sum(axis=-1)
+        rate = self.rates[position, bracket]
+        quick_deduction = self.quick_deductions[position, bracket]
+        tax = np.where(taxable_income > 0, taxable_income * rate - quick_deduction, 0.0)
+        return {
+            'taxable_income': taxable_income,
+            'rate': rate,
+            'quick_deduction': quick_deduction,
+            'tax': tax,
+            'net_income': amount - tax,
+        }
+
+    def aggregate(self, payee, category, amount, period=None) -> dict:
+        """
+        批量计算单笔支付并按收款人汇总
+
+        Args:
+            payee: 收款人数组
+            category: 所得类别数组或标量
+            amount: 每笔支付金额数组
+            period: 可选的期间数组（如 '2025-03'）。给出时同一收款人同一类别同一期间的支付
+                合并为一次计税（同一项目连续性收入以一个月内取得的收入为一次）
+
+        Returns:
+            {'payee': 收款人数组, PAYEE_FIELDS 各字段: 数组}，payments 为合并前的支付笔数
+        """
+        payee = np.asarray(payee)
+        category, amount = np.broadcast_arrays(np.asarray(category, dtype=str),
+                                               np.asarray(amount, dtype=np.float64))
+        category = np.broadcast_to(category, payee.shape)
+        amount = np.broadcast_to(amount, payee.shape)
+        payees, payee_index = np.unique(payee, return_inverse=True)
+        payee_index = payee_index.reshape(payee.shape)
+        counts = np.bincount(payee_index, minlength=len(payees))
+
+        if period is not None:
+            # 先把同一次的支付合并，再按合并后的金额计税
+            period = np.broadcast_to(np.asarray(period, dtype=str), payee.shape)
+            category_index = self.lookup(category)
+            _, period_index = np.unique(period, return_inverse=True)
+            keys = np.stack([payee_index, category_index, period_index.reshape(payee.shape)])
+            keys, group = np.unique(keys, axis=1, return_inverse=True)
+            amount = np.bincount(group.reshape(payee.shape), weights=amount, minlength=keys.shape[1])
+            category = np.array(self.categories, dtype=str)[keys[1]]
+            payee_index = keys[0]
+
+        result = self.calculate_batch(category, amount)
+        totals = {'payee': payees, 'payments': counts,
+                  'income': np.bincount(payee_index, weights=amount, minlength=len(payees))}
+        for field in ('taxable_income', 'tax', 'net_income'):
+            totals[field] = np.bincount(payee_index, weights=result[field], minlength=len(payees))
+        return totals
+
+
+DEFAULT_PAYMENT_TABLE = PaymentTaxTable(DEFAULT_PAYMENT_RULES)
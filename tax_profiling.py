@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按需性能剖析
+按比例抽样请求，用 cProfile 或轻量的墙钟采样器剖析，按时间窗口汇总后输出
+pstats 文件或可直接生成火焰图的 collapsed stack 文件。抽样比例为0时只多一次属性判断。
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+MODES = ('cprofile', 'sampler')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+
+def _check_sample_rate(sample_rate: float):
+    if not 0 <= sample_rate <= 1:
+        raise ValueError(f'sample_rate must be between 0 and 1, got {sample_rate}')
+
+
+class RequestProfiler:
+    """
+    抽样剖析器
+
+    Args:
+        sample_rate: 抽样比例（0-1），为0时关闭
+        mode: 'cprofile' 输出 .pstats；'sampler' 按 interval 采样调用栈，输出 .collapsed
+        window: 汇总窗口（秒），窗口结束后的第一个抽样请求触发输出
+        output_dir: 输出目录
+        interval: 采样器的采样间隔（秒）
+    """
+
+    def __init__(self, sample_rate: float = 0.0, mode: str = 'cprofile', window: float = 60.0,
+                 output_dir: str = 'profiles', interval: float = 0.005):
+        if mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        _check_sample_rate(sample_rate)
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.window = window
+        self.output_dir = output_dir
+        self.interval = interval
+
+        self._lock = threading.Lock()
+        # cProfile 同一时刻只能有一个活动的剖析器，其余被抽中的请求直接跳过
+        self._profile_lock = threading.Lock()
+        self._window_started_at = time.monotonic()
+        self._stats = None
+        self._stacks = Counter()
+        self._samples = 0
+        self._active_threads = {}
+        self._sampler_thread = None
+        # 同一秒内多次输出时用序号区分文件名
+        self._dump_count = 0
+
+    def configure(self, sample_rate: float = None, mode: str = None, window: float = None):
+        """运行时调整抽样参数，切换模式前会先输出当前窗口的数据"""
+        if mode is not None and mode not in MODES:
+            raise ValueError(f'Unknown profiling mode: {mode}')
+        if sample_rate is not None:
+            _check_sample_rate(sample_rate)
+        if mode is not None and mode != self.mode:
+            self.dump()
+            self.mode = mode
+        if window is not None:
+            self.window = window
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+    def wrap(self, name: str):
+        """装饰器：按抽样比例剖析被装饰的函数"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.sample_rate or random.random() >= self.sample_rate:
+                    return func(*args, **kwargs)
+                return self._run_sampled(name, func, args, kwargs)
+            return wrapper
+        return decorator
+
+    def _run_sampled(self, name: str, func, args, kwargs):
+        if self.mode == 'sampler':
+            return self._run_with_sampler(func, args, kwargs)
+        if not self._profile_lock.acquire(blocking=False):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._profile_lock.release()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+                self._samples += 1
+            self._maybe_dump()
+
+    def _run_with_sampler(self, func, args, kwargs):
+        self._ensure_sampler()
+        ident = threading.get_ident()
+        with self._lock:
+            self._active_threads[ident] = self._active_threads.get(ident, 0) + 1
+            self._samples += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active_threads[ident] -= 1
+                if not self._active_threads[ident]:
+                    del self._active_threads[ident]
+            self._maybe_dump()
+
+    def _ensure_sampler(self):
+        if self._sampler_thread is None or not self._sampler_thread.is_alive():
+            with self._lock:
+                if self._sampler_thread is None or not self._sampler_thread.is_alive():
+                    self._sampler_thread = threading.Thread(target=self._sample_loop,
+                                                            name='tax-profiler', daemon=True)
+                    self._sampler_thread.start()
+
+    def _sample_loop(self):
+        while self.sample_rate and self.mode == 'sampler':
+            time.sleep(self.interval)
+            with self._lock:
+                idents = list(self._active_threads)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            stacks = []
+            for ident in idents:
+                frame = frames.get(ident)
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if labels:
+                    stacks.append(';'.join(reversed(labels)))
+            with self._lock:
+                self._stacks.update(stacks)
+
+    def _maybe_dump(self):
+        if time.monotonic() - self._window_started_at >= self.window:
+            self.dump()
+
+    def dump(self) -> list:
+        """输出当前窗口汇总的数据并开始新窗口，返回写出的文件路径"""
+        with self._lock:
+            stats, self._stats = self._stats, None
+            stacks, self._stacks = self._stacks, Counter()
+            samples, self._samples = self._samples, 0
+            self._window_started_at = time.monotonic()
+            if samples:
+                self._dump_count += 1
+                sequence = self._dump_count
+        if not samples:
+            return []
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        prefix = os.path.join(self.output_dir,
+                              f'profile-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{sequence}')
+        paths = []
+        if stats is not None:
+            stats.dump_stats(prefix + '.pstats')
+            paths.append(prefix + '.pstats')
+        if stacks:
+            with open(prefix + '.collapsed', 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            paths.append(prefix + '.collapsed')
+        return paths
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'sample_rate': self.sample_rate,
+                'mode': self.mode,
+                'window': self.window,
+                'output_dir': self.output_dir,
+                'samples_in_window': self._samples,
+                'window_age': time.monotonic() - self._window_started_at
+            }
+
+
+def profiler_from_environ(environ=os.environ) -> RequestProfiler:
+    """根据环境变量创建剖析器，未设置 TAX_PROFILE_SAMPLE_RATE 时默认关闭"""
+    return RequestProfiler(
+        sample_rate=float(environ.get('TAX_PROFILE_SAMPLE_RATE', 0)),
+        mode=environ.get('TAX_PROFILE_MODE', 'cprofile'),
+        window=float(environ.get('TAX_PROFILE_WINDOW', 60)),
+        output_dir=environ.get('TAX_PROFILE_DIR', 'profiles')
+    )
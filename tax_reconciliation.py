@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+综合所得年度汇算
+把全年工资薪金、劳务报酬、稿酬和特许权使用费合并为综合所得，按年度税率表计算应纳税额，
+与全年已预扣预缴的税额比较得出应退或应补税额，并比较年终奖单独计税与并入综合所得两种方式。
+批量版本按列计算，一家公司全部员工的汇算是一次向量化计算。
+"""
+
+import numpy as np
+
+from tax_batch import get_batch_calculator
+from tax_calculator import get_calculator
+
+# 综合所得收入全年不超过该金额，或应补税额不超过 EXEMPT_TAX_LIMIT 时，免于补税
+EXEMPT_INCOME_LIMIT = 120000
+EXEMPT_TAX_LIMIT = 400
+
+# 计入综合所得的非工资所得类别，对应的收入参数为 <类别>_income
+PAYMENT_CATEGORIES = ('labor', 'manuscript', 'license')
+
+# 汇算结果字段
+RECONCILIATION_FIELDS = (
+    'gross_income',
+    'comprehensive_income',
+    'total_deductions',
+    'taxable_income',
+    'comprehensive_tax',
+    'bonus_tax',
+    'final_tax',
+    'withheld_tax',
+    'balance',
+    'refund',
+    'tax_due',
+    'exempt',
+    'alternative_tax',
+    'best_bonus_type',
+    'bonus_choice_saving',
+)
+
+
+def _income_factors(rules) -> tuple:
+    return tuple(rules.payments.income_factor(category) for category in PAYMENT_CATEGORIES)
+
+
+def reconcile(salary_income=0, bonus=0, labor_income=0, manuscript_income=0, license_income=0,
+              social_insurance=0, special_deductions=0, other_deductions=0, withheld_tax=0,
+              bonus_type='separate', tax_year=None) -> dict:
+    """
+    计算一个人的综合所得年度汇算
+
+    Args:
+        salary_income: 全年工资薪金收入（不含全年一次性奖金）
+        bonus: 全年一次性奖金
+        labor_income: 全年劳务报酬收入
+        manuscript_income: 全年稿酬收入
+        license_income: 全年特许权使用费收入
+        social_insurance: 全年三险一金（专项扣除）
+        special_deductions: 全年专项附加扣除
+        other_deductions: 全年依法确定的其他扣除（如个人养老金）
+        withheld_tax: 全年已预扣预缴的税额（含年终奖和劳务报酬等已扣的税）
+        bonus_type: 汇算时年终奖的计税方式（'separate' 或 'combined'）
+        tax_year: 纳税年度，默认使用规则注册表的默认年度
+
+    Returns:
+        包含 RECONCILIATION_FIELDS 各字段的字典：
+            - comprehensive_income: 综合所得收入额（劳务报酬等按减除费用后的收入额计入）
+            - final_tax: 按 bonus_type 计算的全年应纳税额（含单独计税的年终奖税额）
+            - balance: 应纳税额减已预缴税额，正数为应补，负数为应退
+            - exempt: 应补税但符合免于补税条件
+            - alternative_tax: 年终奖采用另一种计税方式时的全年应纳税额
+            - best_bonus_type: 税额较低的年终奖计税方式，相同时为所选方式
+            - bonus_choice_saving: 改用 best_bonus_type 可以少缴的税额
+    """
+    calculator = get_calculator(tax_year)
+    labor_factor, manuscript_factor, license_factor = _income_factors(calculator.rules)
+
+    income = salary_income + labor_income * labor_factor + manuscript_income * manuscript_factor \
+        + license_income * license_factor
+    total_deductions = calculator.basic_deduction * 12 + social_insurance + special_deductions + other_deductions
+
+    # 年终奖单独计税与并入综合所得两种方式
+    separate_comprehensive_tax = calculator.calculate_accumulated_tax(income, total_deductions)
+    separate_bonus_tax = calculator.calculate_bonus_tax(bonus)
+    separate_tax = separate_comprehensive_tax + separate_bonus_tax
+    combined_tax = calculator.calculate_accumulated_tax(income + bonus, total_deductions)
+
+    if bonus_type == 'separate':
+        comprehensive_income = income
+        comprehensive_tax = separate_comprehensive_tax
+        bonus_tax = separate_bonus_tax
+        final_tax, alternative_tax = separate_tax, combined_tax
+        alternative_type = 'combined'
+    else:
+        comprehensive_income = income + bonus
+        comprehensive_tax = combined_tax
+        bonus_tax = 0
+        final_tax, alternative_tax = combined_tax, separate_tax
+        alternative_type = 'separate'
+
+    balance = final_tax - withheld_tax
+    gross_income = salary_income + bonus + labor_income + manuscript_income + license_income
+    # 单独计税的年终奖不属于综合所得收入
+    comprehensive_gross_income = gross_income - bonus if bonus_type == 'separate' else gross_income
+    tax_due = max(balance, 0)
+    return {
+        'gross_income': gross_income,
+        'comprehensive_income': comprehensive_income,
+        'total_deductions': total_deductions,
+        'taxable_income': max(comprehensive_income - total_deductions, 0),
+        'comprehensive_tax': comprehensive_tax,
+        'bonus_tax': bonus_tax,
+        'final_tax': final_tax,
+        'withheld_tax': withheld_tax,
+        'balance': balance,
+        'refund': max(-balance, 0),
+        'tax_due': tax_due,
+        'exempt': tax_due > 0 and (comprehensive_gross_income <= EXEMPT_INCOME_LIMIT
+                                   or tax_due <= EXEMPT_TAX_LIMIT),
+        'alternative_tax': alternative_tax,
+        'best_bonus_type': alternative_type if alternative_tax < final_tax else bonus_type,
+        'bonus_choice_saving': max(final_tax - alternative_tax, 0),
+    }
+
+
+def reconcile_batch(salary_income=0, bonus=0, labor_income=0, manuscript_income=0, license_income=0,
+                    social_insurance=0, special_deductions=0, other_deductions=0, withheld_tax=0,
+                    bonus_type='separate', tax_year=None) -> dict:
+    """
+    批量计算综合所得年度汇算，参数与 reconcile 相同，均可为数组或标量
+
+    Returns:
+        {字段名: 数组} 形式的结果，字段与 reconcile 相同，结果逐行一致
+    """
+    batch_calculator = get_batch_calculator(tax_year)
+    labor_factor, manuscript_factor, license_factor = _income_factors(get_calculator(tax_year).rules)
+    (salary_income, bonus, labor_income, manuscript_income, license_income, social_insurance,
+     special_deductions, other_deductions, withheld_tax) = np.broadcast_arrays(
+        *(np.asarray(column, dtype=np.float64) for column in (
+            salary_income, bonus, labor_income, manuscript_income, license_income, social_insurance,
+            special_deductions, other_deductions, withheld_tax)))
+    separate = np.broadcast_to(np.asarray(bonus_type) == 'separate', salary_income.shape)
+
+    income = salary_income + labor_income * labor_factor + manuscript_income * manuscript_factor \
+        + license_income * license_factor
+    total_deductions = batch_calculator.basic_deduction * 12 + social_insurance + special_deductions \
+        + other_deductions
+
+    separate_comprehensive_tax = batch_calculator.calculate_accumulated_tax(income, total_deductions)
+    separate_bonus_tax = batch_calculator.calculate_bonus_tax(bonus)
+    separate_tax = separate_comprehensive_tax + separate_bonus_tax
+    combined_tax = batch_calculator.calculate_accumulated_tax(income + bonus, total_deductions)
+
+    comprehensive_income = np.where(separate, income, income + bonus)
+    final_tax = np.where(separate, separate_tax, combined_tax)
+    alternative_tax = np.where(separate, combined_tax, separate_tax)
+    balance = final_tax - withheld_tax
+    gross_income = salary_income + bonus + labor_income + manuscript_income + license_income
+    comprehensive_gross_income = np.where(separate, gross_income - bonus, gross_income)
+    tax_due = np.maximum(balance, 0)
+    chosen_type = np.where(separate, 'separate', 'combined')
+    alternative_type = np.where(separate, 'combined', 'separate')
+    return {
+        'gross_income': gross_income,
+        'comprehensive_income': comprehensive_income,
+        'total_deductions': total_deductions,
+        'taxable_income': np.maximum(comprehensive_income - total_deductions, 0),
+        'comprehensive_tax': np.where(separate, separate_comprehensive_tax, combined_tax),
+        'bonus_tax': np.where(separate, separate_bonus_tax, 0.0),
+        'final_tax': final_tax,
+        'withheld_tax': withheld_tax,
+        'balance': balance,
+        'refund': np.maximum(-balance, 0),
+        'tax_due': tax_due,
+        'exempt': (tax_due > 0) & ((comprehensive_gross_income <= EXEMPT_INCOME_LIMIT)
+                                   | (tax_due <= EXEMPT_TAX_LIMIT)),
+        'alternative_tax': alternative_tax,
+        'best_bonus_type': np.where(alternative_tax < final_tax, alternative_type, chosen_type),
+        'bonus_choice_saving': np.maximum(final_tax - alternative_tax, 0),
+    }
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+个税计算的输入和结果记录
+用 __slots__ 定义字段固定、顺序稳定的记录类型，没有每个对象一份的 __dict__，
+可以低成本地转换为元组、列数组和JSON。原有的字典接口通过 to_dict 兼容。
+"""
+
+import json
+import math
+from operator import attrgetter
+
+import numpy as np
+
+# calculate_tax 的参数顺序
+INPUT_FIELDS = (
+    'salary',
+    'salary_type',
+    'bonus',
+    'bonus_type',
+    'labor_income',
+    'manuscript_income',
+    'license_income',
+    'social_security_base',
+    'housing_fund_rate',
+    'special_deductions',
+    'tax_year',
+    'city',
+)
+
+# 结果字段顺序，与 calculate_tax 返回的字典保持一致
+RESULT_FIELDS = (
+    'salary_taxable_income',
+    'salary_tax',
+    'bonus_taxable_income',
+    'bonus_tax',
+    'labor_income',
+    'labor_tax',
+    'manuscript_income',
+    'manuscript_tax',
+    'license_income',
+    'license_tax',
+    'total_taxable_income',
+    'total_tax',
+    'total_deductions',
+    'net_income',
+)
+
+
+class _Record:
+    """记录的公共方法，子类的 __slots__ 即字段顺序"""
+    __slots__ = ()
+    _values = None
+
+    def as_tuple(self) -> tuple:
+        """按字段顺序返回字段值组成的元组"""
+        return self._values(self)
+
+    def to_dict(self) -> dict:
+        """返回字段名到字段值的新字典"""
+        return dict(zip(self.__slots__, self._values(self)))
+
+    # keys 和 __getitem__ 使 dict(record) 和 record['字段名'] 与原有的字典结果用法一致
+    def keys(self) -> tuple:
+        return self.__slots__
+
+    def __getitem__(self, field: str):
+        if field not in self.__slots__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values(self) == other._values(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{field}={value!r}' for field, value in zip(self.__slots__, self._values(self)))
+        return f'{type(self).__name__}({fields})'
+
+
+class TaxInput(_Record):
+    """calculate_tax 的一组输入参数，字段含义与 calculate_tax 的参数相同"""
+    __slots__ = INPUT_FIELDS
+
+    def __init__(self, salary=0, salary_type='monthly', bonus=0, bonus_type='separate',
+                 labor_income=0, manuscript_income=0, license_income=0,
+                 social_security_base=0, housing_fund_rate=0,
+                 special_deductions=None, tax_year=None, city=None):
+        self.salary = salary
+        self.salary_type = salary_type
+        self.bonus = bonus
+        self.bonus_type = bonus_type
+        self.labor_income = labor_income
+        self.manuscript_income = manuscript_income
+        self.license_income = license_income
+        self.social_security_base = social_security_base
+        self.housing_fund_rate = housing_fund_rate
+        self.special_deductions = special_deductions if special_deductions is not None else {}
+        self.tax_year = tax_year
+        self.city = city
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TaxInput':
+        """
+        从请求数据构造输入，缺少的字段使用默认值，数值字段转换为浮点数
+
+        Raises:
+            ValueError, TypeError: 数值字段无法转换
+        """
+        return cls(
+            salary=float(data.get('salary', 0)),
+            salary_type=data.get('salary_type', 'monthly'),
+            bonus=float(data.get('bonus', 0)),
+            bonus_type=data.get('bonus_type', 'separate'),
+            labor_income=float(data.get('labor_income', 0)),
+            manuscript_income=float(data.get('manuscript_income', 0)),
+            license_income=float(data.get('license_income', 0)),
+            social_security_base=float(data.get('social_security_base', 0)),
+            housing_fund_rate=float(data.get('housing_fund_rate', 0)),
+            special_deductions=data.get('special_deductions', {}),
+            tax_year=int(data['tax_year']) if data.get('tax_year') is not None else None,
+            city=str(data['city']) if data.get('city') else None
+        )
+
+
+TaxInput._values = attrgetter(*INPUT_FIELDS)
+
+# 预先生成的JSON模板，序列化时只需一次字符串格式化
+_RESULT_JSON = '{' + ','.join(f'"{field}":%s' for field in RESULT_FIELDS) + '}'
+_SORTED_RESULT_FIELDS = tuple(sorted(RESULT_FIELDS))
+_SORTED_RESULT_JSON = '{' + ','.join(f'"{field}":%s' for field in _SORTED_RESULT_FIELDS) + '}'
+_sorted_result_values = attrgetter(*_SORTED_RESULT_FIELDS)
+
+
+class TaxResult(_Record):
+    """
+    calculate_tax 的计算结果，字段为 RESULT_FIELDS
+
+    缓存和请求合并器中的结果对象会被多个请求共享，约定为只读，需要修改时先 to_dict。
+    """
+    __slots__ = RESULT_FIELDS
+
+    def __init__(self, salary_taxable_income, salary_tax, bonus_taxable_income, bonus_tax,
+                 labor_income, labor_tax, manuscript_income, manuscript_tax,
+                 license_income, license_tax, total_taxable_income, total_tax,
+                 total_deductions, net_income):
+        self.salary_taxable_income = salary_taxable_income
+        self.salary_tax = salary_tax
+        self.bonus_taxable_income = bonus_taxable_income
+        self.bonus_tax = bonus_tax
+        self.labor_income = labor_income
+        self.labor_tax = labor_tax
+        self.manuscript_income = manuscript_income
+        self.manuscript_tax = manuscript_tax
+        self.license_income = license_income
+        self.license_tax = license_tax
+        self.total_taxable_income = total_taxable_income
+        self.total_tax = total_tax
+        self.total_deductions = total_deductions
+        self.net_income = net_income
+
+    @classmethod
+    def from_dict(cls, result: dict) -> 'TaxResult':
+        """从 calculate_tax 形式的结果字典构造记录"""
+        return cls(*(result[field] for field in RESULT_FIELDS))
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> list:
+        """把 {字段名: 数组} 形式的批量结果转换为记录列表，数值转换为Python浮点数"""
+        return list(map(cls, *(np.asarray(columns[field]).tolist() for field in RESULT_FIELDS)))
+
+    @staticmethod
+    def to_columns(records) -> dict:
+        """把记录序列转换为 {字段名: 数组} 形式的列，与 calculate_tax_batch 的结果格式相同"""
+        values = np.array(list(map(_result_values, records)), dtype=np.float64)
+        table = np.ascontiguousarray(values.reshape(-1, len(RESULT_FIELDS)).T)
+        return dict(zip(RESULT_FIELDS, table))
+
+    def to_json(self, sort_keys: bool = False) -> str:
+        """
+        序列化为紧凑的JSON对象，与 json.dumps(..., separators=(',', ':')) 的结果相同
+
+        字段值都是有限的数值时直接套用预先生成的模板，否则交给 json 模块处理。
+        """
+        values = _sorted_result_values(self) if sort_keys else self._values(self)
+        if all(map(math.isfinite, values)):
+            return (_SORTED_RESULT_JSON if sort_keys else _RESULT_JSON) % values
+        return json.dumps(self.to_dict(), sort_keys=sort_keys, separators=(',', ':'))
+
+
+_result_values = TaxResult._values = attrgetter(*RESULT_FIELDS)
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+个税规则注册表
+按纳税年度从 rules/*.json 加载税率表、基本减除费用和社保比例，每套规则只编译一次。
+规则文件修改后自动重新加载：新规则全部编译完成后整体替换，
+正在计算的请求始终使用同一套完整的规则。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from types import MappingProxyType
+
+from tax_contributions import EMPTY_CONTRIBUTION_TABLE, ContributionTable
+from tax_payments import DEFAULT_PAYMENT_TABLE, PaymentTaxTable
+
+logger = logging.getLogger(__name__)
+
+# 规则文件目录和检查文件变化的间隔（秒），间隔为负数时不自动重新加载
+RULES_DIR = os.environ.get('TAX_RULES_DIR',
+                           os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules'))
+RELOAD_INTERVAL = float(os.environ.get('TAX_RULES_RELOAD_INTERVAL', 1.0))
+
+# 年度累计预扣预缴税率表：(下限, 上限, 税率, 速算扣除数)
+ANNUAL_TAX_BRACKETS = (
+    (0, 36000, 0.03, 0),        # 不超过36000元的部分
+    (36000, 144000, 0.10, 2520),  # 超过36000元至144000元的部分
+    (144000, 300000, 0.20, 16920), # 超过144000元至300000元的部分
+    (300000, 420000, 0.25, 31920), # 超过300000元至420000元的部分
+    (420000, 660000, 0.30, 52920), # 超过420000元至660000元的部分
+    (660000, 960000, 0.35, 85920), # 超过660000元至960000元的部分
+    (960000, float('inf'), 0.45, 181920) # 超过960000元的部分
+)
+
+
+class TaxBracketTable:
+    """
+    编译后的税率表
+
+    构建时预先计算各档上限、税率、速算扣除数以及年终奖使用的月度换算上限，
+    查找时用二分法定位税档。对象不可变，可以在线程之间共享。
+
+    Args:
+        brackets: (下限, 上限, 税率, 速算扣除数) 形式的年度税率表
+        bonus_quick_deductions: 年终奖单独计税时各档的速算扣除数，默认与年度税率表相同
+    """
+    __slots__ = ('brackets', 'upper_bounds', 'monthly_upper_bounds', 'rates', 'quick_deductions',
+                 'after_tax_upper_bounds', 'bonus_quick_deductions')
+
+    def __init__(self, brackets, bonus_quick_deductions=None):
+        brackets = tuple(tuple(bracket) for bracket in brackets)
+        if bonus_quick_deductions is None:
+            bonus_quick_deductions = tuple(deduction for _, _, _, deduction in brackets)
+        elif len(bonus_quick_deductions) != len(brackets):
+            raise ValueError('bonus_quick_deductions must have one entry per bracket')
+        object.__setattr__(self, 'brackets', brackets)
+        object.__setattr__(self, 'upper_bounds', tuple(upper for _, upper, _, _ in brackets))
+        object.__setattr__(self, 'monthly_upper_bounds', tuple(upper / 12 for _, upper, _, _ in brackets))
+        object.__setattr__(self, 'rates', tuple(rate for _, _, rate, _ in brackets))
+        object.__setattr__(self, 'quick_deductions', tuple(deduction for _, _, _, deduction in brackets))
+        # 各档上限处的税后所得（所得额减去应纳税额），用于由税后反推税前
+        object.__setattr__(self, 'after_tax_upper_bounds', tuple(
+            upper if upper == float('inf') else upper - (upper * rate - deduction)
+            for _, upper, rate, deduction in brackets))
+        object.__setattr__(self, 'bonus_quick_deductions', tuple(bonus_quick_deductions))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TaxBracketTable is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('TaxBracketTable is immutable')
+
+    def find_bracket(self, taxable_income: float) -> int:
+        """返回应纳税所得额所在税档的下标，税档区间为左开右闭"""
+        return min(bisect_left(self.upper_bounds, taxable_income), len(self.upper_bounds) - 1)
+
+    def find_bonus_bracket(self, monthly_equivalent: float) -> int:
+        """返回年终奖月度换算额所在税档的下标"""
+        return min(bisect_left(self.monthly_upper_bounds, monthly_equivalent), len(self.monthly_upper_bounds) - 1)
+
+    def solve_taxable_income(self, after_tax_income: float) -> float:
+        """
+        由税后所得反推应纳税所得额，即求解 t - tax(t) = after_tax_income
+
+        税率表连续且各档税率小于1时，税后所得随所得额单调递增，
+        二分定位税档后在档内解线性方程即可得到精确解。
+        """
+        if after_tax_income <= 0:
+            return after_tax_income
+        index = min(bisect_left(self.after_tax_upper_bounds, after_tax_income), len(self.rates) - 1)
+        return (after_tax_income - self.quick_deductions[index]) / (1 - self.rates[index])
+
+
+# 进程内共享的默认税率表，只构建一次
+DEFAULT_TAX_TABLE = TaxBracketTable(ANNUAL_TAX_BRACKETS)
+
+
+# 内置规则，规则目录中没有可用的规则文件时使用
+DEFAULT_BASIC_DEDUCTION = 5000
+DEFAULT_SOCIAL_SECURITY_RATE = 0.205
+DEFAULT_EMPLOYEE_INSURANCE_RATES = {'pension': 0.08, 'medical': 0.02, 'unemployment': 0.005}
+
+
+class RuleFileError(ValueError):
+    """规则文件格式不正确"""
+
+
+class TaxRuleSet:
+    """
+    编译后的一套个税规则，对象不可变，可以在线程之间共享
+
+    Args:
+        tax_year: 纳税年度，内置规则为 None
+        version: 规则版本说明
+        fingerprint: 规则内容的摘要，内容变化时随之变化，用于缓存键
+        tax_table: 编译后的税率表
+        basic_deduction: 每月基本减除费用
+        social_security_rate: 计算器使用的社保个人缴纳总比例
+        employee_insurance_rates: {险种: 个人缴纳比例}
+        contributions: 按城市的社保公积金缴纳规则
+        payments: 劳务报酬、稿酬、特许权使用费的按次计税规则
+    """
+    __slots__ = ('tax_year', 'version', 'fingerprint', 'tax_table', 'basic_deduction',
+                 'social_security_rate', 'employee_insurance_rates', 'contributions', 'payments')
+
+    def __init__(self, tax_year, version: str, fingerprint: str, tax_table: TaxBracketTable,
+                 basic_deduction: float, social_security_rate: float, employee_insurance_rates: dict,
+                 contributions: ContributionTable = EMPTY_CONTRIBUTION_TABLE,
+                 payments: PaymentTaxTable = DEFAULT_PAYMENT_TABLE):
+        object.__setattr__(self, 'tax_year', tax_year)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'fingerprint', fingerprint)
+        object.__setattr__(self, 'tax_table', tax_table)
+        object.__setattr__(self, 'basic_deduction', basic_deduction)
+        object.__setattr__(self, 'social_security_rate', social_security_rate)
+        object.__setattr__(self, 'employee_insurance_rates', MappingProxyType(dict(employee_insurance_rates)))
+        object.__setattr__(self, 'contributions', contributions)
+        object.__setattr__(self, 'payments', payments)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('TaxRuleSet is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('TaxRuleSet is immutable')
+
+    def __repr__(self) -> str:
+        return f'TaxRuleSet(tax_year={self.tax_year!r}, version={self.version!r})'
+
+
+BUILTIN_RULES = TaxRuleSet(None, 'builtin', 'builtin', DEFAULT_TAX_TABLE, DEFAULT_BASIC_DEDUCTION,
+                           DEFAULT_SOCIAL_SECURITY_RATE, DEFAULT_EMPLOYEE_INSURANCE_RATES)
+
+
+def _number(data: dict, name: str, path: str) -> float:
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise RuleFileError(f'{path}: {name} must be a number')
+    return value
+
+
+def compile_ruleset(data: dict, fingerprint: str, path: str = '<rules>') -> TaxRuleSet:
+    """
+    校验规则数据并编译为 TaxRuleSet
+
+    Raises:
+        RuleFileError: 数据不完整或不合理
+    """
+    if not isinstance(data, dict):
+        raise RuleFileError(f'{path}: rules must be a JSON object')
+    tax_year = data.get('tax_year')
+    if isinstance(tax_year, bool) or not isinstance(tax_year, int):
+        raise RuleFileError(f'{path}: tax_year must be an integer')
+
+    raw_brackets = data.get('annual_tax_brackets')
+    if not isinstance(raw_brackets, list) or not raw_brackets:
+        raise RuleFileError(f'{path}: annual_tax_brackets must be a non-empty list')
+    brackets = []
+    for bracket in raw_brackets:
+        if not isinstance(bracket, list) or len(bracket) != 4:
+            raise RuleFileError(f'{path}: each bracket must be [lower, upper, rate, quick_deduction]')
+        lower, upper, rate, deduction = bracket
+        # JSON 没有无穷大，最高档的上限写作 null
+        brackets.append((lower, float('inf') if upper is None else upper, rate, deduction))
+    upper_bounds = [upper for _, upper, _, _ in brackets]
+    if upper_bounds != sorted(upper_bounds) or upper_bounds[-1] != float('inf'):
+        raise RuleFileError(f'{path}: bracket upper bounds must increase and end with null')
+    if not all(0 <= rate < 1 for _, _, rate, _ in brackets):
+        raise RuleFileError(f'{path}: bracket rates must be in [0, 1)')
+
+    basic_deduction = _number(data, 'basic_deduction', path)
+    social_security_rate = _number(data, 'social_security_rate', path)
+    insurance_rates = data.get('employee_insurance_rates', {})
+    if not isinstance(insurance_rates, dict):
+        raise RuleFileError(f'{path}: employee_insurance_rates must be an object')
+    for name in insurance_rates:
+        _number(insurance_rates, name, path)
+
+    cities = data.get('cities', {})
+    if not isinstance(cities, dict):
+        raise RuleFileError(f'{path}: cities must be an object')
+    payment_rules = data.get('payment_income')
+    if payment_rules is not None and not isinstance(payment_rules, dict):
+        raise RuleFileError(f'{path}: payment_income must be an object')
+
+    try:
+        tax_table = TaxBracketTable(brackets, data.get('bonus_quick_deductions'))
+        contributions = ContributionTable(cities)
+        # 没有 payment_income 部分时使用内置的按次计税规则
+        payments = DEFAULT_PAYMENT_TABLE if payment_rules is None else PaymentTaxTable(payment_rules)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise RuleFileError(f'{path}: invalid rules: {e!r}')
+    return TaxRuleSet(tax_year, str(data.get('version', tax_year)), fingerprint, tax_table,
+                      basic_deduction, social_security_rate, insurance_rates, contributions, payments)
+
+
+def load_ruleset(path: str) -> TaxRuleSet:
+    """读取并编译一个规则文件"""
+    with open(path, 'rb') as f:
+        content = f.read()
+    try:
+        data = json.loads(content.decode('utf-8'))
+    except ValueError as e:
+        raise RuleFileError(f'{path}: {e}')
+    return compile_ruleset(data, hashlib.sha256(content).hexdigest()[:16], path)
+
+
+class RuleRegistry:
+    """
+    按纳税年度索引的规则注册表
+
+    每隔 reload_interval 秒检查一次规则目录，文件新增、修改或删除时重新编译变化的文件，
+    然后一次性替换整个 {年度: 规则} 快照。读取方只读取一次快照引用，不需要加锁。
+    编译失败的文件保留上一次成功加载的版本。
+
+    Args:
+        directory: 规则文件目录
+        reload_interval: 检查文件变化的间隔（秒），为负数时只在调用 reload() 时加载
+        default_year: 未指定年度时使用的年度，默认为已加载的最新年度
+    """
+
+    def __init__(self, directory: str = RULES_DIR, reload_interval: float = RELOAD_INTERVAL,
+                 default_year: int = None):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self.default_year = default_year
+        # (年度 -> 规则 的只读映射, 默认规则)，整体替换
+        self._snapshot = (MappingProxyType({}), BUILTIN_RULES)
+        self._files = {}
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.reload()
+
+    def get(self, tax_year: int = None) -> TaxRuleSet:
+        """
+        返回指定年度的规则，未指定时返回默认年度的规则
+
+        Raises:
+            ValueError: 没有该年度的规则
+        """
+        if self.reload_interval >= 0 and time.monotonic() >= self._next_check:
+            self._check()
+        rulesets, default = self._snapshot
+        if tax_year is None:
+            return default
+        ruleset = rulesets.get(int(tax_year))
+        if ruleset is None:
+            raise ValueError(f'No tax rules for year {tax_year}')
+        return ruleset
+
+    def years(self) -> list:
+        """已加载的纳税年度"""
+        return sorted(self._snapshot[0])
+
+    def _check(self):
+        # 其他线程正在检查时直接使用当前快照
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            self._reload_locked()
+        finally:
+            self._lock.release()
+
+    def reload(self) -> bool:
+        """立即检查规则目录，规则有变化时返回 True"""
+        with self._lock:
+            self._next_check = time.monotonic() + max(self.reload_interval, 0)
+            return self._reload_locked()
+
+    def _reload_locked(self) -> bool:
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        except OSError:
+            names = []
+        stats = {}
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (stat.st_mtime_ns, stat.st_size)
+        if stats == {path: stat for path, (stat, _) in self._files.items()}:
+            return False
+
+        files = {}
+        for path, stat in stats.items():
+            previous = self._files.get(path)
+            if previous is not None and previous[0] == stat:
+                files[path] = previous
+                continue
+            try:
+                files[path] = (stat, load_ruleset(path))
+            except (OSError, RuleFileError) as e:
+                logger.warning('Failed to load tax rules: %s', e)
+                # 保留上一次成功加载的版本，文件再次修改时重试
+                files[path] = (stat, previous[1] if previous is not None else None)
+
+        rulesets = {}
+        for path, (_, ruleset) in files.items():
+            if ruleset is None:
+                continue
+            if ruleset.tax_year in rulesets:
+                logger.warning('Duplicate tax rules for year %s in %s', ruleset.tax_year, path)
+                continue
+            rulesets[ruleset.tax_year] = ruleset
+        if self.default_year is not None and self.default_year in rulesets:
+            default = rulesets[self.default_year]
+        elif rulesets:
+            default = rulesets[max(rulesets)]
+        else:
+            default = BUILTIN_RULES
+
+        self._files = files
+        self._snapshot = (MappingProxyType(rulesets), default)
+        return True
+
+
+# 进程内共享的注册表，TAX_DEFAULT_YEAR 可以固定未指定年度时使用的年度
+rule_registry = RuleRegistry(
+    default_year=int(os.environ['TAX_DEFAULT_YEAR']) if os.environ.get('TAX_DEFAULT_YEAR') else None
+)
+
+
+def get_rules(tax_year: int = None) -> TaxRuleSet:
+    """返回指定年度（默认为当前默认年度）的规则"""
+    return rule_registry.get(tax_year)
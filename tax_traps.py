@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+年终奖雷区索引
+年终奖单独计税时，若某档分界点处税额跳升（速算扣除数与税率不衔接），
+略高于分界点的奖金反而使税后收入减少，这段区间称为雷区。
+索引由税率表预先算出全部雷区，按起点排序后用二分法查询。
+"""
+
+from bisect import bisect_left
+from functools import lru_cache
+
+import numpy as np
+
+from tax_calculator import TaxBracketTable, get_rules
+
+
+def _bonus_net(table: TaxBracketTable, bonus: float) -> float:
+    """年终奖单独计税后的税后金额，与 TaxCalculator.calculate_bonus_tax 一致"""
+    if bonus <= 0:
+        return bonus
+    index = table.find_bonus_bracket(bonus / 12)
+    return bonus - (bonus * table.rates[index] - table.bonus_quick_deductions[index])
+
+
+class BonusTrapIndex:
+    """
+    年终奖雷区索引
+
+    每个雷区为开区间 (start, end)：start 为税档分界点，end 为税后收入恢复到
+    分界点水平的奖金额，区间内任意金额的税后收入都低于 start 处。对象不可变。
+
+    Args:
+        tax_table: 编译后的税率表
+    """
+    __slots__ = ('tax_table', 'starts', 'ends', 'start_nets',
+                 'starts_array', 'ends_array', 'start_nets_array',
+                 'monthly_upper_bounds_array', 'rates_array', 'bonus_quick_deductions_array')
+
+    def __init__(self, tax_table: TaxBracketTable):
+        object.__setattr__(self, 'tax_table', tax_table)
+        intervals = []
+        rates = tax_table.rates
+        deductions = tax_table.bonus_quick_deductions
+        upper_bounds = tax_table.upper_bounds
+        for index in range(len(rates) - 1):
+            start = upper_bounds[index]
+            start_net = _bonus_net(tax_table, start)
+            # 分界点右侧的税额极限不高于分界点处时没有雷区
+            if start * rates[index + 1] - deductions[index + 1] <= start - start_net:
+                continue
+            # 在之后各档内求税后收入回到 start_net 的金额，档内税后收入线性递增，最高档没有上限
+            for later in range(index + 1, len(rates)):
+                upper = upper_bounds[later]
+                if upper == float('inf') or _bonus_net(tax_table, upper) >= start_net:
+                    end = (start_net - deductions[later]) / (1 - rates[later])
+                    break
+            intervals.append([start, end, start_net])
+
+        # 雷区相互重叠时合并，合并后起点处的税后收入仍高于整个区间
+        merged = []
+        for interval in intervals:
+            if merged and interval[0] < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], interval[1])
+            else:
+                merged.append(interval)
+
+        object.__setattr__(self, 'starts', tuple(start for start, _, _ in merged))
+        object.__setattr__(self, 'ends', tuple(end for _, end, _ in merged))
+        object.__setattr__(self, 'start_nets', tuple(start_net for _, _, start_net in merged))
+        object.__setattr__(self, 'starts_array', np.array(self.starts, dtype=np.float64))
+        object.__setattr__(self, 'ends_array', np.array(self.ends, dtype=np.float64))
+        object.__setattr__(self, 'start_nets_array', np.array(self.start_nets, dtype=np.float64))
+        # 批量检测时计算税后收入用的列数组
+        object.__setattr__(self, 'monthly_upper_bounds_array',
+                           np.array(tax_table.monthly_upper_bounds, dtype=np.float64))
+        object.__setattr__(self, 'rates_array', np.array(rates, dtype=np.float64))
+        object.__setattr__(self, 'bonus_quick_deductions_array', np.array(deductions, dtype=np.float64))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('BonusTrapIndex is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('BonusTrapIndex is immutable')
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def intervals(self) -> list:
+        """全部雷区 [(起点, 终点), ...]"""
+        return list(zip(self.starts, self.ends))
+
+    def find(self, bonus: float) -> int:
+        """返回奖金所在雷区的下标，不在雷区时为-1"""
+        index = bisect_left(self.starts, bonus) - 1
+        if index >= 0 and bonus < self.ends[index]:
+            return index
+        return -1
+
+    def check(self, bonus: float) -> dict:
+        """
+        检查单笔年终奖
+
+        Returns:
+            不在雷区时为 None，否则为包含以下字段的字典：
+                - lower_safe_bonus: 雷区起点，降到该金额税后收入反而增加
+                - upper_safe_bonus: 雷区终点，至少提高到该金额才不吃亏
+                - nearest_safe_bonus: 两者中离当前金额较近的一个
+                - net_loss: 相比降到雷区起点少拿的税后收入
+        """
+        index = self.find(bonus)
+        if index < 0:
+            return None
+        lower, upper = self.starts[index], self.ends[index]
+        return {
+            'lower_safe_bonus': lower,
+            'upper_safe_bonus': upper,
+            'nearest_safe_bonus': lower if bonus - lower <= upper - bonus else upper,
+            'net_loss': self.start_nets[index] - _bonus_net(self.tax_table, bonus),
+        }
+
+    def detect(self, bonus) -> dict:
+        """
+        向量化检查一批年终奖
+
+        Args:
+            bonus: 年终奖金额数组
+
+        Returns:
+            {'in_trap', 'lower_safe_bonus', 'upper_safe_bonus', 'nearest_safe_bonus', 'net_loss': 数组}，
+            不在雷区的行安全金额为原金额、net_loss 为0
+        """
+        bonus = np.asarray(bonus, dtype=np.float64)
+        if not len(self.starts):
+            return {
+                'in_trap': np.zeros(bonus.shape, dtype=bool),
+                'lower_safe_bonus': bonus,
+                'upper_safe_bonus': bonus,
+                'nearest_safe_bonus': bonus,
+                'net_loss': np.zeros(bonus.shape),
+            }
+
+        position = np.searchsorted(self.starts_array, bonus, side='left') - 1
+        index = np.maximum(position, 0)
+        in_trap = (position >= 0) & (bonus < self.ends_array[index])
+        lower = np.where(in_trap, self.starts_array[index], bonus)
+        upper = np.where(in_trap, self.ends_array[index], bonus)
+
+        bracket = np.minimum(np.searchsorted(self.monthly_upper_bounds_array, bonus / 12, side='left'),
+                             len(self.rates_array) - 1)
+        bonus_tax = bonus * self.rates_array[bracket] - self.bonus_quick_deductions_array[bracket]
+        net = bonus - np.where(bonus > 0, bonus_tax, 0.0)
+        return {
+            'in_trap': in_trap,
+            'lower_safe_bonus': lower,
+            'upper_safe_bonus': upper,
+            'nearest_safe_bonus': np.where(bonus - lower <= upper - bonus, lower, upper),
+            'net_loss': np.where(in_trap, self.start_nets_array[index] - net, 0.0),
+        }
+
+
+@lru_cache(maxsize=16)
+def _build_trap_index(tax_table: TaxBracketTable) -> BonusTrapIndex:
+    return BonusTrapIndex(tax_table)
+
+
+def get_trap_index(tax_table: TaxBracketTable = None) -> BonusTrapIndex:
+    """
+    返回税率表对应的雷区索引
+
+    税率表不可变，索引按税率表对象缓存：换用新的税率表（包括规则文件重新加载）时自动重建，
+    旧表的索引随缓存淘汰。默认使用规则注册表默认年度的税率表。
+    """
+    return _build_trap_index(tax_table if tax_table is not None else get_rules().tax_table)
+
+
+@lru_cache(maxsize=16)
+def monthly_bonus_table(tax_table: TaxBracketTable) -> TaxBracketTable:
+    """
+    年终奖按月度税率表的速算扣除数计税时使用的税率表
+
+    月度速算扣除数即年度速算扣除数除以12，由规则文件的年度税率表换算，按税率表对象缓存，
+    同一份规则返回同一个对象，雷区索引也只构建一次。
+    """
+    return TaxBracketTable(tax_table.brackets, tuple(deduction / 12 for deduction in tax_table.quick_deductions))
+
+
+def detect_bonus_traps(bonus, bonus_type='separate', tax_table: TaxBracketTable = None) -> dict:
+    """
+    批量检测落在雷区的年终奖，并入年收入计税的行不受雷区影响
+
+    Args:
+        bonus: 年终奖金额数组
+        bonus_type: 奖金计税方式数组或标量
+        tax_table: 税率表，默认使用规则注册表默认年度的税率表
+
+    Returns:
+        与 BonusTrapIndex.detect 相同的列式结果
+    """
+    bonus = np.asarray(bonus, dtype=np.float64)
+    result = get_trap_index(tax_table).detect(bonus)
+    separate = np.broadcast_to(np.asarray(bonus_type) == 'separate', bonus.shape)
+    if not separate.all():
+        result['in_trap'] = result['in_trap'] & separate
+        for field in ('lower_safe_bonus', 'upper_safe_bonus', 'nearest_safe_bonus'):
+            result[field] = np.where(separate, result[field], bonus)
+        result['net_loss'] = np.where(separate, result['net_loss'], 0.0)
+    return result
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""测试以仓库根目录下的平铺模块为被测对象"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
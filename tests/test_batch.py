@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""批量引擎与逐条计算的一致性"""
+
+import numpy as np
+import pytest
+
+from tax_batch import RESULT_FIELDS, calculate_tax_batch, iter_result_rows
+from tax_calculator import calculate_tax
+
+
+def random_profiles(rows: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    salary = np.round(rng.lognormal(9.6, 0.8, rows), 2)
+    return {
+        'salary': salary,
+        'salary_type': rng.choice(['monthly', 'annual'], rows),
+        'bonus': np.round(salary * rng.choice([0, 1, 2, 3], rows), 2),
+        'bonus_type': rng.choice(['separate', 'combined'], rows),
+        'labor_income': rng.choice([0.0, 3000.0, 25000.0], rows),
+        'manuscript_income': rng.choice([0.0, 5000.0], rows),
+        'license_income': rng.choice([0.0, 800.0], rows),
+        'social_security_base': np.minimum(salary, 35000.0),
+        'housing_fund_rate': rng.choice([0.0, 5.0, 12.0], rows),
+        'special_deductions': rng.choice([0.0, 1000.0, 3000.0], rows),
+        'city': rng.choice(['', '北京', '上海'], rows),
+    }
+
+
+@pytest.mark.parametrize('tax_year', [None, 2024])
+def test_batch_matches_scalar(tax_year):
+    columns = random_profiles(2000, seed=1)
+    results = calculate_tax_batch(**columns, tax_year=tax_year)
+    for index, row in enumerate(iter_result_rows(results)):
+        kwargs = {name: value[index].item() for name, value in columns.items()}
+        kwargs['special_deductions'] = {'total': kwargs['special_deductions']}
+        kwargs['city'] = kwargs['city'] or None
+        expected = calculate_tax(**kwargs, tax_year=tax_year)
+        assert row == expected, kwargs
+
+
+def test_scalar_inputs_broadcast():
+    results = calculate_tax_batch(salary=[10000, 20000], bonus=36000)
+    assert set(results) == set(RESULT_FIELDS)
+    assert results['total_tax'].shape == (2,)
+    assert results['bonus_tax'][0] == results['bonus_tax'][1] == calculate_tax(bonus=36000)['bonus_tax']
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""/calculate/batch 的流式解析"""
+
+import io
+import json
+
+import pytest
+
+import app as web_app
+from tax_calculator import calculate_tax
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    """用很小的读取块，使记录跨越多个读取块"""
+    monkeypatch.setattr(web_app, 'BATCH_READ_SIZE', 7)
+    monkeypatch.setattr(web_app, 'BATCH_MAX_RECORD_SIZE', 200)
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def post_batch(body: bytes) -> list:
+    response = web_app.app.test_client().post('/calculate/batch', data=body)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('body', [
+    b'{"salary": 10000}\n\n{"salary": 20000, "bonus": 36000}\n',
+    b' [{"salary": 10000}, {"salary": 20000, "bonus": 36000}] ',
+])
+def test_formats_match_calculate_tax(small_reads, body):
+    lines = post_batch(body)
+    assert [line['index'] for line in lines] == [0, 1]
+    assert lines[1]['result']['total_tax'] == pytest.approx(calculate_tax(salary=20000, bonus=36000)['total_tax'])
+
+
+def test_numbers_split_across_reads(small_reads):
+    records = list(web_app.iter_json_array_records(io.BytesIO(b'1234567, 8]'), b'[{"a": 1}, '))
+    assert records == [{'a': 1}, 1234567, 8]
+
+
+def test_ndjson_bad_line_does_not_stop_stream(small_reads):
+    lines = post_batch(b'{"salary": 1\n{"salary": 5000}\n')
+    assert 'error' in lines[0]
+    assert lines[1]['success'] is True
+
+
+def test_ndjson_oversized_line_is_skipped(small_reads):
+    body = b'{"salary": "' + b'9' * 1000 + b'"}\n{"salary": 5000}\n'
+    records = list(web_app.iter_ndjson_records(io.BytesIO(body)))
+    assert len(records) == 2
+    assert isinstance(records[0], ValueError)
+    assert records[1] == {'salary': 5000}
+
+
+def test_array_malformed_record_stops_at_cap(small_reads):
+    body = b'{"salary": 5000}, {"salary": [' + b'1,' * 100000 + b'1]}]'
+    stream = CountingStream(body)
+    records = list(web_app.iter_json_array_records(stream, b'['))
+    assert records[0] == {'salary': 5000}
+    assert isinstance(records[-1], ValueError)
+    # 超过上限后不再继续读取请求体
+    assert stream.bytes_read < 300
+
+
+def test_truncated_array_reports_error(small_reads):
+    records = list(web_app.iter_json_array_records(io.BytesIO(b'{"salary": 1}, {"sal'), b'['))
+    assert records[0] == {'salary': 1}
+    assert isinstance(records[1], ValueError)
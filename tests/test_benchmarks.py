@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""基准测试套件"""
+
+from benchmarks import suite
+
+
+def report(**results):
+    return {'results': results}
+
+
+def result(ops_per_sec=1000.0, p50_us=10.0, p99_us=50.0):
+    return {'ops_per_sec': ops_per_sec, 'p50_us': p50_us, 'p99_us': p99_us}
+
+
+def test_compare_flags_throughput_and_median_regressions():
+    baseline = report(fast=result(), slow=result(), skipped=result())
+    current = report(fast=result(ops_per_sec=850), slow=result(p50_us=12), added=result())
+    regressions = suite.compare(current, baseline, 0.1)
+    assert [(name, metric) for name, metric, *_ in regressions] == [('fast', 'ops_per_sec'), ('slow', 'p50_us')]
+    name, metric, base, value, change = regressions[0]
+    assert (base, value) == (1000.0, 850)
+    assert abs(change + 0.15) < 1e-12
+
+
+def test_compare_uses_wider_p99_threshold():
+    baseline = report(case=result())
+    assert suite.compare(report(case=result(p99_us=70)), baseline, 0.1) == []
+    assert [metric for _, metric, *_ in suite.compare(report(case=result(p99_us=80)), baseline, 0.1)] == ['p99_us']
+    assert [metric for _, metric, *_ in suite.compare(report(case=result(p99_us=70)), baseline, 0.1, 0.3)] == ['p99_us']
+    # 基线p99为0时不计算变化比例
+    assert suite.compare(report(case=result(p99_us=70)), report(case=result(p99_us=0)), 0.1) == []
+
+
+def test_run_case_smoke():
+    measured = suite.run_case('bracket_lookup', seed=1, iterations=50, warmup=5, repeats=2)
+    assert measured['iterations'] == 50
+    assert measured['repeats'] == 2
+    assert measured['ops_per_sec'] > 0
+    assert 0 < measured['p50_us'] <= measured['p99_us']
+    # 与自身对比不应有退化
+    assert suite.compare(report(case=measured), report(case=measured), 0.1) == []
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""年终奖最优拆分"""
+
+import numpy as np
+import pytest
+
+from tax_batch import optimize_bonus_split_batch
+from tax_calculator import TaxCalculator
+
+SPLIT_FIELDS = ('separate_bonus', 'combined_bonus', 'tax', 'net_income', 'tax_saved')
+
+
+def brute_force_tax(calculator, annual_salary, bonus, monthly_deductions, step=10):
+    accumulated_deductions = (calculator.basic_deduction + monthly_deductions) * 12
+    return min(calculator.calculate_bonus_tax(separate)
+               + calculator.calculate_accumulated_tax(annual_salary + bonus - separate, accumulated_deductions)
+               for separate in np.append(np.arange(0, bonus, step), bonus))
+
+
+@pytest.mark.parametrize('annual_salary, bonus, monthly_deductions', [
+    (60000, 36000, 0), (200000, 100000, 1000), (500000, 300000, 3000), (1000000, 1200000, 0),
+])
+def test_split_is_optimal(annual_salary, bonus, monthly_deductions):
+    calculator = TaxCalculator()
+    result = calculator.optimize_bonus_split(annual_salary, bonus, monthly_deductions)
+    assert result['tax'] <= brute_force_tax(calculator, annual_salary, bonus, monthly_deductions) + 1e-6
+    assert result['separate_bonus'] + result['combined_bonus'] == pytest.approx(bonus)
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(5)
+    salary = np.round(rng.uniform(30000, 2000000, 500), 2)
+    bonus = np.round(rng.uniform(0, 1000000, 500), 2)
+    deductions = rng.choice([0.0, 1000.0, 3000.0], 500)
+    batch = optimize_bonus_split_batch(salary, bonus, deductions)
+    calculator = TaxCalculator()
+    for row in range(len(salary)):
+        expected = calculator.optimize_bonus_split(salary[row], bonus[row], deductions[row])
+        for field in SPLIT_FIELDS:
+            assert batch[field][row] == pytest.approx(expected[field], abs=1e-6), field
+
+
+def test_batch_accepts_scalars():
+    batch = optimize_bonus_split_batch(200000, 100000, 1000)
+    expected = TaxCalculator().optimize_bonus_split(200000, 100000, 1000)
+    assert batch['tax'].shape == (1,)
+    for field in SPLIT_FIELDS:
+        assert batch[field][0] == pytest.approx(expected[field])
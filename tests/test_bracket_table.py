@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+
+"""编译后的税率表"""
+
+import numpy as np
+import pytest
+
+from tax_rules import ANNUAL_TAX_BRACKETS, DEFAULT_TAX_TABLE, TaxBracketTable
+
+
+def linear_bracket(taxable_income: float) -> int:
+    """逐档比较的参照实现，区间左开右闭"""
+    for index, (_, upper, _, _) in enumerate(ANNUAL_TAX_BRACKETS):
+        if taxable_income <= upper:
+            return index
+    return len(ANNUAL_TAX_BRACKETS) - 1
+
+
+def test_find_bracket_matches_linear_scan():
+    boundaries = [upper for _, upper, _, _ in ANNUAL_TAX_BRACKETS[:-1]]
+    amounts = [-1, 0] + [bound + delta for bound in boundaries for delta in (-0.01, 0, 0.01)]
+    amounts += np.random.default_rng(0).uniform(0, 2e6, 1000).tolist()
+    for amount in amounts:
+        assert DEFAULT_TAX_TABLE.find_bracket(amount) == linear_bracket(amount)
+        assert DEFAULT_TAX_TABLE.find_bonus_bracket(amount / 12) == linear_bracket(amount)
+
+
+def test_solve_taxable_income_inverts_tax():
+    table = DEFAULT_TAX_TABLE
+    for taxable_income in [0, 1000, 36000, 36000.5, 144000, 500000, 2e6]:
+        index = table.find_bracket(taxable_income)
+        tax = taxable_income * table.rates[index] - table.quick_deductions[index]
+        assert table.solve_taxable_income(taxable_income - tax) == pytest.approx(taxable_income)
+
+
+def test_table_is_immutable_and_validated():
+    with pytest.raises(AttributeError):
+        DEFAULT_TAX_TABLE.rates = ()
+    with pytest.raises(ValueError):
+        TaxBracketTable(ANNUAL_TAX_BRACKETS, (0, 210))
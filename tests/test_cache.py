@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+"""结果缓存、规范化缓存键和ETag"""
+
+import pytest
+
+import app as web_app
+from tax_cache import TaxResultCache, calculate_tax_cached, etag_for_key, make_cache_key
+from tax_calculator import calculate_tax
+
+
+def test_equivalent_inputs_share_a_key():
+    first = make_cache_key(salary=10000, special_deductions={'b': 1000, 'a': 2000})
+    second = make_cache_key(salary=10000.0, special_deductions={'a': 2000.0, 'b': 1000})
+    assert first == second
+    assert etag_for_key(first) == etag_for_key(second)
+    assert make_cache_key(salary=10001) != first
+
+
+def test_unknown_city_raises():
+    with pytest.raises(ValueError):
+        make_cache_key(salary=10000, city='nowhere')
+
+
+def test_cache_hits_and_returns_copies():
+    cache = TaxResultCache(maxsize=2)
+    result = calculate_tax_cached(cache, salary=20000, bonus=36000)
+    assert result == calculate_tax(salary=20000, bonus=36000)
+    result['total_tax'] = -1
+    assert calculate_tax_cached(cache, salary=20000, bonus=36000)['total_tax'] != -1
+    assert cache.stats()['hits'] == 1
+
+
+def test_lru_eviction():
+    cache = TaxResultCache(maxsize=2)
+    for salary in (1000, 2000, 3000):
+        calculate_tax_cached(cache, salary=salary)
+    assert cache.stats()['size'] == 2
+    assert cache.get(make_cache_key(salary=1000)) is None
+
+
+def test_matching_if_none_match_on_post_returns_412():
+    client = web_app.app.test_client()
+    response = client.post('/calculate', json={'salary': 15000})
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+
+    again = client.post('/calculate', json={'salary': 15000}, headers={'If-None-Match': etag})
+    assert again.status_code == 412
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+
+    changed = client.post('/calculate', json={'salary': 16000}, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_get_is_cacheable_and_revalidates_with_304():
+    client = web_app.app.test_client()
+    query = '/calculate?salary=15000&bonus=36000&special_deductions.children_education=2000'
+    response = client.get(query)
+    assert response.status_code == 200
+    assert 'public' in response.headers['Cache-Control']
+    expected = calculate_tax(salary=15000, bonus=36000, special_deductions={'children_education': 2000})
+    assert response.get_json()['result'] == pytest.approx(expected)
+    etag = response.headers['ETag']
+    posted = client.post('/calculate', json={'salary': 15000, 'bonus': 36000,
+                                             'special_deductions': {'children_education': 2000}})
+    assert posted.headers['ETag'] == etag
+
+    again = client.get(query, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == etag
+    assert client.get('/calculate?salary=16000', headers={'If-None-Match': etag}).status_code == 200
+
+
+@pytest.mark.parametrize('query', ['salary=abc', 'salary=1000&unknown=1', 'special_deductions.rent=x'])
+def test_get_rejects_bad_query(query):
+    assert web_app.app.test_client().get('/calculate?' + query).status_code == 400
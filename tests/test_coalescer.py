@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""请求合并器"""
+
+import threading
+
+import pytest
+
+from tax_cache import calculate_record_for_key, make_cache_key
+from tax_coalescer import RequestCoalescer, calculate_keys
+from tax_metrics import MetricsRegistry
+
+
+def test_calculate_keys_matches_scalar_across_years():
+    keys = [make_cache_key(salary=10000 + 1000 * index, bonus=36000 * (index % 3),
+                           bonus_type='combined' if index % 2 else 'separate', tax_year=2024 + index % 2)
+            for index in range(20)]
+    for key, result in zip(keys, calculate_keys(keys)):
+        assert result.to_dict() == pytest.approx(calculate_record_for_key(key).to_dict())
+
+
+def test_concurrent_requests_are_batched_and_exported_as_histogram():
+    coalescer = RequestCoalescer(window=0.05, max_batch_size=8)
+    keys = [make_cache_key(salary=5000 + 500 * index) for index in range(12)]
+    results = [None] * len(keys)
+
+    def submit(position):
+        results[position] = coalescer.calculate(keys[position])
+
+    threads = [threading.Thread(target=submit, args=(position,)) for position in range(len(keys))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for key, result in zip(keys, results):
+        assert result.total_tax == pytest.approx(calculate_record_for_key(key).total_tax)
+    stats = coalescer.stats()
+    assert stats['requests'] == len(keys)
+    assert sum(stats['batch_size_histogram'].values()) == stats['batches'] < len(keys)
+
+    registry = MetricsRegistry()
+    registry.register(coalescer.batch_sizes)
+    lines = dict(line.rsplit(' ', 1) for line in registry.render().splitlines() if not line.startswith('#'))
+    assert '# TYPE tax_coalescer_batch_size histogram' in registry.render()
+    buckets = [float(lines[f'tax_coalescer_batch_size_bucket{{le="{le}"}}']) for le in (1, 2, 4, 8, 16)]
+    assert buckets == sorted(buckets)
+    assert float(lines['tax_coalescer_batch_size_bucket{le="+Inf"}']) == stats['batches']
+    assert float(lines['tax_coalescer_batch_size_count']) == stats['batches']
+    assert float(lines['tax_coalescer_batch_size_sum']) == len(keys)
+
+
+def test_queue_delays_are_exported_as_histogram():
+    coalescer = RequestCoalescer(window=0.01)
+    for index in range(3):
+        coalescer.calculate(make_cache_key(salary=8000 + index))
+    counts, total = coalescer.queue_delays.snapshot()
+    assert sum(counts) == 3
+    assert total == pytest.approx(coalescer.stats()['mean_queue_delay'] * 3)
+
+    registry = MetricsRegistry()
+    registry.register(coalescer.queue_delays)
+    assert 'tax_coalescer_queue_delay_seconds_count 3' in registry.render()
+
+
+class StalledCoalescer(RequestCoalescer):
+    """后台线程启动后立即退出，模拟线程异常终止"""
+
+    def _run(self):
+        pass
+
+
+def test_falls_back_to_direct_calculation_on_timeout():
+    coalescer = StalledCoalescer(window=0.001, timeout=0.05)
+    key = make_cache_key(salary=25000, bonus=50000)
+    assert coalescer.calculate(key) == calculate_record_for_key(key)
+    assert coalescer.stats()['timeouts'] == 1
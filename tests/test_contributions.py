@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""城市社保公积金缴纳规则"""
+
+import numpy as np
+import pytest
+
+from tax_batch import calculate_tax_batch
+from tax_calculator import calculate_tax, get_calculator, get_rules
+from tax_fixed_point import calculate_tax_cents, calculate_tax_cents_batch
+
+CITIES = ['北京', '上海', '广州', '杭州', '深圳']
+
+
+def test_base_and_rate_are_clamped():
+    contributions = get_rules(2025).contributions
+    low = contributions.calculate('北京', 3000, 3)
+    assert low['pension'] == pytest.approx(6821 * 0.08)
+    assert low['social_insurance'] == pytest.approx(6821 * 0.105)
+    assert low['housing_fund'] == pytest.approx(3000 * 0.05)
+    high = contributions.calculate('北京', 100000, 20)
+    assert high['social_insurance'] == pytest.approx(35283 * 0.105)
+    assert high['housing_fund'] == pytest.approx(35283 * 0.12)
+    assert contributions.calculate('北京', 0, 12) == {
+        'pension': 0, 'medical': 0, 'unemployment': 0, 'social_insurance': 0, 'housing_fund': 0}
+    with pytest.raises(ValueError):
+        contributions.calculate('nowhere', 10000, 12)
+
+
+def test_batch_matches_scalar():
+    contributions = get_rules(2024).contributions
+    rng = np.random.default_rng(0)
+    city = rng.choice(CITIES, 1000)
+    base = rng.choice([0.0, 2000.0, 12000.0, 40000.0], 1000)
+    rate = rng.choice([0.0, 3.0, 7.0, 15.0], 1000)
+    batch = contributions.calculate_batch(city, base, rate)
+    for index in range(1000):
+        expected = contributions.calculate(str(city[index]), base[index].item(), rate[index].item())
+        assert {field: batch[field][index].item() for field in expected} == pytest.approx(expected)
+    with pytest.raises(ValueError):
+        contributions.calculate_batch(['北京', 'nowhere'], 10000, 12)
+
+
+def test_city_changes_calculate_tax():
+    kwargs = {'salary': 50000, 'social_security_base': 50000, 'housing_fund_rate': 12, 'tax_year': 2025}
+    uniform = calculate_tax(**kwargs)
+    beijing = calculate_tax(**kwargs, city='北京')
+    calculator = get_calculator(2025)
+    difference = (sum(calculator.calculate_contributions(50000, 12, '北京'))
+                  - sum(calculator.calculate_contributions(50000, 12)))
+    assert difference < 0
+    assert beijing['total_deductions'] - uniform['total_deductions'] == pytest.approx(difference * 12)
+    assert beijing['total_tax'] > uniform['total_tax']
+
+
+def test_none_rows_use_flat_rate():
+    city = np.array(['北京', None, '', '上海'], dtype=object)
+    base = np.array([20000.0, 20000.0, 20000.0, 20000.0])
+    batch = calculate_tax_batch(salary=30000, social_security_base=base, housing_fund_rate=12, city=city,
+                                tax_year=2025)
+    for index, name in enumerate(city.tolist()):
+        expected = calculate_tax(salary=30000, social_security_base=20000, housing_fund_rate=12, city=name,
+                                 tax_year=2025)
+        assert batch['total_deductions'][index] == pytest.approx(expected['total_deductions'])
+    assert batch['total_deductions'][1] == batch['total_deductions'][2] != batch['total_deductions'][0]
+
+    fixed = calculate_tax_cents_batch(salary=[3000000] * 4, social_security_base=[2000000] * 4,
+                                      housing_fund_rate_bps=[1200] * 4, city=city, tax_year=2025)
+    for index, name in enumerate(city.tolist()):
+        assert fixed['total_tax'][index] == calculate_tax_cents(
+            salary=3000000, social_security_base=2000000, housing_fund_rate_bps=1200, city=name,
+            tax_year=2025)['total_tax']
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""整数分引擎"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+import tax_calculator
+import tax_fixed_point
+from tax_batch import RESULT_FIELDS
+from tax_calculator import calculate_tax
+from tax_fixed_point import (calculate_tax_cents, calculate_tax_cents_batch, calculate_tax_fixed,
+                             percent_to_basis_points, to_cents, to_cents_array)
+from tax_rules import RULES_DIR, compile_ruleset
+
+CITIES = (None, '北京', '上海')
+
+
+def random_inputs(rows: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    inputs = []
+    for _ in range(rows):
+        salary = round(float(rng.lognormal(9.6, 0.7)), 2)
+        inputs.append({
+            'salary': salary,
+            'bonus': round(salary * int(rng.integers(0, 4)), 2),
+            'bonus_type': str(rng.choice(['separate', 'combined'])),
+            'labor_income': float(rng.choice([0, 3000, 12345.67])),
+            'social_security_base': float(rng.choice([0, salary, 50000])),
+            'housing_fund_rate': float(rng.choice([0, 5, 7, 12, 20])),
+            'special_deductions': {'children_education': float(rng.choice([0, 2000])), 'other': 1000.5},
+            'city': CITIES[int(rng.integers(0, len(CITIES)))],
+        })
+    return inputs
+
+
+@pytest.mark.parametrize('tax_year', [2024, 2025])
+def test_matches_float_engine_within_rounding(tax_year):
+    for kwargs in random_inputs(500, seed=tax_year):
+        fixed = calculate_tax_fixed(**kwargs, tax_year=tax_year)
+        expected = calculate_tax(**kwargs, tax_year=tax_year)
+        for field in RESULT_FIELDS:
+            # 社保各险种按月四舍五入到分，全年最多差几十分
+            assert float(fixed[field]) == pytest.approx(expected[field], abs=0.5), (field, kwargs)
+
+
+def test_batch_matches_scalar_bit_for_bit():
+    inputs = random_inputs(300, seed=3)
+    columns = {
+        'salary': to_cents_array([row['salary'] for row in inputs]),
+        'bonus': to_cents_array([row['bonus'] for row in inputs]),
+        'bonus_type': np.array([row['bonus_type'] for row in inputs]),
+        'labor_income': to_cents_array([row['labor_income'] for row in inputs]),
+        'social_security_base': to_cents_array([row['social_security_base'] for row in inputs]),
+        'housing_fund_rate_bps': np.array([percent_to_basis_points(row['housing_fund_rate']) for row in inputs]),
+        'special_deductions': np.array([sum(map(to_cents, row['special_deductions'].values())) for row in inputs]),
+        'city': np.array([row['city'] or '' for row in inputs]),
+    }
+    batch = calculate_tax_cents_batch(**columns, tax_year=2025)
+    for index, row in enumerate(inputs):
+        scalar = calculate_tax_cents(**{name: value[index].item() for name, value in columns.items()},
+                                     tax_year=2025)
+        assert {field: batch[field][index].item() for field in RESULT_FIELDS} == scalar
+
+
+def test_unknown_city_raises():
+    with pytest.raises(ValueError):
+        calculate_tax_cents(salary=1000000, city='nowhere')
+    with pytest.raises(ValueError):
+        calculate_tax_cents_batch(salary=[1000000, 2000000], city=['', 'nowhere'])
+
+
+def test_follows_reloaded_rules(monkeypatch):
+    with open(os.path.join(RULES_DIR, '2025.json'), encoding='utf-8') as f:
+        data = json.load(f)
+    data['basic_deduction'] = 6000
+    data['social_security_rate'] = 0.1
+    rules = compile_ruleset(data, 'test')
+    monkeypatch.setattr(tax_fixed_point, 'get_rules', lambda tax_year=None: rules)
+    monkeypatch.setattr(tax_calculator, 'get_rules', lambda tax_year=None: rules)
+
+    fixed = calculate_tax_fixed(salary=30000, social_security_base=20000, housing_fund_rate=7)
+    expected = calculate_tax(salary=30000, social_security_base=20000, housing_fund_rate=7)
+    assert float(fixed['total_deductions']) == pytest.approx(expected['total_deductions'])
+    assert float(fixed['total_tax']) == pytest.approx(expected['total_tax'], abs=0.01)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""税前反推"""
+
+import numpy as np
+import pytest
+
+from tax_batch import calculate_gross_from_net_batch
+from tax_calculator import calculate_gross_from_net, calculate_tax
+
+PROFILES = [
+    {},
+    {'bonus': 60000, 'bonus_type': 'separate', 'social_security_base': 20000, 'housing_fund_rate': 12},
+    {'bonus': 60000, 'bonus_type': 'combined', 'special_deductions': {'children_education': 2000}},
+    {'social_security_base': 50000, 'housing_fund_rate': 7, 'city': '北京', 'tax_year': 2024},
+]
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+@pytest.mark.parametrize('salary', [3000, 8000, 15000, 26500, 60000, 120000])
+def test_inverts_calculate_tax(profile, salary):
+    net_income = calculate_tax(salary=salary, **profile)['net_income']
+    result = calculate_gross_from_net(net_income, **profile)
+    assert result['salary'] == pytest.approx(salary, abs=1e-6)
+    assert result['annual_salary'] == pytest.approx(salary * 12, abs=1e-6)
+    annual = calculate_gross_from_net(net_income, salary_type='annual', **profile)
+    assert annual['salary'] == pytest.approx(salary * 12, abs=1e-6)
+
+
+def test_rejects_unreachable_net_income():
+    with pytest.raises(ValueError):
+        calculate_gross_from_net(-1000000, social_security_base=10000, housing_fund_rate=12)
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+    net_income = np.round(rng.uniform(-5000, 1500000, 500), 2)
+    bonus = rng.choice([0.0, 36000.0, 144000.0], 500)
+    bonus_type = rng.choice(['separate', 'combined'], 500)
+    base = rng.choice([0.0, 10000.0, 40000.0], 500)
+    batch = calculate_gross_from_net_batch(net_income, bonus=bonus, bonus_type=bonus_type,
+                                           social_security_base=base, housing_fund_rate=7)
+    for index in range(500):
+        try:
+            expected = calculate_gross_from_net(net_income[index].item(), bonus=bonus[index].item(),
+                                                bonus_type=str(bonus_type[index]),
+                                                social_security_base=base[index].item(),
+                                                housing_fund_rate=7)['salary']
+        except ValueError:
+            assert np.isnan(batch['salary'][index])
+        else:
+            assert batch['salary'][index] == pytest.approx(expected, abs=1e-6)
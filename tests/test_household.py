@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""家庭专项附加扣除分摊优化"""
+
+from itertools import product
+
+import pytest
+
+from tax_calculator import calculate_tax
+from tax_household import optimize_household, optimize_households_batch
+
+HOUSEHOLDS = [
+    {'earners': [{'salary': 30000, 'social_security_base': 30000, 'housing_fund_rate': 12},
+                 {'salary': 9000, 'special_deductions': {'continuing_education': 400}}],
+     'dependents': [{'type': 'children_education', 'members': [0, 1]},
+                    {'type': 'housing_loan', 'members': [0, 1]},
+                    {'type': 'elderly_care', 'members': [0, 1], 'amount': 2000}]},
+    {'earners': [{'salary': 12000, 'bonus': 50000, 'bonus_type': 'combined'}, {'salary': 6000}],
+     'dependents': [{'type': 'infant_care', 'members': [0, 1]},
+                    {'type': 'children_education', 'members': [0, 1]}]},
+    {'earners': [{'salary': 20000}],
+     'dependents': [{'type': 'elderly_care', 'members': [0], 'only_child': True}]},
+]
+
+
+def brute_force_tax(household: dict) -> float:
+    """逐一枚举全部合法方案的全家最低税额"""
+    earners = household['earners']
+    choices = []
+    for dependent in household['dependents']:
+        members = dependent['members']
+        if dependent['type'] == 'elderly_care':
+            amount = dependent.get('amount', 3000)
+            if len(members) == 1:
+                choices.append([(amount,)])
+            else:
+                choices.append([(share, amount - share) for share in range(0, amount + 1, 100)
+                                if share <= 1500 and amount - share <= 1500])
+        elif dependent['type'] == 'housing_loan':
+            choices.append([(1000, 0), (0, 1000)])
+        else:
+            choices.append([(1000, 1000), (2000, 0), (0, 2000)])
+    best = None
+    for plan in product(*choices):
+        deductions = [dict(earner.get('special_deductions') or {}) for earner in earners]
+        for dependent, shares in zip(household['dependents'], plan):
+            for member, share in zip(dependent['members'], shares):
+                deductions[member][dependent['type']] = share
+        total = sum(calculate_tax(**{**earner, 'special_deductions': special})['total_tax']
+                    for earner, special in zip(earners, deductions))
+        best = total if best is None else min(best, total)
+    return best
+
+
+@pytest.mark.parametrize('household', HOUSEHOLDS)
+def test_matches_brute_force(household):
+    result = optimize_household(household['earners'], household['dependents'])
+    assert result['total_tax'] == pytest.approx(brute_force_tax(household))
+    assert result['tax_saved'] >= 0
+    assert result['total_tax'] == pytest.approx(sum(
+        calculate_tax(**{**earner, 'special_deductions': special})['total_tax']
+        for earner, special in zip(household['earners'], result['special_deductions'])))
+
+
+def test_batch_matches_single():
+    batch = optimize_households_batch(HOUSEHOLDS)
+    for household, result in zip(HOUSEHOLDS, batch):
+        expected = optimize_household(household['earners'], household['dependents'])
+        assert result['total_tax'] == pytest.approx(expected['total_tax'])
+        assert result['baseline_tax'] == pytest.approx(expected['baseline_tax'])
+
+
+@pytest.mark.parametrize('dependent', [
+    {'type': 'pet_care', 'members': [0]},
+    {'type': 'children_education', 'members': [0, 2]},
+    {'type': 'children_education', 'members': [0], 'amount': 5000},
+    {'type': 'elderly_care', 'members': [0, 1], 'amount': 3500},
+])
+def test_invalid_dependents_raise(dependent):
+    with pytest.raises(ValueError):
+        optimize_household([{'salary': 10000}, {'salary': 10000}], [dependent])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""累计预扣台账"""
+
+import numpy as np
+import pytest
+
+from tax_calculator import get_calculator
+from tax_ledger import WithholdingLedger
+
+INCOMES = [20000, 22000, 50000, 18000, 30000, 30000, 80000, 25000, 25000, 26000, 40000, 120000]
+
+
+def test_pay_matches_withholding_schedule():
+    ledger = WithholdingLedger()
+    taxes = [ledger.pay('a', month, income, 2000, 1500) for month, income in enumerate(INCOMES, 1)]
+    schedule = get_calculator().calculate_withholding_schedule(INCOMES, 2000, 1500)
+    assert taxes == pytest.approx(schedule['monthly_tax'])
+    assert ledger.state('a')['accumulated_tax'] == pytest.approx(schedule['accumulated_tax'][-1])
+
+
+def test_pay_batch_matches_pay():
+    rng = np.random.default_rng(0)
+    incomes = np.round(rng.lognormal(9.8, 0.8, (12, 50)), 2)
+    ids = [f'e{index}' for index in range(50)]
+    single = WithholdingLedger(capacity=1)
+    batch = WithholdingLedger(capacity=1)
+    for month in range(1, 13):
+        expected = [single.pay(employee_id, month, income, 1000)
+                    for employee_id, income in zip(ids, incomes[month - 1].tolist())]
+        assert batch.pay_batch(ids, month, incomes[month - 1], 1000).tolist() == pytest.approx(expected)
+    assert [batch.state(employee_id) for employee_id in ids] == [single.state(employee_id) for employee_id in ids]
+
+
+def test_pay_rejects_earlier_month():
+    ledger = WithholdingLedger()
+    ledger.pay('a', 3, 10000)
+    with pytest.raises(ValueError):
+        ledger.pay('a', 3, 10000)
+    with pytest.raises(ValueError):
+        ledger.pay_batch(['b', 'a'], 2, [10000, 10000])
+
+
+def test_reset_starts_new_segment():
+    ledger = WithholdingLedger()
+    for month in (1, 2, 3):
+        ledger.pay('a', month, 20000)
+    ledger.reset('a', 6)
+    taxes = [ledger.pay('a', month, 20000) for month in (6, 7)]
+    schedule = get_calculator().calculate_withholding_schedule([20000, 20000])
+    assert taxes == pytest.approx(schedule['monthly_tax'])
+    assert ledger.state('a') == {'accumulated_income': 40000.0, 'accumulated_deduction': 10000.0,
+                                 'accumulated_tax': pytest.approx(schedule['accumulated_tax'][-1]),
+                                 'months': 2, 'last_month': 7}
+
+
+def test_correct_replays_and_reports_adjustment():
+    ledger = WithholdingLedger()
+    for month in (1, 2, 3):
+        ledger.pay('a', month, 20000)
+    state = ledger.correct('a', 2, 50000)
+    expected = get_calculator().calculate_withholding_schedule([20000, 50000, 20000])
+    assert state['accumulated_income'] == 90000
+    assert state['months'] == 3
+    assert state['adjustment'] == pytest.approx(expected['accumulated_tax'][-1] - state['accumulated_tax'])
+    assert state['adjustment'] > 0
+    with pytest.raises(ValueError):
+        ledger.correct('a', 5, 20000)
+    with pytest.raises(KeyError):
+        ledger.correct('b', 1, 20000)
+
+
+def test_correct_rejects_month_before_reset():
+    ledger = WithholdingLedger()
+    for month in (1, 2, 3):
+        ledger.pay('a', month, 20000)
+    ledger.reset('a', 6)
+    for month in (6, 7):
+        ledger.pay('a', month, 20000)
+    before = ledger.state('a')
+    with pytest.raises(ValueError):
+        ledger.correct('a', 2, 50000)
+    assert ledger.replay('a') == before
+    state = ledger.correct('a', 7, 20000)
+    assert state['accumulated_income'] == 40000
+    assert state['months'] == 2
+    assert state['adjustment'] == pytest.approx(0)
+
+
+def test_save_load_roundtrip(tmp_path):
+    ledger = WithholdingLedger(2025, capacity=1)
+    ledger.pay_batch(['a', 'b', 'c'], 1, [20000, 30000, 8000], 1500)
+    ledger.reset('b', 2)
+    ledger.pay_batch(['a', 'b', 'c'], 2, [20000, 30000, 8000], 1500)
+    ledger.correct('a', 1, 25000, 1500)
+    path = str(tmp_path / 'ledger.npz')
+    ledger.save(path)
+
+    loaded = WithholdingLedger.load(path)
+    assert loaded.tax_year == 2025
+    assert loaded.ids == ['a', 'b', 'c']
+    for employee_id in loaded.ids:
+        assert loaded.state(employee_id) == ledger.state(employee_id)
+        assert loaded.replay(employee_id) == ledger.replay(employee_id)
+    assert loaded.pay('a', 3, 20000, 1500) == ledger.pay('a', 3, 20000, 1500)
+
+
+def test_event_index_matches_log(tmp_path):
+    ledger = WithholdingLedger(2025, capacity=1)
+    ledger.pay_batch(['a', 'b', 'c'], 1, [20000, 30000, 8000], 1500)
+    ledger.pay('b', 2, 30000, 1500)
+    ledger.reset('c', 2)
+    ledger.pay_batch(['c', 'a'], 3, [8000, 20000], 1500)
+    ledger.correct('a', 1, 25000, 1500)
+    path = str(tmp_path / 'ledger.npz')
+    ledger.save(path)
+    loaded = WithholdingLedger.load(path)
+
+    for current in (ledger, loaded):
+        employees = current.event_employee[:current.event_count]
+        for position in range(len(current.ids)):
+            expected = np.flatnonzero(employees == position)
+            np.testing.assert_array_equal(current._events_for(position), expected)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""本地压测工具"""
+
+import json
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import app as web_app
+from benchmarks import loadtest
+
+
+def test_default_payload_mix_is_deterministic():
+    payloads = loadtest.default_payload_mix(7, size=50)
+    assert len(payloads) == 50
+    assert payloads == loadtest.default_payload_mix(7, size=50)
+    assert all(payload['salary_type'] == 'monthly' for payload in payloads)
+
+
+def test_load_payload_mix_samples_by_weight(tmp_path):
+    path = tmp_path / 'mix.json'
+    path.write_text(json.dumps([{'weight': 0, 'payload': {'salary': 1}},
+                                {'payload': {'salary': 2}}]), encoding='utf-8')
+    assert loadtest.load_payload_mix(str(path), 1, size=20) == [{'salary': 2}] * 20
+
+
+def test_recommend_picks_fastest_within_slo():
+    results = [
+        {'throughput': 900, 'p99_ms': 80, 'error_rate': 0.0},
+        {'throughput': 700, 'p99_ms': 20, 'error_rate': 0.0},
+        {'throughput': 800, 'p99_ms': 30, 'error_rate': 0.05},
+    ]
+    assert loadtest.recommend(results, p99_slo_ms=50, max_error_rate=0.01) is results[1]
+    assert loadtest.recommend(results, p99_slo_ms=10, max_error_rate=0.01) is None
+
+
+@pytest.fixture
+def server():
+    web_app.result_cache.clear()
+    httpd = make_server('127.0.0.1', 0, web_app.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    thread.join()
+
+
+def test_run_load_smoke(server):
+    payloads = loadtest.default_payload_mix(3, size=20) + [{'salary': 'abc'}]
+    result = loadtest.run_load('127.0.0.1', server.server_port, payloads, concurrency=2,
+                               duration=0.5, warmup=0.1)
+    assert result['concurrency'] == 2
+    assert result['requests'] > 0
+    assert result['throughput'] > 0
+    assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+    # 非法请求返回400，计入错误率
+    assert 0 < result['error_rate'] < 1
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""按次计税的非工资所得"""
+
+import numpy as np
+import pytest
+
+from tax_batch import aggregate_payments_batch, calculate_payments_batch
+from tax_payments import DEFAULT_PAYMENT_TABLE, PAYMENT_FIELDS
+
+
+@pytest.mark.parametrize('category, amount, tax', [
+    ('labor', 800, 0),
+    ('labor', 3000, 440),
+    ('labor', 25000, 20000 * 0.2),
+    ('labor', 30000, 24000 * 0.3 - 2000),
+    ('labor', 100000, 80000 * 0.4 - 7000),
+    ('manuscript', 10000, 8000 * 0.7 * 0.2),
+    ('license', 5000, 4000 * 0.2),
+])
+def test_single_payment(category, amount, tax):
+    result = DEFAULT_PAYMENT_TABLE.calculate(category, amount)
+    assert result['tax'] == pytest.approx(tax)
+    assert result['net_income'] == pytest.approx(amount - tax)
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+    category = rng.choice(['labor', 'manuscript', 'license'], 2000)
+    amount = np.round(rng.lognormal(8.5, 1.2, 2000), 2)
+    batch = calculate_payments_batch(category, amount, 2025)
+    for index in range(2000):
+        expected = DEFAULT_PAYMENT_TABLE.calculate(str(category[index]), amount[index].item())
+        assert [batch[field][index].item() for field in PAYMENT_FIELDS] == pytest.approx(
+            [expected[field] for field in PAYMENT_FIELDS])
+    with pytest.raises(ValueError):
+        calculate_payments_batch(['labor', 'salary'], [1000, 1000])
+
+
+def test_aggregate_by_payee_and_period():
+    payee = ['a', 'b', 'a', 'a']
+    category = ['labor', 'labor', 'labor', 'manuscript']
+    amount = [3000, 5000, 3000, 10000]
+    per_payment = aggregate_payments_batch(payee, category, amount)
+    assert per_payment['payee'].tolist() == ['a', 'b']
+    assert per_payment['payments'].tolist() == [3, 1]
+    assert per_payment['income'].tolist() == [16000, 5000]
+    assert per_payment['tax'].tolist() == pytest.approx([440 + 440 + 1120, 800])
+
+    # 同一期间同一类别的两笔劳务报酬合并为一次：6000 减除20%费用
+    merged = aggregate_payments_batch(payee, category, amount, period='2025-03')
+    assert merged['payments'].tolist() == [3, 1]
+    assert merged['tax'].tolist() == pytest.approx([6000 * 0.8 * 0.2 + 1120, 800])
+    separate = aggregate_payments_batch(payee, category, amount, period=['01', '01', '02', '01'])
+    assert separate['tax'].tolist() == pytest.approx(per_payment['tax'].tolist())
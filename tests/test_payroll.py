@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""工资表CSV流式处理和多进程计算"""
+
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+import payroll
+from payroll import PayrollInputError, calculate_tax_parallel, process_csv
+from tax_batch import RESULT_FIELDS
+from tax_calculator import calculate_tax, get_rules
+from tax_rules import RULES_DIR, compile_ruleset
+from tax_traps import monthly_bonus_table
+
+CSV_TEXT = (
+    'employee_id,salary,bonus,bonus_type,social_security_base,housing_fund_rate,children_education,elderly_care\n'
+    'a,12000,36000,separate,12000,7,2000,0\n'
+    'b,30000,100000,combined,30000,12,0,3000\n'
+    'c,5000,,,,,,\n'
+    'd,80000,500000,separate,35000,12,1000,1500\n'
+)
+
+
+def run_csv(text: str, **kwargs) -> str:
+    output = io.StringIO()
+    process_csv(io.StringIO(text), output, **kwargs)
+    return output.getvalue()
+
+
+def test_csv_rows_match_calculate_tax():
+    lines = run_csv(CSV_TEXT, chunk_size=3, id_columns=('employee_id',)).splitlines()
+    assert lines[0].split(',') == ['employee_id'] + list(RESULT_FIELDS)
+    values = dict(zip(RESULT_FIELDS, map(float, lines[2].split(',')[1:])))
+    expected = calculate_tax(salary=30000, bonus=100000, bonus_type='combined', social_security_base=30000,
+                             housing_fund_rate=12, special_deductions={'elderly_care': 3000})
+    assert values == pytest.approx(expected)
+
+
+def test_parallel_csv_keeps_input_order():
+    serial = run_csv(CSV_TEXT, chunk_size=1, id_columns=('employee_id',))
+    parallel = run_csv(CSV_TEXT, chunk_size=1, id_columns=('employee_id',), workers=2)
+    assert parallel == serial
+
+
+def test_invalid_number_reports_line():
+    with pytest.raises(PayrollInputError, match='3'):
+        run_csv('salary\n1000\nabc\n')
+
+
+def test_parallel_accepts_special_deduction_dict():
+    rng = np.random.default_rng(8)
+    salary = np.round(rng.uniform(3000, 100000, 300), 2)
+    education = rng.choice([0.0, 2000.0], 300)
+    elderly = rng.choice([0.0, 1500.0, 3000.0], 300)
+    results = calculate_tax_parallel({
+        'salary': salary,
+        'bonus': 36000,
+        'special_deductions': {'children_education': education, 'elderly_care': elderly},
+    }, workers=2, chunk_size=64)
+    for row in range(len(salary)):
+        expected = calculate_tax(salary=salary[row].item(), bonus=36000, special_deductions={
+            'children_education': education[row].item(), 'elderly_care': elderly[row].item()})
+        for field in RESULT_FIELDS:
+            assert results[field][row] == pytest.approx(expected[field], abs=1e-6), field
+
+
+def test_monthly_bonus_table_follows_rules(monkeypatch, tmp_path):
+    # 财税〔2018〕164号月度税率表的速算扣除数
+    assert monthly_bonus_table(get_rules().tax_table).bonus_quick_deductions == (0, 210, 1410, 2660, 4410, 7160, 15160)
+
+    with open(os.path.join(RULES_DIR, '2025.json'), encoding='utf-8') as f:
+        data = json.load(f)
+    # 第二档上限从36000提高到48000，雷区起点随之移动
+    brackets = data['annual_tax_brackets']
+    brackets[0][1] = brackets[1][0] = 48000
+    brackets[1][3] = 48000 * (brackets[1][2] - brackets[0][2])
+    rules = compile_ruleset(data, 'test')
+    requested = []
+    monkeypatch.setattr(payroll, 'get_rules', lambda tax_year=None: requested.append(tax_year) or rules)
+
+    input_path = tmp_path / 'bonuses.csv'
+    input_path.write_text('id,bonus\na,36500\nb,48500\n', encoding='utf-8')
+    output_path = tmp_path / 'traps.csv'
+    assert payroll.main(['traps', str(input_path), '-o', str(output_path), '--id-column', 'id',
+                         '--bonus-table', 'monthly', '--tax-year', '2025', '-q']) == 0
+    assert requested == [2025]
+    rows = output_path.read_text(encoding='utf-8').splitlines()[1:]
+    assert [row.split(',')[0] for row in rows] == ['b']
+
+
+def test_traps_unknown_tax_year_reports_error(tmp_path, capsys):
+    input_path = tmp_path / 'bonuses.csv'
+    input_path.write_text('id,bonus\na,36500\n', encoding='utf-8')
+    assert payroll.main(['traps', str(input_path), '-o', str(tmp_path / 'out.csv'), '--tax-year', '1999']) == 1
+    assert capsys.readouterr().err.startswith('错误：')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_uses_requested_tax_year(tmp_path, workers):
+    text = 'employee_id,salary,social_security_base,housing_fund_rate,city\na,30000,50000,12,北京\nb,8000,8000,7,\n'
+    input_path = tmp_path / 'employees.csv'
+    input_path.write_text(text, encoding='utf-8')
+    output_path = tmp_path / 'results.csv'
+    assert payroll.main(['run', str(input_path), '-o', str(output_path), '--id-column', 'employee_id',
+                         '--tax-year', '2024', '--workers', str(workers), '-q']) == 0
+    lines = output_path.read_text(encoding='utf-8').splitlines()
+    values = dict(zip(RESULT_FIELDS, map(float, lines[1].split(',')[1:])))
+    expected = calculate_tax(salary=30000, social_security_base=50000, housing_fund_rate=12, city='北京',
+                             tax_year=2024)
+    assert values == pytest.approx(expected)
+    assert expected != calculate_tax(salary=30000, social_security_base=50000, housing_fund_rate=12,
+                                     city='北京', tax_year=2025)
+    assert payroll.main(['run', str(input_path), '-o', str(output_path), '--tax-year', '1999', '-q']) == 1
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""按需性能剖析"""
+
+import pstats
+import time
+
+import pytest
+
+import app as web_app
+from tax_profiling import RequestProfiler
+
+
+def busy(seconds: float) -> str:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+    return 'done'
+
+
+def test_zero_rate_does_not_sample(tmp_path):
+    profiler = RequestProfiler(0, output_dir=str(tmp_path))
+    assert profiler.wrap('busy')(busy)(0) == 'done'
+    assert profiler.status()['samples_in_window'] == 0
+    assert profiler.dump() == []
+
+
+def test_cprofile_window_and_dump(tmp_path):
+    profiler = RequestProfiler(1, window=3600, output_dir=str(tmp_path))
+    wrapped = profiler.wrap('busy')(busy)
+    for _ in range(3):
+        assert wrapped(0.001) == 'done'
+    assert profiler.status()['samples_in_window'] == 3
+    assert list(tmp_path.iterdir()) == []
+
+    paths = profiler.dump()
+    assert len(paths) == 1 and paths[0].endswith('.pstats')
+    assert any(name == 'busy' for _, _, name in pstats.Stats(paths[0]).stats)
+    assert profiler.status()['samples_in_window'] == 0
+    assert profiler.dump() == []
+
+
+def test_expired_window_dumps_without_overwriting(tmp_path):
+    profiler = RequestProfiler(1, window=0, output_dir=str(tmp_path))
+    wrapped = profiler.wrap('busy')(busy)
+    for _ in range(3):
+        wrapped(0)
+    # 同一秒内的三次输出各自写入不同的文件
+    assert len(list(tmp_path.glob('*.pstats'))) == 3
+
+
+def test_sampler_writes_collapsed_stacks(tmp_path):
+    profiler = RequestProfiler(1, mode='sampler', window=3600, output_dir=str(tmp_path), interval=0.001)
+    profiler.wrap('busy')(busy)(0.2)
+    paths = profiler.dump()
+    profiler.configure(sample_rate=0)
+    assert len(paths) == 1 and paths[0].endswith('.collapsed')
+    lines = open(paths[0], encoding='utf-8').read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('test_profiling.py:busy' in line for line in lines)
+
+
+@pytest.mark.parametrize('sample_rate', [-0.1, 1.5, 5, float('nan')])
+def test_rejects_invalid_sample_rate(sample_rate):
+    with pytest.raises(ValueError):
+        RequestProfiler(sample_rate)
+    profiler = RequestProfiler()
+    with pytest.raises(ValueError):
+        profiler.configure(sample_rate=sample_rate)
+    assert profiler.sample_rate == 0
+
+
+def test_admin_endpoint_validates_body(monkeypatch, tmp_path):
+    monkeypatch.setattr(web_app, 'ADMIN_TOKEN', 'secret')
+    monkeypatch.setattr(web_app, 'profiler', RequestProfiler(output_dir=str(tmp_path)))
+    client = web_app.app.test_client()
+    headers = {'X-Admin-Token': 'secret'}
+    assert client.post('/admin/profile', json={'sample_rate': 0.5}).status_code == 404
+    assert client.post('/admin/profile', json=[1], headers=headers).status_code == 400
+    assert client.post('/admin/profile', json={'sample_rate': 5}, headers=headers).status_code == 400
+    response = client.post('/admin/profile', json={'sample_rate': 0.5, 'window': 30}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['status']['sample_rate'] == 0.5
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""综合所得年度汇算"""
+
+import numpy as np
+import pytest
+
+from tax_calculator import get_calculator
+from tax_reconciliation import RECONCILIATION_FIELDS, reconcile, reconcile_batch
+
+
+def test_salary_withheld_cumulatively_balances():
+    incomes = [15000, 15000, 40000, 15000, 15000, 15000, 15000, 15000, 15000, 15000, 15000, 60000]
+    schedule = get_calculator().calculate_withholding_schedule(incomes, 2000, 1000)
+    result = reconcile(salary_income=sum(incomes), social_insurance=24000, special_deductions=12000,
+                       withheld_tax=schedule['accumulated_tax'][-1])
+    assert result['balance'] == pytest.approx(0)
+    assert result['refund'] == result['tax_due'] == 0
+
+
+def test_labor_income_overwithholding_is_refunded():
+    # 劳务报酬按次预扣20%，并入综合所得后收入额为80%，低收入时全部退还
+    result = reconcile(salary_income=36000, labor_income=20000, withheld_tax=3200)
+    assert result['comprehensive_income'] == pytest.approx(36000 + 16000)
+    assert result['final_tax'] == 0
+    assert result['refund'] == pytest.approx(3200)
+
+
+def test_small_tax_due_is_exempt():
+    result = reconcile(salary_income=100000, withheld_tax=0)
+    assert result['tax_due'] == pytest.approx((100000 - 60000) * 0.1 - 2520)
+    assert result['exempt']
+    result = reconcile(salary_income=200000, withheld_tax=0)
+    assert result['tax_due'] > 400
+    assert not result['exempt']
+
+
+def test_best_bonus_type():
+    result = reconcile(salary_income=40000, bonus=30000, bonus_type='separate')
+    assert result['best_bonus_type'] == 'combined'
+    # 工资未用完减除费用时，并入综合所得只对超出部分计税
+    assert result['bonus_choice_saving'] == pytest.approx(30000 * 0.03 - 10000 * 0.03)
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+    rows = 1000
+    columns = {
+        'salary_income': np.round(rng.lognormal(11.8, 0.7, rows), 2),
+        'bonus': rng.choice([0.0, 36000.0, 100000.0], rows),
+        'labor_income': rng.choice([0.0, 5000.0, 80000.0], rows),
+        'manuscript_income': rng.choice([0.0, 12000.0], rows),
+        'license_income': rng.choice([0.0, 30000.0], rows),
+        'social_insurance': rng.choice([0.0, 20000.0], rows),
+        'special_deductions': rng.choice([0.0, 24000.0], rows),
+        'withheld_tax': np.round(rng.uniform(0, 50000, rows), 2),
+        'bonus_type': rng.choice(['separate', 'combined'], rows),
+    }
+    batch = reconcile_batch(**columns, tax_year=2024)
+    for index in range(rows):
+        expected = reconcile(**{name: value[index].item() for name, value in columns.items()}, tax_year=2024)
+        for field in RECONCILIATION_FIELDS:
+            if isinstance(expected[field], (bool, str)):
+                assert batch[field][index].item() == expected[field], field
+            else:
+                assert batch[field][index].item() == pytest.approx(expected[field]), field
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""输入和结果记录"""
+
+import json
+import math
+
+import numpy as np
+import pytest
+
+from tax_batch import calculate_tax_batch
+from tax_calculator import calculate_tax, calculate_tax_record
+from tax_records import INPUT_FIELDS, RESULT_FIELDS, TaxInput, TaxResult
+
+
+def test_input_from_dict_defaults_and_conversion():
+    tax_input = TaxInput.from_dict({'salary': '12000', 'bonus': 3, 'tax_year': '2025', 'city': ''})
+    assert tax_input.salary == 12000.0
+    assert tax_input.bonus == 3.0
+    assert tax_input.tax_year == 2025
+    assert tax_input.city is None
+    assert tax_input.to_dict() == dict(zip(INPUT_FIELDS, tax_input.as_tuple()))
+    with pytest.raises(ValueError):
+        TaxInput.from_dict({'salary': 'abc'})
+    with pytest.raises(AttributeError):
+        tax_input.extra = 1
+
+
+def test_result_matches_calculate_tax():
+    kwargs = {'salary': 25000, 'bonus': 80000, 'labor_income': 5000, 'special_deductions': {'housing_rent': 1500}}
+    record = calculate_tax_record(TaxInput(**kwargs))
+    assert dict(record) == calculate_tax(**kwargs)
+    assert record['total_tax'] == record.total_tax
+    with pytest.raises(KeyError):
+        record['salary']
+    assert TaxResult.from_dict(record.to_dict()) == record
+
+
+@pytest.mark.parametrize('sort_keys', [False, True])
+def test_to_json_matches_json_dumps(sort_keys):
+    record = calculate_tax_record(TaxInput(salary=33333.33, bonus=12345.67))
+    assert record.to_json(sort_keys) == json.dumps(record.to_dict(), sort_keys=sort_keys, separators=(',', ':'))
+    values = list(record.as_tuple())
+    values[0] = math.nan
+    assert TaxResult(*values).to_json(sort_keys) == json.dumps(
+        dict(zip(RESULT_FIELDS, values)), sort_keys=sort_keys, separators=(',', ':'))
+
+
+def test_columns_roundtrip():
+    columns = calculate_tax_batch(salary=np.array([5000.0, 12000.0, 80000.0]), bonus=36000)
+    records = TaxResult.from_columns(columns)
+    assert [record.total_tax for record in records] == columns['total_tax'].tolist()
+    roundtrip = TaxResult.to_columns(records)
+    for field in RESULT_FIELDS:
+        assert np.array_equal(roundtrip[field], columns[field])
+    assert all(len(column) == 0 for column in TaxResult.to_columns([]).values())
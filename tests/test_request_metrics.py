@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+
+"""HTTP请求指标"""
+
+import app as web_app
+
+
+def test_streamed_batch_keeps_in_flight_balanced():
+    client = web_app.app.test_client()
+    _, before = web_app.http_latency.snapshot('/calculate/batch')
+    for _ in range(3):
+        response = client.post('/calculate/batch', data=b'{"salary": 10000}\n')
+        assert response.status_code == 200
+        response.get_data()
+        response.close()
+    assert web_app.http_in_flight.value() == 0
+    counts, _ = web_app.http_latency.snapshot('/calculate/batch')
+    assert sum(counts) == 3
+
+
+def test_plain_request_records_latency_once():
+    client = web_app.app.test_client()
+    counts, _ = web_app.http_latency.snapshot('/metrics')
+    assert client.get('/metrics').status_code == 200
+    assert web_app.http_in_flight.value() == 0
+    assert sum(web_app.http_latency.snapshot('/metrics')[0]) == sum(counts) + 1
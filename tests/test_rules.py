@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+"""规则注册表"""
+
+import json
+import os
+import shutil
+
+import pytest
+
+from tax_rules import RULES_DIR, RuleFileError, RuleRegistry, compile_ruleset
+
+
+def rules_data(tax_year: int = 2025) -> dict:
+    with open(os.path.join(RULES_DIR, f'{tax_year}.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_rules(path, data: dict):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    # 保证修改时间变化，不依赖文件系统的时间精度
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    for name in ('2024.json', '2025.json'):
+        shutil.copy(os.path.join(RULES_DIR, name), tmp_path / name)
+    return RuleRegistry(str(tmp_path), reload_interval=-1)
+
+
+def test_years_and_default(registry):
+    assert registry.years() == [2024, 2025]
+    assert registry.get() is registry.get(2025)
+    assert registry.get(2024).tax_year == 2024
+    with pytest.raises(ValueError):
+        registry.get(2023)
+    with pytest.raises(AttributeError):
+        registry.get().basic_deduction = 0
+
+
+def test_reload_replaces_changed_file_only(registry, tmp_path):
+    old_2024, old_2025 = registry.get(2024), registry.get(2025)
+    assert registry.reload() is False
+    data = rules_data()
+    data['basic_deduction'] = 6000
+    write_rules(tmp_path / '2025.json', data)
+    assert registry.reload() is True
+    assert registry.get(2024) is old_2024
+    assert registry.get(2025).basic_deduction == 6000
+    assert registry.get(2025).fingerprint != old_2025.fingerprint
+
+
+def test_broken_file_keeps_previous_version(registry, tmp_path):
+    previous = registry.get(2025)
+    (tmp_path / '2025.json').write_text('{"tax_year": 2025', encoding='utf-8')
+    registry.reload()
+    assert registry.get(2025) is previous
+    os.remove(tmp_path / '2025.json')
+    registry.reload()
+    assert registry.years() == [2024]
+    assert registry.get() is registry.get(2024)
+
+
+@pytest.mark.parametrize('change', [
+    lambda data: data.pop('tax_year'),
+    lambda data: data['annual_tax_brackets'].reverse(),
+    lambda data: data['annual_tax_brackets'][0].__setitem__(2, 1.5),
+    lambda data: data.__setitem__('basic_deduction', '5000'),
+    lambda data: data.__setitem__('cities', []),
+])
+def test_compile_rejects_invalid_rules(change):
+    data = rules_data()
+    change(data)
+    with pytest.raises(RuleFileError):
+        compile_ruleset(data, 'test')
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""收入曲线扫描"""
+
+import numpy as np
+import pytest
+
+import app as web_app
+from tax_batch import calculate_sweep
+from tax_calculator import calculate_tax
+
+
+def test_columns_match_calculate_tax():
+    profile = {'bonus': 30000, 'social_security_base': 15000, 'housing_fund_rate': 7}
+    result = calculate_sweep(profile, {'salary': {'start': 3000, 'stop': 90000, 'steps': 59}})
+    assert result['shape'] == (59,)
+    for salary, net_income, total_tax in zip(result['axes']['salary'].tolist(),
+                                             result['columns']['net_income'].tolist(),
+                                             result['columns']['total_tax'].tolist()):
+        expected = calculate_tax(salary=salary, **profile)
+        assert net_income == pytest.approx(expected['net_income'])
+        assert total_tax == pytest.approx(expected['total_tax'])
+
+
+def test_breakpoints_are_exact():
+    result = calculate_sweep({}, {'salary': {'start': 4000, 'stop': 29000, 'steps': 11}})
+    breakpoints = result['breakpoints']
+    # 无扣除时月薪 s 的年应纳税所得额为 12s - 60000，依次跨过 0、36000、144000
+    assert breakpoints['kind'] == ['salary'] * 3
+    assert breakpoints['value'] == pytest.approx([5000, 8000, 17000])
+    assert breakpoints['rate'] == pytest.approx([0.03, 0.1, 0.2])
+    assert breakpoints['index'] == [1, 2, 6]
+
+
+def test_grid_sweep_shape_and_order():
+    result = calculate_sweep({}, {'salary': {'values': [10000, 20000]},
+                                  'bonus': {'start': 0, 'stop': 100000, 'steps': 5}})
+    assert result['shape'] == (2, 5)
+    net_income = result['columns']['net_income'].reshape(result['shape'])
+    assert net_income[1, 3] == pytest.approx(calculate_tax(salary=20000, bonus=75000)['net_income'])
+
+
+@pytest.mark.parametrize('sweep', [{}, {'salary_type': {'values': [1]}}, {'salary': {'values': []}},
+                                   {'salary': {'start': 0, 'stop': 1, 'steps': 0}}])
+def test_invalid_sweep_raises(sweep):
+    with pytest.raises(ValueError):
+        calculate_sweep({}, sweep)
+
+
+def test_endpoint_enforces_point_limit(monkeypatch):
+    monkeypatch.setattr(web_app, 'SWEEP_MAX_POINTS', 10)
+    client = web_app.app.test_client()
+    body = {'profile': {'bonus': 12000}, 'sweep': {'salary': {'start': 1000, 'stop': 10000, 'steps': 10}}}
+    response = client.post('/sweep', json=body)
+    assert response.status_code == 200
+    assert np.allclose(response.get_json()['columns']['net_income'],
+                       calculate_sweep({'bonus': 12000}, body['sweep'])['columns']['net_income'])
+    body['sweep']['salary']['steps'] = 11
+    assert client.post('/sweep', json=body).status_code == 400
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""年终奖雷区索引"""
+
+import numpy as np
+import pytest
+
+from tax_calculator import get_rules
+from tax_traps import detect_bonus_traps, get_trap_index, monthly_bonus_table
+
+
+def bonus_net(table, bonus):
+    index = table.find_bonus_bracket(bonus / 12)
+    return bonus - (bonus * table.rates[index] - table.bonus_quick_deductions[index])
+
+
+def test_annual_deductions_have_no_traps():
+    assert len(get_trap_index()) == 0
+    assert not detect_bonus_traps([36000.01, 144000.01, 1e6])['in_trap'].any()
+
+
+def test_monthly_deductions_traps():
+    table = monthly_bonus_table(get_rules().tax_table)
+    index = get_trap_index(table)
+    assert get_trap_index(table) is index
+    assert len(index) == 6
+    start, end = index.intervals()[0]
+    assert (start, end) == (36000, pytest.approx(38566.67, abs=0.01))
+    # 区间内税后收入低于起点，终点处恢复
+    for start, end in index.intervals():
+        assert bonus_net(table, (start + end) / 2) < bonus_net(table, start)
+        assert bonus_net(table, end) == pytest.approx(bonus_net(table, start))
+    assert index.check(36000) is None
+    assert index.check(38566.68) is None
+    result = index.check(37000)
+    assert result['nearest_safe_bonus'] == 36000
+    assert result['net_loss'] == pytest.approx(bonus_net(table, 36000) - bonus_net(table, 37000))
+
+
+def test_detect_matches_check():
+    table = monthly_bonus_table(get_rules().tax_table)
+    index = get_trap_index(table)
+    bonus = np.concatenate((np.random.default_rng(0).uniform(0, 1.2e6, 5000), [0, 36000, 144000, 960000.5]))
+    bonus_type = np.where(np.arange(len(bonus)) % 7 == 0, 'combined', 'separate')
+    result = detect_bonus_traps(bonus, bonus_type, table)
+    for position, amount in enumerate(bonus.tolist()):
+        expected = index.check(amount) if bonus_type[position] == 'separate' else None
+        assert bool(result['in_trap'][position]) == (expected is not None)
+        if expected is None:
+            assert result['nearest_safe_bonus'][position] == amount
+            assert result['net_loss'][position] == 0
+        else:
+            for field, value in expected.items():
+                assert result[field][position] == pytest.approx(value)
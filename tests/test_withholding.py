@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""累计预扣预缴明细"""
+
+import numpy as np
+import pytest
+
+from tax_batch import calculate_withholding_schedule_batch
+from tax_calculator import TaxCalculator
+
+
+def test_batch_matches_scalar_with_variable_months():
+    rng = np.random.default_rng(4)
+    incomes = np.round(rng.uniform(3000, 80000, (50, 12)), 2)
+    insurance = np.round(rng.uniform(0, 4000, (50, 12)), 2)
+    special = rng.choice([0.0, 1000.0, 3000.0], (50, 12))
+    batch = calculate_withholding_schedule_batch(incomes, insurance, special)
+    calculator = TaxCalculator()
+    for row in range(len(incomes)):
+        schedule = calculator.calculate_withholding_schedule(incomes[row].tolist(), insurance[row].tolist(),
+                                                             special[row].tolist())
+        for field, values in schedule.items():
+            assert batch[field][row].tolist() == pytest.approx(values), field
+
+
+def test_monthly_tax_sums_to_accumulated_tax():
+    schedule = TaxCalculator().calculate_withholding_schedule([30000] * 6 + [5000] * 6, 3000, 1000)
+    assert sum(schedule['monthly_tax']) == pytest.approx(schedule['accumulated_tax'][-1])
+    assert all(tax >= 0 for tax in schedule['monthly_tax'])
+
+
+@pytest.mark.parametrize('incomes, insurance, special', [
+    ([10000] * 13, 0, 0),
+    ([10000] * 12, [1000] * 11, 0),
+    ([10000] * 3, 0, [1000, 1000]),
+])
+def test_invalid_month_counts_raise(incomes, insurance, special):
+    with pytest.raises(ValueError):
+        TaxCalculator().calculate_withholding_schedule(incomes, insurance, special)
+    with pytest.raises(ValueError):
+        calculate_withholding_schedule_batch([incomes], insurance, special)